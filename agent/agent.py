@@ -1,18 +1,24 @@
 from langgraph.graph import StateGraph, START, END
-from agent.agent_flow import llm_call, tool_node, should_continue, MessagesState
+from agent.agent_flow import (
+    llm_call, allm_call, tool_node, atool_node, limit_fallback, alimit_fallback, should_continue, MessagesState
+)
 from langchain.messages import HumanMessage
+from langchain_core.runnables import RunnableLambda
 
 agent_builder = StateGraph(MessagesState)
 
-agent_builder.add_node('llm_call', llm_call)
-agent_builder.add_node('tool_node', tool_node)
+# Sync and async implementations per node: agent.invoke and agent.ainvoke both work
+agent_builder.add_node('llm_call', RunnableLambda(llm_call, afunc=allm_call))
+agent_builder.add_node('tool_node', RunnableLambda(tool_node, afunc=atool_node))
+agent_builder.add_node('limit_fallback', RunnableLambda(limit_fallback, afunc=alimit_fallback))
 
 agent_builder.add_edge(START, 'llm_call')
 agent_builder.add_conditional_edges(
     "llm_call",
     should_continue,
-    ["tool_node", END]
+    ["tool_node", "limit_fallback", END]
 )
 agent_builder.add_edge('tool_node', 'llm_call')
+agent_builder.add_edge('limit_fallback', END)
 
 agent = agent_builder.compile()
\ No newline at end of file
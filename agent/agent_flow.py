@@ -1,44 +1,240 @@
 
+import asyncio
+import logging
 import operator
+import time
+from concurrent.futures import TimeoutError as FutureTimeout
 from langchain.messages import AnyMessage, SystemMessage
 from typing_extensions import TypedDict, Annotated, NotRequired
-from langchain.messages import ToolMessage
-from agent.qwen import qwen_with_tools, qwen_tools_by_name
-from agent.gemini import gemini_with_tools, gemini_tools_by_name
+from langchain.messages import AIMessage, ToolMessage
 from langgraph.graph import END
 
+import resources
+import tracing
+from agent.history import compact_messages, prompt_tokens
+from agent.router import ainvoke_cascade, invoke_cascade
+from agent.tool_pool import ToolPoolSaturated
+from rag.context import count_tokens
+
+log = logging.getLogger(__name__)
+
 
 class MessagesState(TypedDict):
     messages: Annotated[list[AnyMessage], operator.add]
     llm_calls: Annotated[int, operator.add]
+    tool_timings: Annotated[list[dict], operator.add]
+    # Cascade model the next llm_call starts on (see agent/router.py), and every model attempt
+    model: NotRequired[str]
+    llm_attempts: Annotated[list[dict], operator.add]
+    # Size of the prompt sent on each LLM call, before and after compaction (agent/history.py)
+    prompt_sizes: Annotated[list[dict], operator.add]
+    # The user's question, for the ticket opened when the call limit is hit
+    query: NotRequired[str]
+    ticket_id: NotRequired[str]
 
 class MessagesUpdate(TypedDict):
     messages: NotRequired[list[AnyMessage]]
     llm_calls: NotRequired[int]
+    tool_timings: NotRequired[list[dict]]
+    model: NotRequired[str]
+    llm_attempts: NotRequired[list[dict]]
+    prompt_sizes: NotRequired[list[dict]]
+    ticket_id: NotRequired[str]
+
+SYSTEM_PROMPT = "You are a helpful tasked with looking for text matches inside."
+
+def _record_llm_call(span, messages: list, msg, model: str, attempts: list) -> None:
+    """Log one LLM round trip and attach its size and token usage to the span."""
+    log.debug("LLM call (%s) with %d messages -> %s", model, len(messages), msg.content[:200])
+    if not tracing.enabled():
+        return
+    usage = getattr(msg, "usage_metadata", None) or {}
+    # Providers that report no usage get the chars/4 estimate used for the context budget
+    input_tokens = usage.get("input_tokens") or sum(count_tokens(str(m.content)) for m in messages)
+    output_tokens = usage.get("output_tokens") or count_tokens(str(msg.content))
+    span.set(messages=len(messages), input_tokens=input_tokens, output_tokens=output_tokens,
+             tool_calls=len(getattr(msg, "tool_calls", None) or []), model=model, attempts=len(attempts))
+    tracing.count("llm.calls")
+    tracing.count("llm.input_tokens", input_tokens)
+    tracing.count("llm.output_tokens", output_tokens)
+
+def _start_model(state: MessagesState) -> str:
+    return state.get("model") or resources.get_config().cascade_models[0]
+
+def _prompt(state: MessagesState) -> tuple:
+    """System prompt plus the compacted history, and the size record for this iteration."""
+    cfg = resources.get_config()
+    history = compact_messages(state["messages"], cfg.history_turns, cfg.tool_output_max_tokens)
+    messages = [SystemMessage(content=SYSTEM_PROMPT)] + history
+    size = {
+        "call": state.get("llm_calls", 0) + 1,
+        "messages": len(messages),
+        "tokens": prompt_tokens(messages),
+        "uncompacted_tokens": prompt_tokens(state["messages"]) + prompt_tokens(messages[:1]),
+    }
+    log.debug("LLM call %d: %d messages, ~%d tokens (~%d uncompacted)",
+              size["call"], size["messages"], size["tokens"], size["uncompacted_tokens"])
+    return messages, size
 
 def llm_call(state: MessagesState) -> MessagesUpdate:
-    print(f"Invoking LLM with messages:", state["messages"])
-    msg = qwen_with_tools.invoke([SystemMessage(content="You are a helpful tasked with looking for text matches inside.")] + state["messages"])
-    print("LLM response:", msg)
+    messages, size = _prompt(state)
+    with tracing.span("agent.llm_call", prompt_tokens=size["tokens"]) as span:
+        msg, model, attempts = invoke_cascade(_start_model(state), messages)
+        _record_llm_call(span, messages, msg, model, attempts)
+    # Later turns stay on the model that last answered
+    return {
+        "messages": [msg],
+        "llm_calls": len(attempts),
+        "model": model,
+        "llm_attempts": attempts,
+        "prompt_sizes": [size],
+    }
+
+async def allm_call(state: MessagesState) -> MessagesUpdate:
+    messages, size = _prompt(state)
+    with tracing.span("agent.llm_call", prompt_tokens=size["tokens"]) as span:
+        msg, model, attempts = await ainvoke_cascade(_start_model(state), messages)
+        _record_llm_call(span, messages, msg, model, attempts)
     return {
         "messages": [msg],
-        "llm_calls": 1,
+        "llm_calls": len(attempts),
+        "model": model,
+        "llm_attempts": attempts,
+        "prompt_sizes": [size],
     }
 
-def tool_node(state: MessagesState):
-    """Performs the tool call"""
+def _tool_result(tool_call: dict, observation, seconds: float, status: str) -> tuple:
+    message = ToolMessage(
+        content=observation,
+        tool_call_id=tool_call["id"],
+        status="success" if status == "ok" else "error",
+    )
+    timing = {"tool": tool_call["name"], "tool_call_id": tool_call["id"], "seconds": seconds, "status": status}
+    return message, timing
+
+def _run_tool(tools_by_name: dict, tool_call: dict) -> tuple:
+    t0 = time.perf_counter()
+    tool = tools_by_name.get(tool_call["name"])
+    if tool is None:
+        return f"ERROR: Unknown tool '{tool_call['name']}'", time.perf_counter() - t0, "error"
+    with tracing.span(f"tool.{tool_call['name']}") as span:
+        try:
+            return tool.invoke(tool_call["args"]), time.perf_counter() - t0, "ok"
+        except Exception as e:
+            log.warning("Tool %s failed: %s", tool_call["name"], e)
+            span.set(status="error")
+            return f"ERROR: {type(e).__name__}: {e}", time.perf_counter() - t0, "error"
+
+@tracing.traced("agent.tool_node")
+def tool_node(state: MessagesState) -> MessagesUpdate:
+    """Performs the tool calls of the last message concurrently, keeping their order"""
+
+    tools_by_name = resources.get_tools_by_name()
+    timeout = resources.get_config().tool_timeout_s
+    pool = resources.get_tool_pool()
+    tool_calls = state["messages"][-1].tool_calls
+
+    t0 = time.perf_counter()
+    futures = []
+    for tool_call in tool_calls:
+        try:
+            futures.append(pool.submit(_run_tool, tools_by_name, tool_call))
+        except ToolPoolSaturated as e:
+            futures.append(e)
+    messages, timings = [], []
+    for tool_call, fut in zip(tool_calls, futures):
+        # One shared deadline: calls run in parallel, so each gets what is left of the timeout
+        remaining = max(0.0, timeout - (time.perf_counter() - t0))
+        if isinstance(fut, ToolPoolSaturated):
+            observation, seconds, status = f"ERROR: {fut}", 0.0, "saturated"
+        else:
+            try:
+                observation, seconds, status = fut.result(timeout=remaining)
+            except FutureTimeout:
+                pool.abandon(fut)  # the thread keeps running; the pool counts it as stranded
+                log.warning("Tool %s timed out after %.0fs", tool_call["name"], timeout)
+                observation, seconds, status = f"ERROR: {tool_call['name']} timed out after {timeout:.0f}s", timeout, "timeout"
+        message, timing = _tool_result(tool_call, observation, seconds, status)
+        messages.append(message)
+        timings.append(timing)
+    return {"messages": messages, "tool_timings": timings}
+
+@tracing.traced("agent.tool_node")
+async def atool_node(state: MessagesState) -> MessagesUpdate:
+    """Async variant of `tool_node` for `agent.ainvoke`"""
+
+    tools_by_name = resources.get_tools_by_name()
+    timeout = resources.get_config().tool_timeout_s
+    pool = resources.get_tool_pool()
+    tool_calls = state["messages"][-1].tool_calls
+
+    async def run(tool_call: dict) -> tuple:
+        t0 = time.perf_counter()
+        tool = tools_by_name.get(tool_call["name"])
+        if tool is None:
+            return f"ERROR: Unknown tool '{tool_call['name']}'", time.perf_counter() - t0, "error"
+        with tracing.span(f"tool.{tool_call['name']}") as span:
+            fut = None
+            try:
+                if getattr(tool, "coroutine", None) is not None:
+                    observation = await asyncio.wait_for(tool.ainvoke(tool_call["args"]), timeout)
+                else:
+                    # Sync tools run on the tool pool rather than the loop's default executor
+                    fut = pool.submit(tool.invoke, tool_call["args"])
+                    observation = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(fut)), timeout)
+                return observation, time.perf_counter() - t0, "ok"
+            except ToolPoolSaturated as e:
+                span.set(status="saturated")
+                return f"ERROR: {e}", time.perf_counter() - t0, "saturated"
+            except asyncio.TimeoutError:
+                if fut is not None:
+                    pool.abandon(fut)
+                log.warning("Tool %s timed out after %.0fs", tool_call["name"], timeout)
+                span.set(status="timeout")
+                return f"ERROR: {tool_call['name']} timed out after {timeout:.0f}s", time.perf_counter() - t0, "timeout"
+            except Exception as e:
+                log.warning("Tool %s failed: %s", tool_call["name"], e)
+                span.set(status="error")
+                return f"ERROR: {type(e).__name__}: {e}", time.perf_counter() - t0, "error"
+
+    outcomes = await asyncio.gather(*(run(tool_call) for tool_call in tool_calls))
+    messages, timings = [], []
+    for tool_call, (observation, seconds, status) in zip(tool_calls, outcomes):
+        message, timing = _tool_result(tool_call, observation, seconds, status)
+        messages.append(message)
+        timings.append(timing)
+    return {"messages": messages, "tool_timings": timings}
+
+
+def _open_limit_ticket(state: MessagesState) -> MessagesUpdate:
+    limit = resources.get_config().agent_max_llm_calls
+    t = resources.get_ticketing().create_ticket(
+        type="AGENT_CALL_LIMIT",
+        query=state.get("query", ""),
+        best_distance=float("inf"),
+        hits=[],
+    )
+    log.warning("Agent stopped after %d LLM calls; opened ticket %s", state.get("llm_calls", 0), t.id)
+    tracing.count("agent.call_limit")
+    msg = AIMessage(
+        content=f"I could not finish answering within {limit} model calls. "
+        f"Ticket {t.id} was opened so the question can be followed up."
+    )
+    return {"messages": [msg], "ticket_id": t.id}
 
-    result = []
-    for tool_call in state["messages"][-1].tool_calls:
-        tool = qwen_tools_by_name[tool_call["name"]]
-        observation = tool.invoke(tool_call["args"])
-        result.append(ToolMessage(content=observation, tool_call_id=tool_call["id"]))
-    return {"messages": result}
+def limit_fallback(state: MessagesState) -> MessagesUpdate:
+    """Ends a run that hit `agent_max_llm_calls` with a ticket instead of another tool round"""
+    return _open_limit_ticket(state)
 
+async def alimit_fallback(state: MessagesState) -> MessagesUpdate:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(resources.get_tool_pool().executor, _open_limit_ticket, state)
 
 def should_continue(state: MessagesState):
     """Decide if we should continue the loop or stop based upon whether the LLM made a tool call"""
     last = state["messages"][-1]
     if getattr(last, "tool_calls", None):
+        if state.get("llm_calls", 0) >= resources.get_config().agent_max_llm_calls:
+            return "limit_fallback"
         return "tool_node"
     return END
\ No newline at end of file
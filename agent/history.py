@@ -0,0 +1,94 @@
+# agent/history.py
+"""What each agent LLM call actually sees of the (append-only) message history.
+
+The graph state keeps every message; `compact_messages` builds the prompt from it:
+the grounded question stays verbatim, the last `keep_turns` tool turns (an AI message
+with tool calls plus its tool results) stay with each result capped at
+`tool_max_tokens`, and older turns collapse into one short summary message. Tool
+calls and their results are kept or dropped together, since providers reject a tool
+result without the call that produced it.
+"""
+from __future__ import annotations
+
+from typing import List, Optional, Tuple
+
+from langchain.messages import AIMessage, AnyMessage, HumanMessage, ToolMessage
+
+from rag.context import count_tokens
+
+
+def truncate_tool_output(text: str, max_tokens: int) -> str:
+    """Whole lines of `text` up to `max_tokens`, with a note of how many were cut."""
+    if count_tokens(text) <= max_tokens:
+        return text
+    budget = 4 * max_tokens
+    lines = text.split("\n")
+    kept: List[str] = []
+    used = 0
+    for line in lines:
+        if used + len(line) + 1 > budget:
+            break
+        kept.append(line)
+        used += len(line) + 1
+    if not kept:
+        return f"{text[:budget]} [... truncated, {len(text) - budget} more chars]"
+    return "\n".join(kept) + f"\n[... {len(lines) - len(kept)} more lines truncated]"
+
+
+def _split_turns(messages: List[AnyMessage]) -> Tuple[List[AnyMessage], List[List[AnyMessage]]]:
+    """Messages before the first AI reply, and the AI reply + tool results groups after it."""
+    head: List[AnyMessage] = []
+    turns: List[List[AnyMessage]] = []
+    for m in messages:
+        if isinstance(m, AIMessage):
+            turns.append([m])
+        elif turns and isinstance(m, ToolMessage):
+            turns[-1].append(m)
+        elif turns:
+            turns.append([m])
+        else:
+            head.append(m)
+    return head, turns
+
+
+def _summarize_turn(turn: List[AnyMessage]) -> List[str]:
+    ai, results = turn[0], {m.tool_call_id: m for m in turn[1:] if isinstance(m, ToolMessage)}
+    calls = getattr(ai, "tool_calls", None) or []
+    if not calls:
+        text = str(ai.content).strip().replace("\n", " ")
+        return [f"- note: {text[:200]}"] if text else []
+    lines = []
+    for call in calls:
+        args = ", ".join(f"{k}={v!r}" for k, v in call["args"].items())
+        result = results.get(call["id"])
+        content = str(result.content) if result is not None else ""
+        first = content.split("\n", 1)[0][:160]
+        lines.append(f"- {call['name']}({args}) -> {first} ({content.count(chr(10)) + 1 if content else 0} lines)")
+    return lines
+
+
+def compact_messages(
+    messages: List[AnyMessage],
+    keep_turns: Optional[int],
+    tool_max_tokens: Optional[int],
+) -> List[AnyMessage]:
+    """The prompt for the next LLM call; None for either limit keeps that part verbatim."""
+    head, turns = _split_turns(messages)
+    out = list(head)
+    if keep_turns is not None and len(turns) > keep_turns:
+        old, turns = turns[: len(turns) - keep_turns], turns[len(turns) - keep_turns:]
+        lines = [line for turn in old for line in _summarize_turn(turn)]
+        out.append(HumanMessage(content="Earlier tool calls (results summarized):\n" + "\n".join(lines)))
+    for turn in turns:
+        for m in turn:
+            if tool_max_tokens is not None and isinstance(m, ToolMessage):
+                text = str(m.content)
+                compacted = truncate_tool_output(text, tool_max_tokens)
+                if compacted is not text:
+                    m = m.model_copy(update={"content": compacted})
+            out.append(m)
+    return out
+
+
+def prompt_tokens(messages: List[AnyMessage]) -> int:
+    return sum(count_tokens(str(m.content)) for m in messages)
@@ -0,0 +1,232 @@
+# agent/intent.py
+"""Pre-retrieval query router: send each question down the cheapest path that can answer it.
+
+    "csv"     structured lookups ("count patients with diabetes"): search_csv is called
+              directly with the table and term read off the question; no retrieval, no LLM.
+    "ticket"  out-of-domain questions: a ticket is opened without searching or asking the LLM.
+    "docs"    clear document questions: retrieval and `decide` as usual, then one LLM call
+              on the grounded prompt with no tools bound.
+    "agent"   anything ambiguous: the full retrieval + agent tool loop, as without a router.
+
+Keyword rules run first: a counting/listing phrase plus a table (or a noun or phrase
+pointing at one, like "drugs" or "allergic to") and a search term is a lookup. Otherwise
+the query embedding is compared with labelled prototype questions, and the closest path
+is taken only when its prototype beats the other paths' by `margin`. A question close to
+no docs or csv prototype is out of domain. Callers fall back to "agent" when a shortcut
+comes up empty (see `fallback`).
+"""
+from __future__ import annotations
+
+import json
+import re
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+import tracing
+from rag.tables import CSV_FILES
+
+PATHS = ("docs", "csv", "ticket")
+
+PROTOTYPES: Dict[str, List[str]] = {
+    "docs": [
+        "How do I read my meter?",
+        "What does the symbol on the display mean?",
+        "Why does my heat cost allocator show a different value?",
+        "How is my heating consumption calculated?",
+        "When is the reading date for the billing period?",
+        "What happens when the battery of the device runs out?",
+        "How does the radio transmission of the meter work?",
+        "How do I report a defective water meter?",
+        "What is shown on the display after pressing the button?",
+        "Who can I contact about my annual bill?",
+        "Is the device calibrated and when does it have to be replaced?",
+        "What information is in the residents brochure?",
+    ],
+    "csv": [
+        "How many patients have diabetes?",
+        "Count the patients with hypertension",
+        "List all medications prescribed for asthma",
+        "Which patients are allergic to peanuts?",
+        "Number of immunizations given for influenza",
+        "Show all procedures of type colonoscopy",
+        "Find every encounter for a wellness visit",
+        "How many careplans address obesity?",
+        "List the patients named Smith",
+        "Total number of claims with status rejected",
+        "Which conditions were diagnosed most often?",
+        "How many patients take metformin?",
+    ],
+    "ticket": [
+        "What is the weather tomorrow?",
+        "Write me a poem about the sea",
+        "Who won the football game last night?",
+        "What is the current price of bitcoin?",
+        "Tell me a joke",
+        "How do I cook pasta carbonara?",
+        "Translate this sentence into French",
+        "Help me debug my Python code",
+        "Book a flight to Madrid for next week",
+        "What is the capital of Australia?",
+        "Recommend a good movie to watch",
+        "How do I reset my email password?",
+    ],
+}
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_LOOKUP_RE = re.compile(
+    r"\b(count|how many|number of|total|list|show (all|every|me all)|find (all|every)|which patients|all patients)\b"
+)
+_TICKET_RE = re.compile(r"\b(open|create|file|raise|submit) (a |an )?(support )?ticket\b")
+# Nouns that point at a table without naming it
+_TABLE_HINTS = {
+    "disease": "conditions", "diseases": "conditions", "disorder": "conditions", "disorders": "conditions",
+    "diagnosis": "conditions", "diagnoses": "conditions",
+    "drug": "medications", "drugs": "medications", "prescription": "medications", "prescriptions": "medications",
+    "allergy": "allergies",
+    "vaccine": "immunizations", "vaccines": "immunizations", "vaccination": "immunizations",
+    "vaccinations": "immunizations",
+    "surgery": "procedures", "surgeries": "procedures",
+}
+# Verbs only count in these phrases: on their own, "take", "visit" or "prescribed" are as
+# likely to be about a meter ("take a reading", "technician visit", "legally prescribed")
+_TABLE_PHRASES = [
+    (re.compile(p), table) for p, table in (
+        (r"\bdiagnosed with\b", "conditions"),
+        (r"\ballergic to\b", "allergies"),
+        (r"\b(patients?|people|who) (are |is |were |was )?(take|takes|taking|took|prescribed)\b", "medications"),
+        (r"\b(vaccinated|immunized) (against|for)\b", "immunizations"),
+    )
+]
+_TABLE_WORDS = {w: name for name in CSV_FILES for w in (name, name.rstrip("s"))}
+_STOPWORDS = frozenset(
+    "a an the of for with without to in on at by from and or is are was were be been has have had having do does "
+    "did who whom which what that this these those there their them they it its any all every each me my show list "
+    "find count how many number total named called name given got get received receive against containing contain "
+    "contains mentioning mention about related record records row rows table tables most often than more less into "
+    "please when where why will would can could should i you we people".split()
+)
+# A "lookup" that leaves more than this many words as the search term is really a question
+_MAX_TERM_WORDS = 3
+
+
+@dataclass(frozen=True)
+class Intent:
+    path: str
+    reason: str
+    score: float = 0.0  # cosine similarity to the closest prototype on `path`
+    table: Optional[str] = None
+    term: Optional[str] = None
+    column: Optional[str] = None
+
+
+def fallback(intent: Intent, reason: str) -> Intent:
+    """`intent` demoted to the full agent path, e.g. when its lookup finds no rows."""
+    return replace(intent, path="agent", reason=reason)
+
+
+def parse_lookup(query: str) -> Optional[Intent]:
+    """A "csv" intent with table, term and column if the question reads like a table lookup.
+
+    reason is "keyword" when a counting/listing phrase is present, otherwise "table_term"
+    (a table and a term, taken unless the docs prototypes clearly fit better).
+    """
+    lowered = query.lower()
+    tokens = _WORD_RE.findall(lowered)
+    named = [_TABLE_WORDS[t] for t in tokens if t in _TABLE_WORDS]
+    phrased = [table for pattern, table in _TABLE_PHRASES if pattern.search(lowered)]
+    hinted = phrased + [_TABLE_HINTS[t] for t in tokens if t in _TABLE_HINTS]
+    # "patients with X" searches the table X lives in; patients itself only for names and ids
+    tables = [t for t in named if t != "patients"] or hinted or named
+    if not tables:
+        return None
+    table = tables[0]
+    if table == "patients" and ("with" in tokens or "have" in tokens or "has" in tokens):
+        table = "conditions"
+    rest = lowered
+    for pattern, _ in _TABLE_PHRASES:
+        rest = pattern.sub(" ", rest)
+    term_words = [
+        t for t in _WORD_RE.findall(rest) if t not in _STOPWORDS and t not in _TABLE_WORDS and t not in _TABLE_HINTS
+    ]
+    if not term_words or len(term_words) > _MAX_TERM_WORDS:
+        return None
+    column = "DESCRIPTION" if "DESCRIPTION" in CSV_FILES[table]["search_cols"] else None
+    reason = "keyword" if _LOOKUP_RE.search(lowered) else "table_term"
+    return Intent("csv", reason, table=table, term=" ".join(term_words), column=column)
+
+
+def load_prototypes(path: Path) -> Dict[str, List[str]]:
+    """Extra prototypes from JSONL lines of {"query": ..., "path": "docs" | "csv" | "ticket"}."""
+    prototypes: Dict[str, List[str]] = {}
+    for n, line in enumerate(Path(path).read_text(encoding="utf-8").splitlines(), start=1):
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        if record.get("path") not in PATHS:
+            raise ValueError(f"{path}:{n}: path must be one of {', '.join(PATHS)}")
+        prototypes.setdefault(record["path"], []).append(record["query"])
+    return prototypes
+
+
+class QueryRouter:
+    """Keyword rules plus nearest labelled prototype; the prototypes are embedded once."""
+
+    def __init__(
+        self,
+        embeddings,
+        prototypes: Optional[Dict[str, Sequence[str]]] = None,
+        margin: float = 0.05,
+        min_similarity: float = 0.3,
+    ) -> None:
+        prototypes = PROTOTYPES if prototypes is None else prototypes
+        if set(prototypes) != set(PATHS) or not all(prototypes.values()):
+            raise ValueError(f"prototypes are needed for every path: {', '.join(PATHS)}")
+        self.embeddings = embeddings
+        self.margin = margin
+        self.min_similarity = min_similarity
+        self.labels = np.array([path for path in PATHS for _ in prototypes[path]])
+        self.vectors = _normalize(np.asarray(
+            embeddings.embed_documents([text for path in PATHS for text in prototypes[path]]), dtype=np.float32
+        ))
+
+    def scores(self, vec) -> Dict[str, float]:
+        """Cosine similarity of the closest prototype per path."""
+        sims = self.vectors @ _normalize(np.asarray(vec, dtype=np.float32))
+        return {path: float(sims[self.labels == path].max()) for path in PATHS}
+
+    def route(self, query: str, vec=None) -> Intent:
+        """The path for `query`; `vec` is its embedding if the caller already has it."""
+        intent = self._route(query, vec)
+        tracing.count(f"route.{intent.path}")
+        return intent
+
+    def _route(self, query: str, vec) -> Intent:
+        if _TICKET_RE.search(query.lower()):
+            return Intent("ticket", "keyword")
+        lookup = parse_lookup(query)
+        if lookup is not None and lookup.reason == "keyword":
+            return lookup
+
+        scores = self.scores(self.embeddings.embed_query(query) if vec is None else vec)
+        (best, first), (_, second) = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)[:2]
+        clear = first - second >= self.margin
+        if lookup is not None:
+            # A table and a term: try the lookup (an empty one falls back) unless the documents clearly fit better
+            if best == "docs" and clear:
+                return Intent("docs", "prototype", first)
+            return replace(lookup, score=scores["csv"])
+        if max(scores["docs"], scores["csv"]) < self.min_similarity:
+            return Intent("ticket", "out_of_domain", scores["ticket"])
+        if not clear:
+            return Intent("agent", "ambiguous", first)
+        if best == "csv":
+            return Intent("agent", "no_lookup_term", first)
+        return Intent(best, "prototype", first)
+
+
+def _normalize(x: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(x, axis=-1, keepdims=True)
+    return x / np.where(norms == 0, 1.0, norms)
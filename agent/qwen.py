@@ -1,20 +1,5 @@
 from langchain_ollama import ChatOllama
-from config import Config
-from rag.retrieve import load_index
-from ticketing.memory import InMemoryTicketing
-from agent.tools import make_retrieval_tool, make_ticket_tool, make_csv_search_tool
 
-cfg = Config()
 
-qwen = ChatOllama(model="qwen2:7b", temperature=0)
-
-vs = load_index(cfg.index_dir, cfg.embed_model)
-ticketing = InMemoryTicketing()
-
-retrieve_tool = make_retrieval_tool(vs, k=cfg.top_k)
-ticket_tool = make_ticket_tool(ticketing)
-search_tool = make_csv_search_tool(cfg.csv_dir)
-
-tools = [retrieve_tool, ticket_tool, search_tool]
-qwen_tools_by_name = {tool.name: tool for tool in tools}
-qwen_with_tools = qwen.bind_tools(tools)
\ No newline at end of file
+def make_qwen() -> ChatOllama:
+    return ChatOllama(model="qwen2:7b", temperature=0)
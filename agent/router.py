@@ -0,0 +1,215 @@
+# agent/router.py
+"""Model cascade: route each question to the cheapest adequate chat model and escalate on failure.
+
+`Config.cascade_models` lists model names cheapest first; each is resolved through
+`resources.get_llm_with_tools`, so any backend registered with `resources.register_llm`
+(or a stand-in installed with `resources.override`) can take part. `choose_route` picks
+the starting model from the retrieval evidence, query length and whether the question
+needs table lookups. `invoke_cascade` / `ainvoke_cascade` call it and move on to the next
+model when the reply is empty, names unknown tools, raises or times out.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import TimeoutError as FutureTimeout
+from dataclasses import dataclass
+from typing import Deque, Dict, List, Optional, Tuple
+
+import resources
+import tracing
+from rag.tables import CSV_FILES
+
+log = logging.getLogger(__name__)
+
+_WORD_RE = re.compile(r"[a-z]+")
+# Table names (singular and plural) mean the answer needs search_csv on top of retrieval
+_TABLE_WORDS = frozenset(w for name in CSV_FILES for w in (name, name.rstrip("s")))
+
+
+@dataclass(frozen=True)
+class Route:
+    model: str
+    reason: str
+
+
+def needs_tools(query: str) -> bool:
+    """Heuristic: does answering take tool calls beyond the context already in the prompt?"""
+    return any(w in _TABLE_WORDS for w in _WORD_RE.findall(query.lower()))
+
+
+def choose_route(query: str, best_distance: float, cfg) -> Route:
+    """The first model to ask: the cheapest one unless the question looks hard."""
+    models = cfg.cascade_models
+    if not cfg.cascade or len(models) == 1:
+        return Route(models[0], "fixed")
+    if best_distance > cfg.cascade_easy_distance:
+        return Route(models[-1], "weak_evidence")
+    if len(query.split()) > cfg.cascade_max_query_words:
+        return Route(models[-1], "long_query")
+    if needs_tools(query):
+        return Route(models[-1], "needs_tools")
+    return Route(models[0], "easy")
+
+
+def escalation_order(model: str, cfg) -> List[str]:
+    """`model` followed by the models to try if it fails, in cascade order (wrapping around)."""
+    models = list(cfg.cascade_models)
+    if not cfg.cascade or model not in models:
+        return [model]
+    i = models.index(model)
+    return (models[i:] + models[:i])[: 1 + cfg.cascade_max_escalations]
+
+
+def invalid_reason(msg, tool_names) -> Optional[str]:
+    """Why a model reply can't be used, or None if it is fine."""
+    tool_calls = getattr(msg, "tool_calls", None) or []
+    if getattr(msg, "invalid_tool_calls", None):
+        return "invalid_tool_call"
+    if not tool_calls and not str(msg.content).strip():
+        return "empty"
+    for call in tool_calls:
+        if call["name"] not in tool_names:
+            return "unknown_tool"
+        if not isinstance(call.get("args"), dict):
+            return "invalid_args"
+    return None
+
+
+class CascadeStats:
+    """Per-model latency and outcome counts plus escalation counts, for /stats and benchmarks."""
+
+    def __init__(self, window: int = 2048) -> None:
+        self._lock = threading.Lock()
+        self.window = window
+        self.latencies: Dict[str, Deque[float]] = {}
+        self.outcomes: Dict[str, Dict[str, int]] = {}
+        self.routes: Dict[str, int] = {}
+        self.escalations: Dict[str, int] = {}
+        self.questions = 0
+        self.escalated_questions = 0
+
+    def record_route(self, route: Route) -> None:
+        with self._lock:
+            self.routes[f"{route.model}:{route.reason}"] = self.routes.get(f"{route.model}:{route.reason}", 0) + 1
+
+    def record_call(self, model: str, seconds: float, outcome: str) -> None:
+        with self._lock:
+            self.latencies.setdefault(model, deque(maxlen=self.window)).append(seconds * 1000)
+            per_model = self.outcomes.setdefault(model, {})
+            per_model[outcome] = per_model.get(outcome, 0) + 1
+
+    def record_escalation(self, source: str, target: str, reason: str) -> None:
+        with self._lock:
+            key = f"{source}->{target}:{reason}"
+            self.escalations[key] = self.escalations.get(key, 0) + 1
+
+    def record_question(self, escalated: bool) -> None:
+        with self._lock:
+            self.questions += 1
+            self.escalated_questions += escalated
+
+    def summary(self) -> dict:
+        with self._lock:
+            models = {}
+            for model, values in self.latencies.items():
+                ordered = sorted(values)
+                pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+                models[model] = {
+                    "calls": sum(self.outcomes[model].values()),
+                    "outcomes": dict(self.outcomes[model]),
+                    "p50_ms": round(pick(0.50), 3),
+                    "p95_ms": round(pick(0.95), 3),
+                    "max_ms": round(ordered[-1], 3),
+                }
+            return {
+                "models": models,
+                "routes": dict(self.routes),
+                "escalations": dict(self.escalations),
+                "questions": self.questions,
+                "escalation_rate": round(self.escalated_questions / self.questions, 4) if self.questions else 0.0,
+            }
+
+
+def _attempt_record(model: str, seconds: float, outcome: str) -> dict:
+    resources.get_cascade_stats().record_call(model, seconds, outcome)
+    tracing.count(f"llm.{outcome}")
+    return {"model": model, "seconds": seconds, "outcome": outcome}
+
+
+def _escalate(attempts: List[dict], model: str, order: List[str], i: int) -> None:
+    if i + 1 < len(order):
+        reason = attempts[-1]["outcome"]
+        log.warning("Model %s failed (%s); escalating to %s", model, reason, order[i + 1])
+        resources.get_cascade_stats().record_escalation(model, order[i + 1], reason)
+        tracing.count("llm.escalations")
+
+
+def invoke_cascade(model: str, messages: list, tools: bool = True) -> Tuple[object, str, List[dict]]:
+    """Ask `model`, escalating along the cascade on bad replies; returns (reply, model used, attempts).
+
+    With `tools=False` the models are called without tools bound, and a reply asking for one
+    counts as "unknown_tool". A call that outlives `Config.llm_timeout_s` is abandoned (its
+    thread finishes in the background). Raises the last error if every model raised and no
+    reply was obtained at all.
+    """
+    cfg = resources.get_config()
+    tool_names = resources.get_tools_by_name() if tools else {}
+    order = escalation_order(model, cfg)
+    attempts: List[dict] = []
+    reply, used, error = None, model, None
+    for i, name in enumerate(order):
+        t0 = time.perf_counter()
+        with tracing.span(f"llm.{name}"):
+            try:
+                llm = resources.get_llm_with_tools(name) if tools else resources.get_llm(name)
+                msg = resources.get_llm_executor().submit(llm.invoke, messages).result(timeout=cfg.llm_timeout_s)
+                outcome = invalid_reason(msg, tool_names) or "ok"
+                if reply is None or outcome == "ok":
+                    reply, used = msg, name
+            except FutureTimeout:
+                outcome = "timeout"
+            except Exception as e:
+                log.warning("Model %s raised %s: %s", name, type(e).__name__, e)
+                outcome, error = "error", e
+        attempts.append(_attempt_record(name, time.perf_counter() - t0, outcome))
+        if outcome == "ok":
+            break
+        _escalate(attempts, name, order, i)
+    if reply is None:
+        raise error or TimeoutError(f"No model answered within {cfg.llm_timeout_s:.0f}s")
+    return reply, used, attempts
+
+
+async def ainvoke_cascade(model: str, messages: list, tools: bool = True) -> Tuple[object, str, List[dict]]:
+    """Async variant of `invoke_cascade`."""
+    cfg = resources.get_config()
+    tool_names = resources.get_tools_by_name() if tools else {}
+    order = escalation_order(model, cfg)
+    attempts: List[dict] = []
+    reply, used, error = None, model, None
+    for i, name in enumerate(order):
+        t0 = time.perf_counter()
+        with tracing.span(f"llm.{name}"):
+            try:
+                llm = resources.get_llm_with_tools(name) if tools else resources.get_llm(name)
+                msg = await asyncio.wait_for(llm.ainvoke(messages), cfg.llm_timeout_s)
+                outcome = invalid_reason(msg, tool_names) or "ok"
+                if reply is None or outcome == "ok":
+                    reply, used = msg, name
+            except asyncio.TimeoutError:
+                outcome = "timeout"
+            except Exception as e:
+                log.warning("Model %s raised %s: %s", name, type(e).__name__, e)
+                outcome, error = "error", e
+        attempts.append(_attempt_record(name, time.perf_counter() - t0, outcome))
+        if outcome == "ok":
+            break
+        _escalate(attempts, name, order, i)
+    if reply is None:
+        raise error or TimeoutError(f"No model answered within {cfg.llm_timeout_s:.0f}s")
+    return reply, used, attempts
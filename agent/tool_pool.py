@@ -0,0 +1,69 @@
+# agent/tool_pool.py
+"""Threads for the agent's tool calls, with headroom for calls abandoned after a timeout.
+
+A Python thread can't be stopped: when a tool call outlives `tool_timeout_s` the agent
+moves on, but the thread running it stays busy until the tool returns. The pool has
+`workers + max_stranded` threads, so up to `max_stranded` hung calls never take a worker
+from live ones. Once that many are stranded, new calls are refused at once with
+`ToolPoolSaturated` (reported back to the model as a tool error) instead of queueing
+behind them; `stats()` and the "tool.saturated" trace counter show when that happens.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable
+
+import tracing
+
+log = logging.getLogger(__name__)
+
+
+class ToolPoolSaturated(RuntimeError):
+    pass
+
+
+class ToolPool:
+    def __init__(self, workers: int, max_stranded: int) -> None:
+        self.executor = ThreadPoolExecutor(max_workers=workers + max_stranded, thread_name_prefix="tool")
+        self.max_stranded = max_stranded
+        self._lock = threading.Lock()
+        self.stranded = 0
+        self.timeouts = 0
+        self.refused = 0
+
+    def submit(self, fn: Callable[..., Any], *args: Any) -> Future:
+        with self._lock:
+            if self.stranded >= self.max_stranded:
+                self.refused += 1
+                stranded = self.stranded
+            else:
+                stranded = None
+        if stranded is not None:
+            log.warning("Tool pool saturated: %d timed-out calls still running", stranded)
+            tracing.count("tool.saturated")
+            raise ToolPoolSaturated(f"{stranded} timed-out tool calls are still running; try again later")
+        return self.executor.submit(fn, *args)
+
+    def abandon(self, fut: Future) -> None:
+        """Give up on a timed-out call; its thread counts as stranded until the call returns."""
+        if fut.cancel():
+            return  # had not started yet
+        with self._lock:
+            self.stranded += 1
+            self.timeouts += 1
+        fut.add_done_callback(self._release)
+
+    def _release(self, fut: Future) -> None:
+        with self._lock:
+            self.stranded -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "stranded": self.stranded,
+                "max_stranded": self.max_stranded,
+                "timeouts": self.timeouts,
+                "refused": self.refused,
+            }
@@ -1,23 +1,43 @@
-import pandas as pd
 from pathlib import Path
-from typing import Optional
+from typing import Dict, Optional, Sequence
 
-from rag.retrieve import load_index
-from ticketing.memory import InMemoryTicketing
-from config import Config
+from rag.context import build_context
+from rag.retrieve import ShardedIndex
+from rag.tables import CSV_FILES, TableCache
+from ticketing.base import TicketBackend
 from langchain.tools import tool
 
-cfg = Config()
 
-def make_retrieval_tool(vs, k: int = 4):
+def make_retrieval_tool(
+    index: ShardedIndex,
+    k: int = 4,
+    max_tokens: Optional[int] = None,
+    corpora: Optional[Sequence[str]] = None,
+    descriptions: Optional[Dict[str, str]] = None,
+):
+    """Search tool over `index`, limited to `corpora` (default: all of its shards).
+
+    The model may narrow a call further with the tool's `corpus` argument; the corpus
+    names and `descriptions` are listed in the tool description when there are several.
+    """
+    allowed = index.select(corpora)
+
     @tool
-    def retrieve_sources(query: str) -> str:
-        """Retrieve top-k relevant passages from the indexed PDFs. Returns citations."""
-        hits = vs.similarity_search_with_score(query, k=k)
+    def retrieve_sources(query: str, corpus: Optional[str] = None) -> str:
+        """Retrieve top-k relevant passages from the indexed documents. Returns citations."""
+        if corpus and corpus not in allowed:
+            return f"ERROR: Unknown corpus '{corpus}'. Available: {', '.join(allowed)}"
+        hits = index.search(query, k, corpora=[corpus] if corpus else allowed)
         if not hits:
             return "NO_HITS"
 
         lines = []
+        if max_tokens is not None:
+            for i, p in enumerate(build_context(query, hits, max_tokens), 1):
+                text = p.text.replace("\n", " ")
+                lines.append(f"[{i}] file={p.filename} page={p.page} dist={p.distance:.3f} text={text}")
+            return "\n".join(lines)
+
         for i, (doc, dist) in enumerate(hits, 1):
             fname = doc.metadata.get("filename")
             page = doc.metadata.get("page")
@@ -25,13 +45,16 @@ def make_retrieval_tool(vs, k: int = 4):
             lines.append(f"[{i}] file={fname} page={page} dist={dist:.3f} text={snippet}")
         return "\n".join(lines)
 
+    if len(allowed) > 1:
+        listing = "; ".join(f"{name}: {(descriptions or {}).get(name) or 'no description'}" for name in allowed)
+        retrieve_sources.description += f" Set corpus to search only one of: {listing}. Omit it to search all."
     return retrieve_sources
 
 
 
 
 
-def make_ticket_tool(ticketing: InMemoryTicketing):
+def make_ticket_tool(ticketing: TicketBackend):
     @tool
     def open_ticket(reason: str, query: str, evidence: str) -> str:
         """Open a ticket when the system cannot answer confidently."""
@@ -46,21 +69,10 @@ def make_ticket_tool(ticketing: InMemoryTicketing):
     return open_ticket
 
 
-def make_csv_search_tool(data_dir: Path):
+def make_csv_search_tool(data_dir: Path, cache: Optional[TableCache] = None):
     """Create a tool for exhaustive CSV searches using pandas."""
     
-    CSV_FILES = {
-        "patients": {"file": "patients.csv", "search_cols": ["Id", "FIRST", "LAST", "GENDER", "BIRTHDATE"]},
-        "conditions": {"file": "conditions.csv", "search_cols": ["PATIENT", "DESCRIPTION", "CODE"]},
-        "medications": {"file": "medications.csv", "search_cols": ["PATIENT", "DESCRIPTION", "CODE"]},
-        "allergies": {"file": "allergies.csv", "search_cols": ["PATIENT", "DESCRIPTION", "CODE"]},
-        "procedures": {"file": "procedures.csv", "search_cols": ["PATIENT", "DESCRIPTION", "CODE"]},
-        "encounters": {"file": "encounters.csv", "search_cols": ["PATIENT", "DESCRIPTION", "ENCOUNTERCLASS"]},
-        "immunizations": {"file": "immunizations.csv", "search_cols": ["PATIENT", "DESCRIPTION", "CODE"]},
-        "careplans": {"file": "careplans.csv", "search_cols": ["PATIENT", "DESCRIPTION", "REASONDESCRIPTION"]},
-        "claims": {"file": "claims.csv", "search_cols": ["PATIENTID", "PROVIDERID", "STATUS"]},
-        "observations": {"file": "observations.csv", "search_cols": ["PATIENT", "DESCRIPTION", "VALUE", "UNITS"]},
-    }
+    tables = cache if cache is not None else TableCache(data_dir)
     
     @tool
     def search_csv(table: str, search_term: str, column: Optional[str] = None, limit: int = 50) -> str:
@@ -87,30 +99,25 @@ def make_csv_search_tool(data_dir: Path):
             return f"ERROR: Unknown table '{table}'. Available: {', '.join(CSV_FILES.keys())}"
         
         file_info = CSV_FILES[table]
-        file_path = data_dir / file_info["file"]
+        file_path = tables.path(table)
         
         if not file_path.exists():
             return f"ERROR: File {file_info['file']} not found"
         
         try:
-            df = pd.read_csv(file_path)
+            loaded = tables.get(table)
+            df = loaded.df
             limit = min(limit, 200)
             
-            if column:
-                if column not in df.columns:
-                    return f"ERROR: Column '{column}' not found. Available: {', '.join(df.columns)}"
-                mask = df[column].astype(str).str.contains(search_term, case=False, na=False)
-            else:
-                mask = pd.Series([False] * len(df))
-                for col in df.columns:
-                    mask |= df[col].astype(str).str.contains(search_term, case=False, na=False)
-            
-            results = df[mask].head(limit)
+            if column and column not in df.columns:
+                return f"ERROR: Column '{column}' not found. Available: {', '.join(df.columns)}"
+            rows = loaded.search(search_term, column)
             
-            if results.empty:
+            if not len(rows):
                 return f"No results found for '{search_term}' in {table}"
             
-            total_matches = mask.sum()
+            results = df.iloc[rows[:limit]]
+            total_matches = len(rows)
             output_lines = [f"Found {total_matches} matches in {table} (showing {len(results)}):"]
             output_lines.append("-" * 60)
             
@@ -0,0 +1,312 @@
+"""Batch query mode: many questions through one warm process, results streamed as JSONL.
+
+    python -m app.query_cli --batch questions.jsonl --out answers.jsonl
+    cat questions.jsonl | python -m app.query_cli --batch - > answers.jsonl
+
+Each input line is {"id": ..., "query": ...} (a line without "id" gets "line-<n>").
+Queries are embedded `batch_size` at a time and searched with one FAISS call per batch
+and shard (`--corpus` limits the shards); `decide` then runs per query, and tickets and
+agent runs are dispatched with at most `concurrency` in flight while the next batch is
+embedded. With the query router on (agent/intent.py), table lookups and out-of-domain
+questions skip the search and the agent, and clear document questions get one LLM call;
+each record says which path it took under "intent". Every finished query is
+written and flushed as one output line, in completion order. Rerunning with the same
+--out appends, skipping ids that already have a result; failed queries and input lines
+that can't be parsed are written with an "error" field, and failed queries are retried
+on the next run. At the end the file is compacted to one line per id.
+"""
+import asyncio
+import functools
+import json
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+from typing import IO, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import resources
+from agent.intent import Intent, fallback
+from agent.router import choose_route
+from app.pipeline import aanswer_once, arun_agent, intent_json, open_gap_ticket, open_route_ticket, run_lookup
+from rag.decision import decide
+
+log = logging.getLogger(__name__)
+
+
+def read_queries(lines: Iterable[str]) -> Iterator[Tuple[str, str, Optional[str]]]:
+    """(id, query, error) per JSONL line; blank lines are skipped.
+
+    error is None for a runnable query; for a line that can't be run it says why, and
+    query is the line itself.
+    """
+    for n, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield f"line-{n}", line, f"line {n}: not valid JSON ({e})"
+            continue
+        if not isinstance(record, dict):
+            yield f"line-{n}", line, f"line {n}: expected a JSON object"
+            continue
+        query_id = str(record.get("id", f"line-{n}"))
+        query = str(record.get("query", "")).strip()
+        if not query:
+            yield query_id, line, f"line {n}: missing 'query'"
+            continue
+        yield query_id, query, None
+
+
+def _read_records(path: Path) -> Iterator[dict]:
+    """Output records of an earlier run; a torn last line is ignored."""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(record, dict):
+                yield record
+
+
+def completed_ids(path: Path) -> Set[str]:
+    """Ids with a successful result in an earlier output file."""
+    if not path.exists():
+        return set()
+    return {str(record.get("id")) for record in _read_records(path) if "error" not in record}
+
+
+def compact_output(path: Path) -> None:
+    """Rewrite `path` with one record per id: its first success, else its latest error.
+
+    Reruns append to the output, so an id that failed before has an error line followed
+    by the retry's. Records keep the order in which the kept ones were written.
+    """
+    kept: Dict[str, Tuple[int, dict]] = {}
+    for n, record in enumerate(_read_records(path)):
+        previous = kept.get(str(record.get("id")))
+        if previous is None or "error" in previous[1]:
+            kept[str(record.get("id"))] = (n, record)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        for _, record in sorted(kept.values(), key=lambda item: item[0]):
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    os.replace(tmp, path)
+
+
+def _hits_json(hits) -> List[dict]:
+    return [
+        {"corpus": doc.metadata.get("corpus"), "filename": doc.metadata.get("filename"),
+         "page": doc.metadata.get("page"), "distance": float(dist)}
+        for doc, dist in hits
+    ]
+
+
+class BatchRunner:
+    def __init__(
+        self,
+        out: IO[str],
+        batch_size: int,
+        concurrency: int,
+        corpora: Optional[List[str]] = None,
+        router: bool = False,
+    ) -> None:
+        self.cfg = resources.get_config()
+        self.out = out
+        self.corpora = corpora
+        self.router = resources.get_query_router() if router else None
+        self.batch_size = batch_size
+        self.slots = asyncio.Semaphore(concurrency)
+        self.counts: Dict[str, int] = {"answer": 0, "ticket": 0, "error": 0}
+
+    def write(self, record: dict) -> None:
+        self.out.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.out.flush()
+
+    async def run(self, queries: List[Tuple[str, str]]) -> Dict[str, int]:
+        loop = asyncio.get_running_loop()
+        self.shards = shards = resources.get_shards()
+        shards.select(self.corpora)  # unknown corpus names fail before any work
+        embeddings = resources.get_embeddings()
+        self.ticketing = resources.get_ticketing()
+        from agent.agent import agent
+
+        self.agent = agent
+        pending: Set[asyncio.Task] = set()
+        for start in range(0, len(queries), self.batch_size):
+            batch = queries[start:start + self.batch_size]
+            texts = [query for _, query in batch]
+            t0 = time.perf_counter()
+            try:
+                vectors = await loop.run_in_executor(None, embeddings.embed_documents, texts)
+                t1 = time.perf_counter()
+                intents = [self.router.route(query, vec) if self.router else None for query, vec in zip(texts, vectors)]
+                t_route = time.perf_counter()
+                # Lookups and out-of-domain questions need no search (a lookup that comes up empty searches alone)
+                todo = [i for i, intent in enumerate(intents) if intent is None or intent.path in ("docs", "agent")]
+                search = functools.partial(shards.search_batch, queries=[texts[i] for i in todo], corpora=self.corpora)
+                found = await loop.run_in_executor(None, search, [vectors[i] for i in todo], self.cfg.top_k) if todo else []
+                results = [None] * len(batch)
+                for i, hits in zip(todo, found):
+                    results[i] = hits
+            except Exception as e:
+                log.exception("Batch starting at %d failed", start)
+                for query_id, query in batch:
+                    self._failed(query_id, query, e)
+                continue
+            t2 = time.perf_counter()
+            shared = {"embed_batch": t1 - t0, "search_batch": t2 - t_route}
+            if self.router is not None:
+                shared["route_batch"] = t_route - t1
+            for (query_id, query), vec, hits, intent in zip(batch, vectors, results, intents):
+                task = asyncio.create_task(self.finish(query_id, query, vec, hits, intent, dict(shared), len(batch)))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            # Don't run further ahead than one batch beyond what the agent slots can absorb
+            while len(pending) > self.batch_size:
+                await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        if pending:
+            await asyncio.wait(pending)
+        return self.counts
+
+    def _failed(self, query_id: str, query: str, error: Exception) -> None:
+        self.reject(query_id, query, f"{type(error).__name__}: {error}")
+
+    def reject(self, query_id: str, query: str, error: str) -> None:
+        self.counts["error"] += 1
+        self.write({"id": query_id, "query": query, "error": error})
+
+    async def finish(
+        self,
+        query_id: str,
+        query: str,
+        vec,
+        hits,
+        intent: Optional[Intent],
+        timings: Dict[str, float],
+        batch_len: int,
+    ) -> None:
+        loop = asyncio.get_running_loop()
+        t_start = time.perf_counter()
+        try:
+            record = {"id": query_id, "query": query}
+            async with self.slots:
+                if intent is not None and intent.path == "csv":
+                    t0 = time.perf_counter()
+                    answer = await loop.run_in_executor(None, run_lookup, intent)
+                    timings["lookup"] = time.perf_counter() - t0
+                    if answer is not None:
+                        record.update({"intent": intent_json(intent), "answer": answer, "llm_calls": 0})
+                    else:
+                        intent = fallback(intent, "lookup_empty")
+                if intent is not None and intent.path == "ticket":
+                    t0 = time.perf_counter()
+                    t = await loop.run_in_executor(
+                        None, functools.partial(open_route_ticket, self.ticketing, query, intent, vec)
+                    )
+                    timings["ticket"] = time.perf_counter() - t0
+                    record.update({"intent": intent_json(intent), "ticket_id": t.id})
+                if "answer" not in record and "ticket_id" not in record:
+                    await self._retrieve_and_answer(record, query, vec, hits, intent, timings)
+        except Exception as e:
+            log.exception("Query %s failed", query_id)
+            self._failed(query_id, query, e)
+            return
+        batch_shared = timings["embed_batch"] + timings["search_batch"] + timings.get("route_batch", 0.0)
+        timings["total"] = batch_shared + time.perf_counter() - t_start
+        record["batch_size"] = batch_len
+        record["timings_ms"] = {stage: round(s * 1000, 3) for stage, s in timings.items()}
+        self.counts["ticket" if "ticket_id" in record else "answer"] += 1
+        self.write(record)
+
+    async def _retrieve_and_answer(
+        self, record: dict, query: str, vec, hits, intent: Optional[Intent], timings: Dict[str, float]
+    ) -> None:
+        loop = asyncio.get_running_loop()
+        if hits is None:
+            t0 = time.perf_counter()
+            search = functools.partial(self.shards.search_by_vector, query=query, corpora=self.corpora)
+            hits = await loop.run_in_executor(None, search, vec, self.cfg.top_k)
+            timings["search"] = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        decision = decide(hits, max_distance=self.cfg.max_distance)
+        timings["decide"] = time.perf_counter() - t0
+        if intent is not None:
+            record["intent"] = intent_json(intent)
+        record.update({
+            "decision": {"action": decision.action, "reason": decision.reason, "best_distance": float(decision.best_distance)},
+            "hits": _hits_json(hits),
+        })
+        if decision.action == "ticket":
+            t0 = time.perf_counter()
+            t = await loop.run_in_executor(
+                None, functools.partial(open_gap_ticket, self.ticketing, query, decision, hits, vec)
+            )
+            timings["ticket"] = time.perf_counter() - t0
+            record["ticket_id"] = t.id
+            return
+        route = choose_route(query, decision.best_distance, self.cfg)
+        resources.get_cascade_stats().record_route(route)
+        t0 = time.perf_counter()
+        if intent is not None and intent.path == "docs":
+            state = await aanswer_once(query, hits, max_tokens=self.cfg.context_max_tokens, model=route.model)
+        else:
+            state = await arun_agent(self.agent, query, hits, max_tokens=self.cfg.context_max_tokens, model=route.model)
+        timings["agent"] = time.perf_counter() - t0
+        record.update({
+            "answer": state["messages"][-1].content,
+            "llm_calls": state.get("llm_calls", 0),
+            "route": {"model": route.model, "reason": route.reason},
+            "answered_by": state.get("model", route.model),
+        })
+        if "ticket_id" in state:
+            record["ticket_id"] = state["ticket_id"]  # hit the LLM call limit
+
+
+def run_batch(
+    source: IO[str],
+    out_path: Optional[Path],
+    batch_size: int,
+    concurrency: int,
+    corpora: Optional[List[str]] = None,
+    router: bool = False,
+) -> Dict[str, int]:
+    """Answer every query in `source`; with `out_path`, append there and skip ids it already holds.
+
+    Lines that can't be run are written as error records and the rest still run. Once
+    done, `out_path` is compacted to one record per id (see `compact_output`).
+    """
+    lines = list(read_queries(source))
+    invalid = [(query_id, line, error) for query_id, line, error in lines if error is not None]
+    queries = [(query_id, query) for query_id, query, error in lines if error is None]
+    done = completed_ids(out_path) if out_path is not None else set()
+    todo = [(query_id, query) for query_id, query in queries if query_id not in done]
+    log.info("%d queries, %d already done, %d to run, %d invalid lines",
+             len(queries), len(queries) - len(todo), len(todo), len(invalid))
+
+    def run(out: IO[str]) -> Dict[str, int]:
+        runner = BatchRunner(out, batch_size, concurrency, corpora, router)
+        for query_id, line, error in invalid:
+            log.warning("Skipping input %s", error)
+            runner.reject(query_id, line, error)
+        return asyncio.run(runner.run(todo))
+
+    if out_path is None:
+        counts = run(sys.stdout)
+    else:
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        torn = False
+        if out_path.exists() and out_path.stat().st_size:
+            with open(out_path, "rb") as f:
+                f.seek(-1, 2)
+                torn = f.read(1) != b"\n"
+        with open(out_path, "a", encoding="utf-8") as out:
+            if torn:
+                out.write("\n")  # an interrupted run left half a line; start on a fresh one
+            counts = run(out)
+        compact_output(out_path)
+    counts["skipped"] = len(queries) - len(todo)
+    return counts
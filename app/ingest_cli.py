@@ -1,17 +1,48 @@
-from config import Config
+import argparse
+
+import resources
+import tracing
+from rag.index_types import IndexSpec
 from rag.ingest import ingest_folder
 
 
-cfg = Config()
+cfg = resources.get_config()
+tracing.configure(cfg, "ingest")
+corpora = cfg.corpus_list()
+parser = argparse.ArgumentParser(description="Ingest every configured corpus (or the named ones) into its index shard.")
+parser.add_argument("--corpus", action="append", choices=[c.name for c in corpora],
+                    help="ingest only this corpus (repeatable; default: all)")
+parser.add_argument("--rebuild", action="store_true", help="re-embed from scratch instead of incrementally")
+args = parser.parse_args()
+embeddings = resources.get_embeddings()
 
-ingest_folder(
-    source_dir=cfg.source_dir,
-    file_type=cfg.file_type,
-    index_dir=cfg.index_dir,
-    embed_model=cfg.embed_model,
-    min_chars_per_page=cfg.min_chars_per_page,
-    chunk_size=cfg.chunk_size,
-    chunk_overlap=cfg.chunk_overlap,
-)
+for corpus in corpora:
+    if args.corpus and corpus.name not in args.corpus:
+        continue
+    report = ingest_folder(
+        source_dir=corpus.source_dir,
+        file_type=corpus.file_type,
+        index_dir=corpus.index_dir,
+        embed_model=cfg.embed_model,
+        min_chars_per_page=cfg.min_chars_per_page,
+        chunk_size=cfg.chunk_size,
+        chunk_overlap=cfg.chunk_overlap,
+        incremental=cfg.incremental_ingest and not args.rebuild,
+        workers=cfg.ingest_workers,
+        batch_size=cfg.ingest_batch_size,
+        checkpoint_every=cfg.checkpoint_every,
+        embeddings=embeddings,
+        index_spec=IndexSpec.from_config(cfg),
+        csv_rows_per_chunk=cfg.csv_rows_per_chunk,
+        csv_text_columns=cfg.csv_text_columns,
+        csv_metadata_columns=cfg.csv_metadata_columns,
+        index_format=cfg.index_format,
+        dedup_threshold=cfg.dedup_threshold,
+        embed_backend=cfg.embed_backend,
+        embed_quantize=cfg.embed_quantize,
+    )
 
-print(f"Indexed files from {cfg.source_dir} into {cfg.index_dir}")
+    print(f"[{corpus.name}] Indexed files from {corpus.source_dir} into {corpus.index_dir}")
+    print(report)
+if hasattr(embeddings, "cache"):
+    print("embedding cache:", embeddings.cache.stats())
@@ -0,0 +1,191 @@
+from typing import List, Optional, Tuple
+
+from langchain_core.documents import Document
+from langchain.messages import HumanMessage, SystemMessage
+
+import resources
+import tracing
+from agent.agent_flow import SYSTEM_PROMPT
+from agent.history import prompt_tokens
+from agent.intent import Intent
+from agent.router import ainvoke_cascade, invoke_cascade
+from rag.context import build_context
+from rag.decision import Decision
+from rag.tables import PATIENT_COLUMNS
+
+
+def build_prompt(query: str, hits: List[Tuple[Document, float]], max_tokens: Optional[int] = None) -> str:
+    """Grounded answer prompt; with `max_tokens` the context is compacted to that budget."""
+    if max_tokens is None:
+        sources = [
+            (doc.metadata.get("filename", "unknown"), doc.metadata.get("page", doc.metadata.get("page_number", "")), dist, doc.page_content)
+            for doc, dist in hits
+        ]
+    else:
+        sources = [(p.filename, p.page, p.distance, p.text) for p in build_context(query, hits, max_tokens)]
+    context_parts = []
+    for i, (fn, page, dist, text) in enumerate(sources, start=1):
+        context_parts.append(
+            f"[S{i} | file={fn} | page={page} | dist={dist:.3f}]\n{text}"
+        )
+    context = "\n\n".join(context_parts)
+
+    return f"""You must answer using ONLY the context sources.
+    Cite sources after every sentence using id and file names like S1: file_name, S2: file_name (multiple allowed).
+    If the context does not contain the answer, say "I don't know based on the provided documents" and suggest creating a ticket.
+
+    CONTEXT:
+    {context}
+
+    QUESTION: {query}
+
+    Return format:
+    - Answer: ...
+    - Sources: list the used sources (file names and page)
+    """
+
+
+def open_gap_ticket(
+    ticketing,
+    query: str,
+    decision: Decision,
+    hits: List[Tuple[Document, float]],
+    embedding: Optional[List[float]] = None,
+):
+    return ticketing.create_ticket(
+        type="DOC_GAP_OR_LOW_RELEVANCE",
+        query=query,
+        best_distance=decision.best_distance,
+        hits=hits,
+        embedding=embedding,
+    )
+
+
+def open_route_ticket(ticketing, query: str, intent: Intent, embedding: Optional[List[float]] = None):
+    """Ticket for a question the router sent to the "ticket" path, opened without searching."""
+    return ticketing.create_ticket(
+        type="USER_REQUESTED" if intent.reason == "keyword" else "OUT_OF_DOMAIN",
+        query=query,
+        best_distance=float("inf"),
+        hits=[],
+        embedding=embedding,
+    )
+
+
+def intent_json(intent: Intent) -> dict:
+    """The router's decision as it is reported in batch and server results."""
+    record = {"path": intent.path, "reason": intent.reason, "score": round(intent.score, 4)}
+    if intent.table is not None:
+        record.update({"table": intent.table, "term": intent.term})
+    return record
+
+
+@tracing.traced("route.lookup")
+def run_lookup(intent: Intent) -> Optional[str]:
+    """search_csv output for a "csv" route, or None when it finds nothing (fall back to the agent)."""
+    args = {"table": intent.table, "search_term": intent.term}
+    if intent.column:
+        args["column"] = intent.column
+    result = resources.get_tools_by_name()["search_csv"].invoke(args)
+    if result.startswith("ERROR") or result.startswith("No results"):
+        return None
+    # search_csv counts matching rows; "how many patients ..." asks for distinct patients
+    patients = _distinct_patients(intent)
+    if patients is not None:
+        result = f"{patients} distinct patients in the matching rows.\n{result}"
+    return result
+
+
+def _distinct_patients(intent: Intent) -> Optional[int]:
+    loaded = resources.get_table_cache().get(intent.table)
+    column = PATIENT_COLUMNS.get(intent.table, "PATIENT")
+    if column not in loaded.df.columns:
+        return None
+    rows = loaded.search(intent.term, intent.column)
+    return int(loaded.df[column].iloc[rows].nunique())
+
+
+def _initial_state(query: str, hits: List[Tuple[Document, float]], max_tokens: Optional[int], model: Optional[str]) -> dict:
+    state = {
+        "messages": [HumanMessage(content=build_prompt(query, hits, max_tokens))],
+        "llm_calls": 0,
+        "query": query,
+    }
+    if model is not None:
+        state["model"] = model
+    return state
+
+
+def _record_cascade(state: dict) -> dict:
+    models = {a["model"] for a in state.get("llm_attempts", [])}
+    resources.get_cascade_stats().record_question(escalated=len(models) > 1)
+    return state
+
+
+def run_agent(
+    agent,
+    query: str,
+    hits: List[Tuple[Document, float]],
+    max_tokens: Optional[int] = None,
+    model: Optional[str] = None,
+) -> dict:
+    """Invoke the agent graph on the grounded prompt and return its final state.
+
+    `model` is the cascade model to start on (see `agent.router.choose_route`); None means the cheapest.
+    """
+    return _record_cascade(agent.invoke(_initial_state(query, hits, max_tokens, model)))
+
+
+async def arun_agent(
+    agent,
+    query: str,
+    hits: List[Tuple[Document, float]],
+    max_tokens: Optional[int] = None,
+    model: Optional[str] = None,
+) -> dict:
+    """Async variant of `run_agent`; tool calls of a turn run concurrently on the event loop."""
+    return _record_cascade(await agent.ainvoke(_initial_state(query, hits, max_tokens, model)))
+
+
+def _direct_messages(query: str, hits: List[Tuple[Document, float]], max_tokens: Optional[int]) -> list:
+    return [SystemMessage(content=SYSTEM_PROMPT), HumanMessage(content=build_prompt(query, hits, max_tokens))]
+
+
+def _direct_state(messages: list, reply, model: str, attempts: List[dict]) -> dict:
+    tokens = prompt_tokens(messages)
+    return _record_cascade({
+        "messages": messages[1:] + [reply],
+        "llm_calls": len(attempts),
+        "model": model,
+        "llm_attempts": attempts,
+        "prompt_sizes": [{"call": 1, "messages": len(messages), "tokens": tokens, "uncompacted_tokens": tokens}],
+    })
+
+
+def answer_once(
+    query: str,
+    hits: List[Tuple[Document, float]],
+    max_tokens: Optional[int] = None,
+    model: Optional[str] = None,
+) -> dict:
+    """One LLM call on the grounded prompt with no tools bound, for questions routed to "docs".
+
+    Returns a state shaped like `run_agent`'s (messages, llm_calls, model, llm_attempts, prompt_sizes).
+    """
+    messages = _direct_messages(query, hits, max_tokens)
+    with tracing.span("route.answer_once"):
+        reply, used, attempts = invoke_cascade(model or resources.get_config().cascade_models[0], messages, tools=False)
+    return _direct_state(messages, reply, used, attempts)
+
+
+async def aanswer_once(
+    query: str,
+    hits: List[Tuple[Document, float]],
+    max_tokens: Optional[int] = None,
+    model: Optional[str] = None,
+) -> dict:
+    """Async variant of `answer_once`."""
+    messages = _direct_messages(query, hits, max_tokens)
+    with tracing.span("route.answer_once"):
+        reply, used, attempts = await ainvoke_cascade(model or resources.get_config().cascade_models[0], messages, tools=False)
+    return _direct_state(messages, reply, used, attempts)
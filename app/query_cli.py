@@ -1,25 +1,72 @@
+import argparse
 import sys
+from pathlib import Path
 
-from config import Config
-from rag.retrieve import load_index, search_with_scores
+import resources
+import tracing
 from rag.decision import decide
-from ticketing.memory import InMemoryTicketing
 from agent.agent import agent
+from agent.intent import fallback
+from agent.router import choose_route
 from wasabi import msg
-from langchain.messages import HumanMessage
+from app.pipeline import answer_once, open_gap_ticket, open_route_ticket, run_agent, run_lookup
+
+cfg = resources.get_config()
+tracing.configure(cfg, "query")
+parser = argparse.ArgumentParser(description="Answer a query, or a JSONL file of them with --batch.")
+parser.add_argument("query", nargs="*")
+parser.add_argument("--batch", metavar="FILE", help='JSONL of {"id", "query"} lines; "-" reads stdin')
+parser.add_argument("--out", type=Path, help="append JSONL results here, skipping ids already in it (default: stdout)")
+parser.add_argument("--batch-size", type=int, default=cfg.query_batch_size)
+parser.add_argument("--concurrency", type=int, default=cfg.query_concurrency)
+parser.add_argument("--corpus", action="append", help="search only this corpus (repeatable; default: all)")
+parser.add_argument("--no-router", dest="router", action="store_false", default=cfg.query_router,
+                    help="skip the pre-retrieval router; every query takes retrieval + the agent loop")
+args = parser.parse_args()
 
-cfg = Config()
-query = " ".join(sys.argv[1:]).strip()
+if cfg.index_dir is None:
+    msg.fail("Index directory is not configured. Please run the ingestion first.", exits=1)
+
+if args.batch is not None:
+    from app.batch import run_batch
+
+    source = sys.stdin if args.batch == "-" else open(args.batch, encoding="utf-8")
+    with source:
+        counts = run_batch(source, args.out, args.batch_size, args.concurrency, corpora=args.corpus, router=args.router)
+    # stderr: with no --out the results themselves go to stdout
+    print(" | ".join(f"{name}: {n}" for name, n in counts.items()), file=sys.stderr)
+    sys.exit(1 if counts["error"] else 0)
+
+query = " ".join(args.query).strip()
 if not query:
     msg.fail("Please provide a query as a command-line argument.", exits=1)
 else:
     msg.good(f"Running query: {query}")
 
-if cfg.index_dir is None:
-    msg.fail("Index directory is not configured. Please run the ingestion first.", exits=1)
+vec = resources.get_embeddings().embed_query(query)
+intent = resources.get_query_router().route(query, vec) if args.router else None
+if intent is not None:
+    print(f"\nROUTE: {intent.path} | reason: {intent.reason} | score: {intent.score:.3f}")
+
+if intent is not None and intent.path == "csv":
+    print(f"Looking up '{intent.term}' in {intent.table}...")
+    result = run_lookup(intent)
+    if result is not None:
+        print("\n=== LOOKUP RESULT ===")
+        print(result)
+        print("\nllm_calls: 0")
+        sys.exit(0)
+    intent = fallback(intent, "lookup_empty")
+    print("No rows found; falling back to retrieval and the agent.")
+
+if intent is not None and intent.path == "ticket":
+    t = open_route_ticket(resources.get_ticketing(), query, intent, vec)
+    print("\nTICKET CREATED:", t.id)
+    print("type:", t.type)
+    print("\nThis question is outside the indexed documents and tables. Ticket created.")
+    sys.exit(0)
 
-vs = load_index(cfg.index_dir, cfg.embed_model)
-hits = search_with_scores(vs, query=query, k=cfg.top_k)
+hits = resources.get_shards().search_by_vector(vec, cfg.top_k, query=query, corpora=args.corpus)
 
 decision = decide(hits, max_distance=cfg.max_distance)
 
@@ -28,13 +75,7 @@ print("DECISION:", decision.action, "| reason:", decision.reason, "| best_distan
 
 
 if decision.action == "ticket":
-    ticketing = InMemoryTicketing()
-    t = ticketing.create_ticket(
-        type="DOC_GAP_OR_LOW_RELEVANCE",
-        query=query,
-        best_distance=decision.best_distance,
-        hits=hits,
-    )
+    t = open_gap_ticket(resources.get_ticketing(), query, decision, hits)
     print("\nTICKET CREATED:", t.id)
     print("type:", t.type)
     print("top_sources:", t.top_sources)
@@ -43,37 +84,18 @@ if decision.action == "ticket":
     sys.exit(0)
 
 elif decision.action == "answer":
-    context_parts = []
-    for i, (doc, dist) in enumerate(hits, start=1):
-        fn = doc.metadata.get("filename", "unknown")
-        page = doc.metadata.get("page", doc.metadata.get("page_number", ""))
-        context_parts.append(
-            f"[S{i} | file={fn} | page={page} | dist={dist:.3f}]\n{doc.page_content}"
-        )
-    context = "\n\n".join(context_parts)
-
-    prompt = f"""You must answer using ONLY the context sources.
-    Cite sources after every sentence using id and file names like S1: file_name, S2: file_name (multiple allowed).
-    If the context does not contain the answer, say "I don't know based on the provided documents" and suggest creating a ticket.
-
-    CONTEXT:
-    {context}
-
-    QUESTION: {query}
-
-    Return format:
-    - Answer: ...
-    - Sources: list the used sources (file names and page)
-    """
-
-    print("\nCalling agent...")
-    result = agent.invoke({
-        "messages": [HumanMessage(content=prompt)],
-        "llm_calls": 0
-    })
+    route = choose_route(query, decision.best_distance, cfg)
+    if intent is not None and intent.path == "docs":
+        print(f"\nAnswering from the retrieved context ({route.model}, {route.reason})...")
+        result = answer_once(query, hits, max_tokens=cfg.context_max_tokens, model=route.model)
+    else:
+        print(f"\nCalling agent ({route.model}, {route.reason})...")
+        result = run_agent(agent, query, hits, max_tokens=cfg.context_max_tokens, model=route.model)
 
     print("\n=== AGENT RESPONSE ===")
     print(result["messages"][-1].content)
+    sizes = ", ".join(str(size["tokens"]) for size in result.get("prompt_sizes", []))
+    print(f"\nllm_calls: {result['llm_calls']} | prompt tokens per call: {sizes}")
     sys.exit(0)
 
 else:
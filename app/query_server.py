@@ -0,0 +1,375 @@
+"""Long-running query service that keeps the index, embeddings and agent graph warm.
+
+    python -m app.query_server [--host 127.0.0.1] [--port 8765] [--retrieval-only] [--no-router]
+
+With the query router on (agent/intent.py, not in --retrieval-only mode), table lookups
+and out-of-domain questions skip the search and the agent, and clear document questions
+get one LLM call; the result says which path was taken under "intent".
+
+Endpoints:
+    POST /query   {"query": "..."} -> decision, hits, answer or ticket, per-stage timings
+    GET  /stats   per-stage latency percentiles, queue depth, request counters and model cascade stats
+    GET  /health
+"""
+import argparse
+import asyncio
+import functools
+import json
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Deque, Dict, List, Optional, Tuple
+
+from wasabi import msg
+
+import resources
+import tracing
+from rag.decision import decide
+from agent.intent import Intent, fallback
+from app.pipeline import aanswer_once, arun_agent, intent_json, open_gap_ticket, open_route_ticket, run_lookup
+from agent.router import choose_route
+
+
+class StageStats:
+    """Rolling latency window per pipeline stage."""
+
+    def __init__(self, window: int = 2048) -> None:
+        self.window = window
+        self.samples: Dict[str, Deque[float]] = {}
+        self.counts: Dict[str, int] = {}
+
+    def record(self, stage: str, seconds: float) -> None:
+        self.samples.setdefault(stage, deque(maxlen=self.window)).append(seconds * 1000)
+        self.counts[stage] = self.counts.get(stage, 0) + 1
+
+    def summary(self) -> Dict[str, dict]:
+        out = {}
+        for stage, values in self.samples.items():
+            ordered = sorted(values)
+            pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+            out[stage] = {
+                "count": self.counts[stage],
+                "p50_ms": round(pick(0.50), 3),
+                "p95_ms": round(pick(0.95), 3),
+                "p99_ms": round(pick(0.99), 3),
+                "max_ms": round(ordered[-1], 3),
+            }
+        return out
+
+
+class EmbeddingBatcher:
+    """Collects concurrent queries and embeds them with a single encoder call."""
+
+    def __init__(self, embeddings, executor, stats: StageStats, max_size: int, max_wait_ms: float) -> None:
+        self.embeddings = embeddings
+        self.executor = executor
+        self.stats = stats
+        self.max_size = max_size
+        self.max_wait = max_wait_ms / 1000
+        self.queue: "asyncio.Queue[Tuple[str, asyncio.Future]]" = asyncio.Queue()
+        self.batch_sizes: Deque[int] = deque(maxlen=2048)
+
+    async def embed(self, text: str) -> List[float]:
+        fut = asyncio.get_running_loop().create_future()
+        await self.queue.put((text, fut))
+        return await fut
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            texts = [text for text, _ in batch]
+            t0 = time.perf_counter()
+            try:
+                vectors = await loop.run_in_executor(self.executor, self.embeddings.embed_documents, texts)
+            except Exception as e:
+                for _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+                continue
+            self.stats.record("embed_batch", time.perf_counter() - t0)
+            self.batch_sizes.append(len(batch))
+            for (_, fut), vec in zip(batch, vectors):
+                if not fut.done():
+                    fut.set_result(vec)
+
+
+class QueryService:
+    def __init__(self, retrieval_only: bool = False, router: Optional[bool] = None) -> None:
+        self.cfg = resources.get_config()
+        self.retrieval_only = retrieval_only
+        # Routing is about skipping retrieval and the agent, so retrieval-only mode never routes
+        self.use_router = (self.cfg.query_router if router is None else router) and not retrieval_only
+        self.router = None
+        self.executor = ThreadPoolExecutor(max_workers=self.cfg.server_workers)
+        # The encoder gets its own thread so slow agent calls never starve batching
+        self.embed_executor = ThreadPoolExecutor(max_workers=1)
+        self.stats = StageStats()
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.batcher: Optional[EmbeddingBatcher] = None
+        self.agent = None
+
+    def warm_up(self) -> None:
+        """Load everything a request needs before the first one arrives."""
+        for corpus in self.cfg.corpus_list():
+            resources.get_index(corpus.name)
+            resources.get_lexical(corpus.name)
+        self.embeddings = resources.get_embeddings()
+        self.cache = resources.get_query_cache()
+        self.ticketing = resources.get_ticketing()
+        if self.use_router:
+            self.router = resources.get_query_router()
+        if not self.retrieval_only:
+            from agent.agent import agent
+
+            self.agent = agent
+            resources.get_llm_with_tools(self.cfg.cascade_models[0])
+
+    async def start_batcher(self) -> None:
+        self.batcher = EmbeddingBatcher(
+            self.embeddings,
+            self.embed_executor,
+            self.stats,
+            max_size=self.cfg.batch_max_size,
+            max_wait_ms=self.cfg.batch_max_wait_ms,
+        )
+        self._batcher_task = asyncio.create_task(self.batcher.run())
+
+    async def handle_query(self, query: str) -> dict:
+        loop = asyncio.get_running_loop()
+        timings: Dict[str, float] = {}
+        self.in_flight += 1
+        t_start = time.perf_counter()
+        try:
+            vec = None
+            if self.router is not None or self.cache.semantic_distance is not None:
+                t0 = time.perf_counter()
+                vec = await self.batcher.embed(query)
+                timings["embed"] = time.perf_counter() - t0
+
+            intent = None
+            if self.router is not None:
+                t0 = time.perf_counter()
+                intent = self.router.route(query, vec)
+                timings["route"] = time.perf_counter() - t0
+                result, intent = await self._shortcut(query, vec, intent, timings)
+                if result is not None:
+                    return self._finish(result, timings, t_start)
+
+            hits = self.cache.get_hits(query, embedding=vec)
+            if hits is None:
+                if vec is None:
+                    t0 = time.perf_counter()
+                    vec = await self.batcher.embed(query)
+                    timings["embed"] = time.perf_counter() - t0
+
+                t0 = time.perf_counter()
+                search = functools.partial(resources.get_shards().search_by_vector, query=query)
+                hits = await loop.run_in_executor(self.executor, search, vec, self.cfg.top_k)
+                timings["search"] = time.perf_counter() - t0
+                self.cache.put_hits(query, hits, embedding=vec)
+
+            t0 = time.perf_counter()
+            decision = decide(hits, max_distance=self.cfg.max_distance)
+            timings["decide"] = time.perf_counter() - t0
+
+            result = {"query": query}
+            if intent is not None:
+                result["intent"] = intent_json(intent)
+            result.update({
+                "decision": {"action": decision.action, "reason": decision.reason, "best_distance": float(decision.best_distance)},
+                "hits": [
+                    {"corpus": doc.metadata.get("corpus"), "filename": doc.metadata.get("filename"),
+                     "page": doc.metadata.get("page"), "distance": float(dist)}
+                    for doc, dist in hits
+                ],
+            })
+
+            if decision.action == "ticket":
+                if vec is None and self.ticketing.fold_distance is not None:
+                    vec = await self.batcher.embed(query)  # for near-duplicate folding
+                t0 = time.perf_counter()
+                t = await loop.run_in_executor(
+                    self.executor, functools.partial(open_gap_ticket, self.ticketing, query, decision, hits, vec)
+                )
+                timings["ticket"] = time.perf_counter() - t0
+                result["ticket_id"] = t.id
+                result["ticket_count"] = t.count
+            elif not self.retrieval_only:
+                answer = self.cache.get_answer(query, hits)
+                if answer is None:
+                    route = choose_route(query, decision.best_distance, self.cfg)
+                    resources.get_cascade_stats().record_route(route)
+                    t0 = time.perf_counter()
+                    if intent is not None and intent.path == "docs":
+                        state = await aanswer_once(query, hits, max_tokens=self.cfg.context_max_tokens, model=route.model)
+                    else:
+                        state = await arun_agent(
+                            self.agent, query, hits, max_tokens=self.cfg.context_max_tokens, model=route.model
+                        )
+                    timings["agent"] = time.perf_counter() - t0
+                    answer = {
+                        "answer": state["messages"][-1].content,
+                        "llm_calls": state.get("llm_calls", 0),
+                        "route": {"model": route.model, "reason": route.reason},
+                        "answered_by": state.get("model", route.model),
+                        "prompt_tokens": [size["tokens"] for size in state.get("prompt_sizes", [])],
+                    }
+                    if "ticket_id" in state:
+                        # Hit the LLM call limit: report the ticket and don't cache the non-answer
+                        answer["ticket_id"] = state["ticket_id"]
+                    else:
+                        self.cache.put_answer(query, hits, answer)
+                result.update(answer)
+
+            return self._finish(result, timings, t_start)
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.in_flight -= 1
+
+    async def _shortcut(
+        self, query: str, vec: List[float], intent: Intent, timings: Dict[str, float]
+    ) -> Tuple[Optional[dict], Intent]:
+        """The result of a "csv" or "ticket" route, or None to search; a lookup that finds nothing falls back."""
+        loop = asyncio.get_running_loop()
+        if intent.path == "csv":
+            t0 = time.perf_counter()
+            answer = await loop.run_in_executor(self.executor, run_lookup, intent)
+            timings["lookup"] = time.perf_counter() - t0
+            if answer is not None:
+                return {"query": query, "intent": intent_json(intent), "answer": answer, "llm_calls": 0}, intent
+            intent = fallback(intent, "lookup_empty")
+        if intent.path == "ticket":
+            t0 = time.perf_counter()
+            t = await loop.run_in_executor(
+                self.executor, functools.partial(open_route_ticket, self.ticketing, query, intent, vec)
+            )
+            timings["ticket"] = time.perf_counter() - t0
+            return {"query": query, "intent": intent_json(intent), "ticket_id": t.id, "ticket_count": t.count}, intent
+        return None, intent
+
+    def _finish(self, result: dict, timings: Dict[str, float], t_start: float) -> dict:
+        timings["total"] = time.perf_counter() - t_start
+        for stage, seconds in timings.items():
+            self.stats.record(stage, seconds)
+        self.completed += 1
+        result["timings_ms"] = {stage: round(s * 1000, 3) for stage, s in timings.items()}
+        return result
+
+    def snapshot(self) -> dict:
+        batch_sizes = list(self.batcher.batch_sizes) if self.batcher else []
+        return {
+            "in_flight": self.in_flight,
+            "embed_queue_depth": self.batcher.queue.qsize() if self.batcher else 0,
+            "completed": self.completed,
+            "failed": self.failed,
+            "avg_embed_batch": round(sum(batch_sizes) / len(batch_sizes), 2) if batch_sizes else 0.0,
+            "stages": self.stats.summary(),
+            "embedding_cache": self.embeddings.cache.stats() if hasattr(self.embeddings, "cache") else None,
+            "query_cache": self.cache.stats(),
+            "cascade": resources.get_cascade_stats().summary(),
+            "tools": resources.get_tool_pool().stats(),
+            "trace": tracing.summary() if tracing.enabled() else None,
+        }
+
+
+async def _read_request(reader: asyncio.StreamReader) -> Tuple[str, str, bytes]:
+    request_line = (await reader.readline()).decode("latin-1").strip()
+    method, path, _ = request_line.split(" ", 2)
+    length = 0
+    while True:
+        line = (await reader.readline()).decode("latin-1").strip()
+        if not line:
+            break
+        name, _, value = line.partition(":")
+        if name.lower() == "content-length":
+            length = int(value.strip())
+    body = await reader.readexactly(length) if length else b""
+    return method, path, body
+
+
+def _response(status: str, payload: dict) -> bytes:
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    head = (
+        f"HTTP/1.1 {status}\r\n"
+        "Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        "Connection: close\r\n\r\n"
+    )
+    return head.encode("latin-1") + body
+
+
+def make_handler(service: QueryService):
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            method, path, body = await _read_request(reader)
+            if method == "GET" and path == "/health":
+                out = _response("200 OK", {"status": "ok"})
+            elif method == "GET" and path == "/stats":
+                out = _response("200 OK", service.snapshot())
+            elif method == "POST" and path == "/query":
+                query = str(json.loads(body or b"{}").get("query", "")).strip()
+                if not query:
+                    out = _response("400 Bad Request", {"error": "missing 'query'"})
+                else:
+                    out = _response("200 OK", await service.handle_query(query))
+            else:
+                out = _response("404 Not Found", {"error": f"no route for {method} {path}"})
+        except (ValueError, asyncio.IncompleteReadError) as e:
+            out = _response("400 Bad Request", {"error": str(e)})
+        except Exception as e:
+            out = _response("500 Internal Server Error", {"error": f"{type(e).__name__}: {e}"})
+        writer.write(out)
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    return handle
+
+
+async def serve(host: str, port: int, retrieval_only: bool = False, router: Optional[bool] = None) -> None:
+    service = QueryService(retrieval_only=retrieval_only, router=router)
+    msg.info("Warming up index, embeddings and agent...")
+    await asyncio.get_running_loop().run_in_executor(None, service.warm_up)
+    await service.start_batcher()
+
+    server = await asyncio.start_server(make_handler(service), host, port)
+    msg.good(f"Serving on http://{host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+def main() -> None:
+    cfg = resources.get_config()
+    parser = argparse.ArgumentParser(description="Run the warm query service.")
+    parser.add_argument("--host", default=cfg.server_host)
+    parser.add_argument("--port", type=int, default=cfg.server_port)
+    parser.add_argument("--retrieval-only", action="store_true", help="Skip the agent; return decision and hits only.")
+    parser.add_argument("--no-router", dest="router", action="store_false", default=cfg.query_router,
+                        help="skip the pre-retrieval router; every query takes retrieval + the agent loop")
+    parser.add_argument("--trace", action="store_true", help="Record spans (see tracing.py) and report them in /stats.")
+    args = parser.parse_args()
+    tracing.configure(cfg, "server", trace=cfg.trace or args.trace)
+    try:
+        asyncio.run(serve(args.host, args.port, retrieval_only=args.retrieval_only, router=args.router))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Prompt growth across agent loop iterations, with and without history compaction.
+
+    python -m bench.agent_history --tool-turns 5 --rows 2000
+
+A scripted stand-in model (bench.fake_llm) calls retrieve_sources and search_csv for
+`--tool-turns` turns before answering, over a small synthetic PDF + CSV corpus. The
+table shows the prompt tokens sent on each LLM call and the time per question for
+verbatim history vs. the configured compaction; the last run sets the call limit
+below the number of turns to show the ticket fallback.
+"""
+import argparse
+import logging
+import statistics
+import tempfile
+import time
+from dataclasses import replace
+from pathlib import Path
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tool-turns", type=int, default=5)
+    parser.add_argument("--rows", type=int, default=2000, help="rows per synthetic CSV table")
+    parser.add_argument("--questions", type=int, default=10)
+    parser.add_argument("--history-turns", type=int, default=2)
+    parser.add_argument("--tool-output-max-tokens", type=int, default=1500)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+    import resources
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+
+    from bench.fake_llm import ScriptedChatModel
+    from bench.synthetic import WORDS, make_csv_corpus, make_pdf_corpus
+    from config import Config
+    from rag.ingest import ingest_folder
+    from rag.retrieve import load_index, search_with_scores
+
+    tmp = Path(tempfile.mkdtemp())
+    make_pdf_corpus(tmp / "pdf", n_files=4, pages_per_file=5)
+    make_csv_corpus(tmp / "csv", rows_per_table=args.rows)
+    base = Config(source_dir=tmp / "pdf", index_dir=tmp / "index", csv_dir=tmp / "csv",
+                  embed_cache_dir=None, ticket_backend="memory", cascade=False)
+    embeddings = DeterministicFakeEmbedding(size=384)
+    ingest_folder(source_dir=base.source_dir, file_type="pdf", index_dir=base.index_dir, embed_model=base.embed_model,
+                  min_chars_per_page=base.min_chars_per_page, chunk_size=base.chunk_size,
+                  chunk_overlap=base.chunk_overlap, incremental=False, embeddings=embeddings)
+    vs = load_index(base.index_dir, base.embed_model, embeddings=embeddings)
+    questions = [" ".join(WORDS[i:i + 5]) for i in range(args.questions)]
+    hits_by_question = {q: search_with_scores(vs, q, base.top_k) for q in questions}
+
+    runs = {
+        "verbatim": replace(base, history_turns=None, tool_output_max_tokens=None,
+                            agent_max_llm_calls=args.tool_turns + 1),
+        "compacted": replace(base, history_turns=args.history_turns, tool_output_max_tokens=args.tool_output_max_tokens,
+                             agent_max_llm_calls=args.tool_turns + 1),
+        "call limit": replace(base, history_turns=args.history_turns, tool_output_max_tokens=args.tool_output_max_tokens,
+                              agent_max_llm_calls=max(1, args.tool_turns // 2)),
+    }
+    for label, cfg in runs.items():
+        resources.reset()
+        resources.override("config", cfg)
+        resources.override("embeddings", embeddings)
+        resources.override("llm:qwen", ScriptedChatModel(csv_table="conditions", tool_turns=args.tool_turns))
+        from agent.agent import agent
+        from app.pipeline import run_agent
+
+        run_agent(agent, questions[0], hits_by_question[questions[0]], max_tokens=cfg.context_max_tokens)  # warm-up
+        samples, states = [], []
+        for q in questions:
+            t0 = time.perf_counter()
+            states.append(run_agent(agent, q, hits_by_question[q], max_tokens=cfg.context_max_tokens))
+            samples.append(time.perf_counter() - t0)
+        per_call = [size["tokens"] for size in states[0]["prompt_sizes"]]
+        tickets = sum("ticket_id" in s for s in states)
+        print(f"{label:<11} {1000 * statistics.mean(samples):>8.1f} ms/question  llm_calls={states[0]['llm_calls']}"
+              f"  tickets={tickets}/{len(states)}  prompt tokens per call: {per_call}")
+
+
+if __name__ == "__main__":
+    main()
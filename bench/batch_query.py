@@ -0,0 +1,111 @@
+"""Batch query mode (app/batch.py) vs answering the same questions one at a time.
+
+    python -m bench.batch_query --questions 500 --llm-latency 0.02 --concurrency 1 4 8
+
+Both run in this process over a small synthetic corpus, with deterministic fake
+embeddings and bench.fake_llm standing in for the model, so the gap shown is the
+batching and concurrency alone; separate `query_cli` processes would each also pay
+the startup measured by bench.startup. The last line interrupts a batch run halfway
+(a torn output line included), resumes it and checks every id was answered exactly once.
+"""
+import argparse
+import json
+import logging
+import tempfile
+import time
+from collections import Counter
+from dataclasses import replace
+from pathlib import Path
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, default=500)
+    parser.add_argument("--llm-latency", type=float, default=0.02, help="seconds per fake LLM call")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+    import random
+
+    import resources
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+
+    from agent.router import choose_route
+    from app.batch import run_batch
+    from bench.fake_llm import ScriptedChatModel
+    from bench.synthetic import WORDS, make_pdf_corpus
+    from config import Config
+    from rag.decision import decide
+    from rag.ingest import ingest_folder
+    from rag.retrieve import load_index, search_with_scores
+
+    tmp = Path(tempfile.mkdtemp())
+    make_pdf_corpus(tmp / "pdf", n_files=8, pages_per_file=5)
+    cfg = Config(source_dir=tmp / "pdf", index_dir=tmp / "index", embed_cache_dir=None,
+                 ticket_backend="memory", cascade=False)
+    embeddings = DeterministicFakeEmbedding(size=384)
+    ingest_folder(source_dir=cfg.source_dir, file_type="pdf", index_dir=cfg.index_dir, embed_model=cfg.embed_model,
+                  min_chars_per_page=cfg.min_chars_per_page, chunk_size=cfg.chunk_size,
+                  chunk_overlap=cfg.chunk_overlap, incremental=False, embeddings=embeddings)
+    rng = random.Random(0)
+    lines = [json.dumps({"id": f"q{i}", "query": " ".join(rng.sample(WORDS, 8))}) for i in range(args.questions)]
+    # Fake embeddings have no natural distance scale: threshold at the median so about half get answered
+    vs = load_index(cfg.index_dir, cfg.embed_model, embeddings=embeddings)
+    best = sorted(decide(search_with_scores(vs, json.loads(line)["query"], cfg.top_k), 1e9).best_distance for line in lines)
+    cfg = replace(cfg, max_distance=best[len(best) // 2])
+    source = tmp / "questions.jsonl"
+    source.write_text("\n".join(lines) + "\n")
+
+    def fresh() -> None:
+        resources.reset()
+        resources.override("config", cfg)
+        resources.override("embeddings", embeddings)
+        resources.override("llm:qwen", ScriptedChatModel(latency_s=args.llm_latency))
+
+    fresh()
+    from agent.agent import agent
+    from app.pipeline import open_gap_ticket, run_agent
+
+    vs, ticketing = resources.get_index(), resources.get_ticketing()
+    t0 = time.perf_counter()
+    for line in lines:
+        query = json.loads(line)["query"]
+        hits = search_with_scores(vs, query, cfg.top_k, lexical=resources.get_lexical(),
+                                  candidates=cfg.hybrid_candidates, rrf_k=cfg.rrf_k)
+        decision = decide(hits, cfg.max_distance)
+        if decision.action == "ticket":
+            open_gap_ticket(ticketing, query, decision, hits)
+        else:
+            run_agent(agent, query, hits, max_tokens=cfg.context_max_tokens,
+                      model=choose_route(query, decision.best_distance, cfg).model)
+    single = time.perf_counter() - t0
+    print(f"{'mode':<28}{'total s':>9}{'queries/s':>11}")
+    print(f"{'one at a time':<28}{single:>9.2f}{args.questions / single:>11.1f}")
+
+    for concurrency in args.concurrency:
+        fresh()
+        t0 = time.perf_counter()
+        with open(source) as f:
+            counts = run_batch(f, tmp / f"out-{concurrency}.jsonl", args.batch_size, concurrency)
+        elapsed = time.perf_counter() - t0
+        label = f"batch={args.batch_size} concurrency={concurrency}"
+        print(f"{label:<28}{elapsed:>9.2f}{args.questions / elapsed:>11.1f}   {counts}")
+
+    # Resume: keep the first half of a finished run plus half of the next line, then rerun
+    out = tmp / f"out-{args.concurrency[-1]}.jsonl"
+    kept = out.read_text().splitlines(keepends=True)
+    half = len(kept) // 2
+    out.write_text("".join(kept[:half]) + kept[half][: len(kept[half]) // 2])
+    fresh()
+    with open(source) as f:
+        counts = run_batch(f, out, args.batch_size, args.concurrency[-1])
+    ids = Counter(json.loads(line)["id"] for line in out.read_text().splitlines() if line.startswith("{") and line.endswith("}"))
+    ok = len(ids) == args.questions and max(ids.values()) == 1
+    print(f"\nresume after {half} results: {counts} -> {len(ids)} distinct ids, "
+          f"{'each once' if ok else 'DUPLICATES OR GAPS'}")
+
+
+if __name__ == "__main__":
+    main()
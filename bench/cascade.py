@@ -0,0 +1,118 @@
+"""Model cascade with local stand-in models: routing, escalation rate and per-model latency.
+
+    python -m bench.cascade --questions 60 --fail-rate 0.15 --failure empty
+
+"qwen" and "gemini" are bench.fake_llm.ScriptedChatModel instances with the given
+latencies; the cheap one fails `--fail-rate` of the questions in the `--failure` way.
+Each strategy (always cheap, always strong, cascade) answers the same questions over
+a small synthetic corpus; the table shows wall time, LLM calls and how many questions
+ended without a usable answer.
+"""
+import argparse
+import random
+import statistics
+import tempfile
+import time
+from dataclasses import replace
+from pathlib import Path
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, default=60)
+    parser.add_argument("--cheap-latency", type=float, default=0.02)
+    parser.add_argument("--strong-latency", type=float, default=0.05)
+    parser.add_argument("--fail-rate", type=float, default=0.15)
+    parser.add_argument("--failure", choices=["empty", "unknown_tool", "error", "slow"], default="empty")
+    parser.add_argument("--timeout", type=float, default=0.5, help="llm_timeout_s for the run")
+    parser.add_argument("--easy-distance", type=float, default=None,
+                        help="cascade_easy_distance (default: median best distance of the questions, since fake embeddings have no natural scale)")
+    args = parser.parse_args()
+
+    import logging
+
+    logging.basicConfig(level=logging.ERROR)
+    import resources
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+
+    from agent.router import CascadeStats, choose_route
+    from bench.fake_llm import ScriptedChatModel
+    from bench.synthetic import WORDS, make_pdf_corpus
+    from config import Config
+    from rag.decision import decide
+    from rag.ingest import ingest_folder
+    from rag.retrieve import load_index, search_with_scores
+
+    tmp = Path(tempfile.mkdtemp())
+    make_pdf_corpus(tmp / "pdf", n_files=4, pages_per_file=5)
+    base = Config(source_dir=tmp / "pdf", index_dir=tmp / "index", embed_cache_dir=None,
+                  ticket_backend="memory", llm_timeout_s=args.timeout)
+    embeddings = DeterministicFakeEmbedding(size=384)
+    ingest_folder(source_dir=base.source_dir, file_type="pdf", index_dir=base.index_dir, embed_model=base.embed_model,
+                  min_chars_per_page=base.min_chars_per_page, chunk_size=base.chunk_size,
+                  chunk_overlap=base.chunk_overlap, incremental=False, embeddings=embeddings)
+
+    rng = random.Random(0)
+    questions = []
+    for i in range(args.questions):
+        words = rng.sample(WORDS, rng.choice((4, 8, 30)))
+        if i % 5 == 0:
+            words.append("medications")  # needs a table lookup
+        questions.append(" ".join(words))
+
+    vs = load_index(base.index_dir, base.embed_model, embeddings=embeddings)
+    hits_by_question = {q: search_with_scores(vs, q, base.top_k) for q in questions}
+    easy_distance = args.easy_distance
+    if easy_distance is None:
+        easy_distance = statistics.median(decide(h, base.max_distance).best_distance for h in hits_by_question.values())
+    base = replace(base, cascade_easy_distance=easy_distance)
+
+    strategies = {
+        "cheap only": replace(base, cascade=False, cascade_models=("qwen",)),
+        "strong only": replace(base, cascade=False, cascade_models=("gemini",)),
+        "cascade": replace(base, cascade=True, cascade_models=("qwen", "gemini")),
+    }
+    print(f"{'strategy':<14}{'total s':>9}{'p50 ms':>9}{'p95 ms':>9}{'llm calls':>11}{'unanswered':>12}{'escalated':>11}")
+    for label, cfg in strategies.items():
+        resources.reset()
+        resources.override("config", cfg)
+        resources.override("embeddings", embeddings)
+        resources.override("cascade_stats", CascadeStats())
+        resources.override("llm:qwen", ScriptedChatModel(
+            latency_s=args.cheap_latency, fail_rate=args.fail_rate, failure=args.failure, slow_s=2 * args.timeout,
+        ))
+        resources.override("llm:gemini", ScriptedChatModel(latency_s=args.strong_latency))
+        from agent.agent import agent
+        from app.pipeline import run_agent
+
+        samples, calls, unanswered = [], [], 0
+        t_start = time.perf_counter()
+        for q in questions:
+            hits = hits_by_question[q]
+            route = choose_route(q, decide(hits, cfg.max_distance).best_distance, cfg)
+            resources.get_cascade_stats().record_route(route)
+            t0 = time.perf_counter()
+            try:
+                state = run_agent(agent, q, hits, max_tokens=cfg.context_max_tokens, model=route.model)
+            except Exception:
+                unanswered += 1
+                continue
+            finally:
+                samples.append(time.perf_counter() - t0)
+            calls.append(state["llm_calls"])
+            unanswered += not str(state["messages"][-1].content).startswith("- Answer")
+        total = time.perf_counter() - t_start
+        ordered = sorted(samples)
+        stats = resources.get_cascade_stats().summary()
+        print(f"{label:<14}{total:>9.2f}{1000 * ordered[len(ordered) // 2]:>9.1f}"
+              f"{1000 * ordered[int(0.95 * len(ordered))]:>9.1f}{statistics.mean(calls):>11.2f}"
+              f"{unanswered:>12}{stats['escalation_rate']:>11.1%}")
+        if label == "cascade":
+            print("\nroutes:", stats["routes"])
+            print("escalations:", stats["escalations"])
+            for model, m in stats["models"].items():
+                print(f"  {model:<8} calls={m['calls']:<5} p50={m['p50_ms']:.1f} ms p95={m['p95_ms']:.1f} ms {m['outcomes']}")
+
+
+if __name__ == "__main__":
+    main()
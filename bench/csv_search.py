@@ -0,0 +1,81 @@
+"""Cold/warm latency of the cached `search_csv` lookup versus the original full-scan implementation.
+
+Run from the repo root:
+
+    python -m bench.csv_search --data-dir documents/medical_documents
+"""
+import argparse
+import statistics
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from rag.tables import CSV_FILES, TableCache
+
+
+QUERIES = [
+    ("conditions", "diabetes", None),
+    ("conditions", "sinusitis", "DESCRIPTION"),
+    ("medications", "insulin", None),
+    ("encounters", "ambulatory", "ENCOUNTERCLASS"),
+    ("encounters", "check up", None),
+    ("patients", "45dff467", None),
+    ("allergies", "peanut", None),
+    ("immunizations", "influenza", None),
+    ("careplans", "diabetes self management", None),
+]
+
+
+def legacy_search(path: Path, search_term: str, column=None) -> pd.DataFrame:
+    """The pre-cache implementation: parse the CSV and scan every column on each call."""
+    df = pd.read_csv(path)
+    if column:
+        mask = df[column].astype(str).str.contains(search_term, case=False, na=False, regex=False)
+    else:
+        mask = pd.Series([False] * len(df))
+        for col in df.columns:
+            mask |= df[col].astype(str).str.contains(search_term, case=False, na=False, regex=False)
+    return df[mask]
+
+
+def timed(fn, repeat: int = 1):
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return out, samples
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--data-dir", type=Path, default=Path("documents/medical_documents"))
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    cache = TableCache(args.data_dir)
+    print(f"{'table':<14}{'term':<26}{'rows':>6}{'legacy ms':>12}{'cold ms':>10}{'warm ms':>10}{'speedup':>9}")
+    for table, term, column in QUERIES:
+        path = args.data_dir / CSV_FILES[table]["file"]
+        if not path.exists():
+            continue
+
+        expected, legacy = timed(lambda: legacy_search(path, term, column), repeat=max(1, args.repeat // 4))
+        cache.clear()
+        rows, cold = timed(lambda: cache.get(table).search(term, column))
+        _, warm = timed(lambda: cache.get(table).search(term, column), repeat=args.repeat)
+
+        if list(rows) != expected.index.tolist():
+            raise AssertionError(f"result mismatch for {table!r} / {term!r}")
+
+        legacy_ms = statistics.median(legacy)
+        warm_ms = statistics.median(warm)
+        print(
+            f"{table:<14}{term:<26}{len(rows):>6}{legacy_ms:>12.2f}{cold[0]:>10.2f}{warm_ms:>10.3f}"
+            f"{legacy_ms / warm_ms:>8.0f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""Chunks, embedding time, index size and what retrieval loses with near-duplicate elimination.
+
+    python -m bench.dedup --thresholds 0.7 0.9 --chunk-sizes 2000 500
+    python -m bench.dedup --backend onnx --model path/to/local/model
+    python -m bench.dedup --stand-in     # hashed bag-of-words embeddings, no model needed
+
+Ingests the PDF and CSV folders (by default the ista brochures and the medical tables
+under documents/) from scratch once per setting, with the configured embedding model
+unless --model/--backend say otherwise. "embed s" is time spent inside the embedding
+model; "index MB" is the size of the saved index directory.
+
+"lost words" counts, over all dropped chunks, the words a dropped chunk has that none of
+the kept chunks listing its page (or rows) in their "sources" contain: text such as the
+product name in a brochure section repeated for several devices, which dedup made
+unsearchable. "hit@k" checks retrieval for what was dropped. Every chunk dropped at the
+lowest threshold becomes a query (its lost words, or its text when it lost none) and
+counts as found when a top-k hit comes from its page or rows (the hit's own, or listed
+in the hit's "sources"). The same queries run against every setting, so the no-dedup
+row is the reference.
+"""
+import argparse
+import json
+import logging
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+# Words of a dropped chunk used as its query, at most
+QUERY_WORDS = 30
+
+
+class TimedEmbeddings(Embeddings):
+    def __init__(self, inner: Embeddings) -> None:
+        self.inner = inner
+        self.seconds = 0.0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        t0 = time.perf_counter()
+        try:
+            return self.inner.embed_documents(texts)
+        finally:
+            self.seconds += time.perf_counter() - t0
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.inner.embed_query(text)
+
+
+def all_chunks(vectorstore) -> Dict[str, Document]:
+    return {cid: vectorstore.docstore.search(cid) for cid in vectorstore.index_to_docstore_id.values()}
+
+
+def lost_words(everything: Dict[str, Document], kept: Dict[str, Document]) -> Dict[str, List[str]]:
+    """Per dropped chunk, its words (in text order) missing from the chunks it was folded into."""
+    from rag.dedup import source_entry, words
+
+    folded_into: Dict[str, set] = {}
+    for doc in kept.values():
+        for source in doc.metadata.get("sources", ()):
+            folded_into.setdefault(json.dumps(source, sort_keys=True), set()).update(words(doc.page_content))
+    lost = {}
+    for cid, doc in everything.items():
+        if cid not in kept:
+            vocabulary = folded_into.get(json.dumps(source_entry(doc.metadata), sort_keys=True), set())
+            lost[cid] = [w for w in dict.fromkeys(words(doc.page_content)) if w not in vocabulary]
+    return lost
+
+
+def found(hits, expected: dict) -> bool:
+    from rag.dedup import source_entry
+
+    return any(expected == source_entry(doc.metadata) or expected in doc.metadata.get("sources", ()) for doc, _ in hits)
+
+
+def main() -> None:
+    from config import Config
+
+    cfg = Config()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf-dir", type=Path, default=Path("documents/ista_documents"))
+    parser.add_argument("--csv-dir", type=Path, default=Path("documents/medical_documents"))
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.7, cfg.dedup_threshold or 0.9])
+    parser.add_argument("--chunk-sizes", type=int, nargs="+", default=[cfg.chunk_size, 500])
+    parser.add_argument("--model", default=cfg.embed_model)
+    parser.add_argument("--backend", default=cfg.embed_backend)
+    parser.add_argument("--stand-in", action="store_true", help="hashed bag-of-words embeddings instead of --model")
+    parser.add_argument("--retrieval-mode", choices=["dense", "hybrid"], default=cfg.retrieval_mode)
+    parser.add_argument("--k", type=int, default=cfg.top_k)
+    parser.add_argument("--file-types", nargs="+", choices=["pdf", "csv"], default=["pdf", "csv"])
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+    from rag.dedup import source_entry, words
+    from rag.embeddings import make_embeddings
+    from rag.ingest import ingest_folder
+    from rag.lexical import load_lexical
+    from rag.retrieve import load_index, search_with_scores
+
+    if args.stand_in:
+        from bench.query_router import HashedEmbeddings
+
+        embeddings = TimedEmbeddings(HashedEmbeddings())
+    else:
+        embeddings = TimedEmbeddings(make_embeddings(args.model, backend=args.backend, batch_size=cfg.embed_batch_size))
+    tmp = Path(tempfile.mkdtemp())
+    print(f"{'corpus':<8}{'chunk':>7}{'dedup':>7}{'chunks':>8}{'dropped':>9}{'embed s':>9}{'ingest s':>10}"
+          f"{'index MB':>10}{'lost words':>12}{f'hit@{args.k}':>8}")
+    sources = {"pdf": args.pdf_dir, "csv": args.csv_dir}
+    for file_type in args.file_types:
+        source = sources[file_type]
+        for chunk_size in args.chunk_sizes:
+            runs = []
+            for threshold in [None, *sorted(args.thresholds)]:
+                index_dir = tmp / f"{file_type}-{chunk_size}-{threshold}"
+                embeddings.seconds = 0.0
+                t0 = time.perf_counter()
+                report = ingest_folder(
+                    source_dir=source, file_type=file_type, index_dir=index_dir, embed_model=args.model,
+                    min_chars_per_page=cfg.min_chars_per_page, chunk_size=chunk_size,
+                    chunk_overlap=min(cfg.chunk_overlap, chunk_size // 4), incremental=False,
+                    embeddings=embeddings, csv_rows_per_chunk=cfg.csv_rows_per_chunk,
+                    dedup_threshold=threshold,
+                )
+                elapsed = time.perf_counter() - t0
+                size = sum(p.stat().st_size for p in index_dir.rglob("*") if p.is_file()) / 2**20
+                runs.append((threshold, report, embeddings.seconds, elapsed, size, index_dir))
+
+            # Chunk ids are stable across runs: a chunk missing from a deduped index was dropped
+            stores = [load_index(index_dir, args.model, embeddings=embeddings) for *_, index_dir in runs]
+            chunks = [all_chunks(vs) for vs in stores]
+            queries: List[Tuple[str, dict]] = []
+            if len(runs) > 1:
+                for cid, lost in lost_words(chunks[0], chunks[1]).items():
+                    doc = chunks[0][cid]
+                    text = " ".join((lost or words(doc.page_content))[:QUERY_WORDS])
+                    queries.append((text, source_entry(doc.metadata)))
+
+            for (threshold, report, embed_s, elapsed, size, index_dir), vs, kept in zip(runs, stores, chunks):
+                lost = sum(len(ws) for ws in lost_words(chunks[0], kept).values())
+                lexical = load_lexical(index_dir) if args.retrieval_mode == "hybrid" else None
+                hits = sum(found(search_with_scores(vs, q, args.k, lexical=lexical), expected) for q, expected in queries)
+                recall = f"{hits / len(queries):.0%}" if queries else "-"
+                print(f"{file_type:<8}{chunk_size:>7}{threshold or '-':>7}{report.chunks_embedded:>8}"
+                      f"{report.chunks_duplicate:>9}{embed_s:>9.2f}{elapsed:>10.2f}{size:>10.2f}"
+                      f"{lost:>12}{recall:>8}")
+
+
+if __name__ == "__main__":
+    main()
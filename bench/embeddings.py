@@ -0,0 +1,90 @@
+"""Embedding throughput and agreement of the backends in rag/embeddings.py.
+
+    python -m bench.embeddings --chunks 2000 --threads 1 4 --batch-sizes 32 64 128
+    python -m bench.embeddings --backends onnx onnx-int8 --model path/to/local/model
+
+Chunks come from the configured source_dir if it holds PDFs, otherwise from a
+synthetic corpus. Every variant embeds the same chunks; the table shows chunks/s and
+the cosine similarity of its vectors to those of the first backend listed (by default
+fp32 sentence-transformers, "hf"), plus how often the top-4 neighbours of 100 sample
+chunks stay the same.
+"""
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from rag.embeddings import OnnxEmbeddings, make_embeddings
+
+
+def load_chunks(n: int) -> list:
+    from config import Config
+    from rag.ingest import chunk_docs, filter_pages, list_files, load_files
+
+    cfg = Config()
+    source = Path(cfg.source_dir)
+    if not (source.is_dir() and list_files(source, "pdf")):
+        from bench.synthetic import make_pdf_corpus
+
+        source = Path(tempfile.mkdtemp())
+        make_pdf_corpus(source, n_files=max(1, n // 8), pages_per_file=5)
+    docs = filter_pages(load_files(source, "pdf"), cfg.min_chars_per_page)
+    chunks = [d.page_content for d in chunk_docs(docs, cfg.chunk_size, cfg.chunk_overlap)]
+    # Mix in short texts (titles, CSV-like rows) so batches have uneven lengths
+    chunks += [c[:200] for c in chunks[: len(chunks) // 2]]
+    random.Random(0).shuffle(chunks)
+    return chunks[:n]
+
+
+BACKENDS = {
+    "hf": lambda model, t, b: make_embeddings(model, backend="hf", threads=t, batch_size=b),
+    "onnx-unsorted": lambda model, t, b: OnnxEmbeddings(model, threads=t, batch_size=b, sort_by_length=False),
+    "onnx": lambda model, t, b: OnnxEmbeddings(model, threads=t, batch_size=b),
+    "onnx-int8": lambda model, t, b: OnnxEmbeddings(model, threads=t, batch_size=b, quantize=True),
+}
+
+
+def top_k_agreement(reference: np.ndarray, vectors: np.ndarray, k: int = 4, samples: int = 100) -> float:
+    probe = np.arange(min(samples, len(reference)))
+    def neighbours(m: np.ndarray) -> np.ndarray:
+        return np.argsort(-(m[probe] @ m.T), axis=1)[:, 1:k + 1]
+    ref, got = neighbours(reference), neighbours(vectors)
+    return float(np.mean([len(set(a) & set(b)) / k for a, b in zip(ref, got)]))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--model", default="sentence-transformers/all-MiniLM-L6-v2")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[64])
+    parser.add_argument("--backends", nargs="+", choices=list(BACKENDS), default=list(BACKENDS),
+                        help="the first one listed is the reference for the agreement columns")
+    args = parser.parse_args()
+
+    texts = load_chunks(args.chunks)
+    print(f"{len(texts)} chunks, mean {np.mean([len(t) for t in texts]):.0f} chars\n")
+
+    variants = [(f"{name} t={t} b={b}", BACKENDS[name], t, b) for name in args.backends
+                for t in args.threads for b in args.batch_sizes]
+
+    reference = None
+    print(f"{'backend':<34}{'chunks/s':>10}{'cos mean':>10}{'cos min':>10}{'top4 same':>11}")
+    for label, build, threads, batch_size in variants:
+        embeddings = build(args.model, threads, batch_size)
+        embeddings.embed_documents(texts[:16])  # warm-up
+        t0 = time.perf_counter()
+        vectors = np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+        rate = len(texts) / (time.perf_counter() - t0)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        if reference is None:
+            reference = vectors  # hf fp32 (the default) is what indexes hold today
+        cos = np.sum(reference * vectors, axis=1)
+        print(f"{label:<34}{rate:>10.1f}{cos.mean():>10.5f}{cos.min():>10.5f}{top_k_agreement(reference, vectors):>11.1%}")
+
+
+if __name__ == "__main__":
+    main()
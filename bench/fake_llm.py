@@ -0,0 +1,93 @@
+"""Deterministic stand-in for the Qwen/Gemini chat models, so the agent graph runs offline."""
+import re
+import time
+import zlib
+from typing import Any, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from rag.context import count_tokens
+
+
+_QUESTION_RE = re.compile(r"QUESTION:\s*(.+)")
+
+
+class ScriptedChatModel(BaseChatModel):
+    """Calls tools for `tool_turns` turns and then answers from the tool results.
+
+    Each tool turn requests `retrieve_sources` for the question (taken from the
+    "QUESTION:" line of the prompt) and, if `csv_table` is set, `search_csv` on that
+    table. The turn number travels in the tool call ids, so it survives history
+    compaction. The final turn returns an answer quoting the start of the last tool
+    result. `latency_s` is slept per call to stand in for model time; token usage is
+    reported with the same chars/4 estimate the context builder uses.
+
+    Without tools bound (`bind_tools` returns a copy that has them) it answers at once
+    from the start of the prompt's context, as the router's single-call "docs" path expects.
+
+    `fail_rate` makes that share of questions (picked by a hash of the question, so
+    the same ones every run) fail on the first turn with `failure`: "empty" (no text,
+    no tool calls), "unknown_tool", "error" (raises) or "slow" (sleeps `slow_s`).
+    """
+
+    latency_s: float = 0.0
+    csv_table: Optional[str] = None
+    csv_term: str = "diabetes"
+    fail_rate: float = 0.0
+    failure: str = "empty"
+    slow_s: float = 1.0
+    tool_turns: int = 1
+    tools_bound: bool = False
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted-fake"
+
+    def bind_tools(self, tools: Any, **kwargs: Any) -> "ScriptedChatModel":
+        return self.model_copy(update={"tools_bound": True})
+
+    def _reply(self, messages: List[BaseMessage]) -> AIMessage:
+        last = messages[-1]
+        turn = int(last.tool_call_id.split("_")[1]) + 1 if isinstance(last, ToolMessage) else 0
+        if not self.tools_bound:
+            context = str(last.content).partition("CONTEXT:")[2].strip()[:200].replace("\n", " ")
+            return AIMessage(content=f"- Answer: based on the sources, {context}\n- Sources: S1")
+        if turn >= self.tool_turns:
+            text = str(last.content)[:200].replace("\n", " ")
+            return AIMessage(content=f"- Answer: based on the sources, {text}\n- Sources: S1")
+
+        prompt = next((str(m.content) for m in messages if isinstance(m, HumanMessage)), "")
+        match = _QUESTION_RE.search(prompt)
+        question = match.group(1).strip() if match else prompt[:200]
+        if turn == 0 and self.fail_rate and zlib.crc32(question.encode("utf-8")) % 1000 < 1000 * self.fail_rate:
+            if self.failure == "error":
+                raise RuntimeError("scripted model failure")
+            if self.failure == "slow":
+                time.sleep(self.slow_s)
+            elif self.failure == "unknown_tool":
+                return AIMessage(content="", tool_calls=[{"name": "no_such_tool", "args": {}, "id": f"call_{turn}_0"}])
+            else:
+                return AIMessage(content="")
+        calls = [{"name": "retrieve_sources", "args": {"query": question}, "id": f"call_{turn}_0"}]
+        if self.csv_table:
+            calls.append({
+                "name": "search_csv",
+                "args": {"table": self.csv_table, "search_term": self.csv_term},
+                "id": f"call_{turn}_1",
+            })
+        return AIMessage(content="", tool_calls=calls)
+
+    def _generate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        reply = self._reply(messages)
+        input_tokens = sum(count_tokens(str(m.content)) for m in messages)
+        output_tokens = count_tokens(str(reply.content)) + 10 * len(reply.tool_calls)
+        reply.usage_metadata = {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+        }
+        return ChatResult(generations=[ChatGeneration(message=reply)])
@@ -0,0 +1,75 @@
+"""Dense vs hybrid (dense + BM25, reciprocal rank fusion) retrieval on a labelled query set.
+
+Each line of the query file is {"query": ..., "relevant": [filenames]}; a query counts as
+found at k when any of its top-k chunks comes from a relevant file. Run against an
+ingested index (hybrid needs the bm25.json ingest saves with it):
+
+    python -m bench.hybrid_eval --queries bench/data/ista_queries.jsonl --k 4
+    python -m bench.hybrid_eval --agent      # also average llm_calls per query (needs the LLM)
+"""
+import argparse
+import json
+import time
+from pathlib import Path
+
+import resources
+from rag.decision import decide
+from rag.lexical import load_lexical
+from rag.retrieve import search_with_scores
+
+
+def evaluate(vs, lexical, queries, k: int, candidates: int, rrf_k: int, max_distance: float) -> dict:
+    found = rr = answered = 0.0
+    t0 = time.perf_counter()
+    for q in queries:
+        hits = search_with_scores(vs, q["query"], k, lexical=lexical, candidates=candidates, rrf_k=rrf_k)
+        ranks = [i for i, (doc, _) in enumerate(hits) if doc.metadata.get("filename") in q["relevant"]]
+        found += bool(ranks)
+        rr += 1.0 / (ranks[0] + 1) if ranks else 0.0
+        answered += decide(hits, max_distance=max_distance).action == "answer"
+    n = len(queries)
+    return {
+        f"recall@{k}": found / n,
+        "mrr": rr / n,
+        "answered": answered / n,
+        "ms/query": 1000 * (time.perf_counter() - t0) / n,
+    }
+
+
+def agent_calls(vs, lexical, queries, k: int, candidates: int, rrf_k: int) -> float:
+    from agent.agent import agent
+    from app.pipeline import run_agent
+
+    calls = 0
+    for q in queries:
+        hits = search_with_scores(vs, q["query"], k, lexical=lexical, candidates=candidates, rrf_k=rrf_k)
+        calls += run_agent(agent, q["query"], hits)["llm_calls"]
+    return calls / len(queries)
+
+
+def main() -> None:
+    cfg = resources.get_config()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=Path, default=Path("bench/data/ista_queries.jsonl"))
+    parser.add_argument("--k", type=int, default=cfg.top_k)
+    parser.add_argument("--candidates", type=int, default=cfg.hybrid_candidates)
+    parser.add_argument("--rrf-k", type=int, default=cfg.rrf_k)
+    parser.add_argument("--agent", action="store_true", help="also run the agent and report mean llm_calls")
+    args = parser.parse_args()
+
+    queries = [json.loads(line) for line in args.queries.read_text(encoding="utf-8").splitlines() if line.strip()]
+    vs = resources.get_index()
+    lexical = load_lexical(cfg.index_dir)
+    if lexical is None:
+        raise SystemExit(f"No BM25 index in {cfg.index_dir}; re-run ingest first")
+
+    print(f"{len(queries)} queries, {vs.index.ntotal} chunks, k={args.k}, candidates={args.candidates}, rrf_k={args.rrf_k}")
+    for mode, lex in (("dense", None), ("hybrid", lexical)):
+        row = evaluate(vs, lex, queries, args.k, args.candidates, args.rrf_k, cfg.max_distance)
+        if args.agent:
+            row["llm_calls"] = agent_calls(vs, lex, queries, args.k, args.candidates, args.rrf_k)
+        print(f"{mode:<8}" + "  ".join(f"{name}={value:.3f}" for name, value in row.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""Load time, memory and first-query latency of the pickle vs sqlite (memory-mapped) index formats.
+
+    python -m bench.index_load --chunks 1000000 --dim 384
+
+Builds one synthetic index (random unit vectors, ~300-character chunk texts) and
+saves it in both formats, then opens each in a fresh process: load_s is
+`rag.retrieve.load_index`, rss_mb the resident set right after loading, peak_rss_mb the
+process high-water mark, and first/p50 query the dense top-4 search including the
+chunk fetch. Memory-mapped vectors are paged in by the first search (all of them, for a
+flat index), so its first query reads the file from disk unless the page cache already
+holds it; those pages are shared and reclaimable, unlike the unpickled docstore. The
+index directory is kept with --keep DIR to rerun without rebuilding.
+"""
+import argparse
+import json
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+
+def rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * resource.getpagesize() / 2**20
+
+
+def peak_rss_mb() -> float:
+    # VmHWM, not ru_maxrss: the latter survives exec, so it would report the builder's peak
+    with open("/proc/self/status") as f:
+        return next(int(line.split()[1]) for line in f if line.startswith("VmHWM:")) / 1024
+
+
+def build(root: Path, n: int, dim: int) -> None:
+    import pickle
+
+    import faiss
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+    from langchain_core.documents import Document
+
+    from bench.synthetic import WORDS
+    from rag.docstore import write_chunk_store
+    from rag.retrieve import DOCSTORE_FILE
+
+    rng = np.random.default_rng(0)
+    index = faiss.IndexFlatL2(dim)
+    for start in range(0, n, 100_000):
+        block = rng.normal(size=(min(100_000, n - start), dim)).astype(np.float32)
+        index.add(block / np.linalg.norm(block, axis=1, keepdims=True))
+    words = random.Random(0)
+    ids = {i: f"chunk-{i:08d}" for i in range(n)}
+    docs = {
+        doc_id: Document(
+            id=doc_id,
+            page_content=" ".join(words.choices(WORDS, k=40)),
+            metadata={"filename": f"file{i // 50}.pdf", "page": i % 50},
+        )
+        for i, doc_id in ids.items()
+    }
+    docstore = InMemoryDocstore(docs)
+    for fmt in ("pickle", "sqlite"):
+        (root / fmt).mkdir(parents=True, exist_ok=True)
+        faiss.write_index(index, str(root / fmt / "index.faiss"))
+    with open(root / "pickle" / "index.pkl", "wb") as f:
+        pickle.dump((docstore, ids), f)  # what FAISS.save_local writes
+    write_chunk_store(root / "sqlite" / DOCSTORE_FILE, ids, docstore)
+
+
+def measure(index_dir: Path, dim: int) -> dict:
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+
+    from rag.retrieve import load_index
+
+    base_rss = rss_mb()
+    t0 = time.perf_counter()
+    vs = load_index(index_dir, "fake", embeddings=DeterministicFakeEmbedding(size=dim))
+    load_s = time.perf_counter() - t0
+    after_load = rss_mb()
+    rng = np.random.default_rng(1)
+    samples = []
+    for _ in range(20):
+        vec = rng.normal(size=dim).astype(np.float32)
+        t0 = time.perf_counter()
+        vs.similarity_search_with_score_by_vector((vec / np.linalg.norm(vec)).tolist(), k=4)
+        samples.append(time.perf_counter() - t0)
+    return {
+        "load_s": round(load_s, 3),
+        "rss_mb": round(after_load - base_rss, 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "first_query_ms": round(1000 * samples[0], 2),
+        "p50_query_ms": round(1000 * sorted(samples)[len(samples) // 2], 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=1_000_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--formats", nargs="+", choices=["pickle", "sqlite"], default=["pickle", "sqlite"])
+    parser.add_argument("--keep", type=Path, help="build into (or reuse) this directory instead of a temp dir")
+    parser.add_argument("--child", type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        print(json.dumps(measure(args.child, args.dim)))
+        return
+
+    root = args.keep or Path(tempfile.mkdtemp())
+    if not (root / "sqlite" / "docstore.sqlite3").exists():
+        t0 = time.perf_counter()
+        build(root, args.chunks, args.dim)
+        print(f"built {args.chunks} chunks x {args.dim} dims in {time.perf_counter() - t0:.0f}s", file=sys.stderr)
+    try:
+        print(f"{'format':<8}{'disk MB':>9}{'load s':>9}{'rss MB':>9}{'peak MB':>9}{'1st query ms':>14}{'p50 ms':>9}")
+        for fmt in args.formats:
+            disk = sum(p.stat().st_size for p in (root / fmt).iterdir()) / 2**20
+            out = subprocess.run(
+                [sys.executable, "-W", "ignore", "-m", "bench.index_load", "--dim", str(args.dim), "--child", str(root / fmt)],
+                check=True, capture_output=True, text=True,
+            ).stdout
+            r = json.loads(out.strip().splitlines()[-1])
+            print(f"{fmt:<8}{disk:>9.0f}{r['load_s']:>9.2f}{r['rss_mb']:>9.0f}{r['peak_rss_mb']:>9.0f}"
+                  f"{r['first_query_ms']:>14.2f}{r['p50_query_ms']:>9.2f}")
+    finally:
+        if args.keep is None:
+            shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    main()
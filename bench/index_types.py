@@ -0,0 +1,76 @@
+"""Recall@k, QPS, on-disk size and distance agreement of each FAISS index type against Flat.
+
+Vectors are a synthetic Gaussian mixture (closer to real embeddings than uniform noise):
+
+    python -m bench.index_types --n 200000 --dim 384 --queries 1000 --k 4
+"""
+import argparse
+import time
+
+import faiss
+import numpy as np
+
+from rag.index_types import INDEX_TYPES, IndexSpec, new_index, set_search_params
+
+
+def clustered(n: int, dim: int, clusters: int, rng: np.random.Generator) -> np.ndarray:
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, size=n)
+    x = centers[labels] + 0.35 * rng.normal(size=(n, dim)).astype(np.float32)
+    return x / np.linalg.norm(x, axis=1, keepdims=True)  # unit vectors, like normalized sentence embeddings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--nlist", type=int, default=1024)
+    parser.add_argument("--pq-m", type=int, default=48)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[8, 32])
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[32, 128])
+    parser.add_argument("--train-size", type=int, default=50_000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    data = clustered(args.n + args.queries, args.dim, clusters=max(16, args.n // 500), rng=rng)
+    base, queries = data[: args.n], data[args.n:]
+
+    runs = [IndexSpec(index_type="Flat")]
+    for t in INDEX_TYPES[1:]:
+        if t.startswith("IVF"):
+            runs += [IndexSpec(index_type=t, nlist=args.nlist, pq_m=args.pq_m, nprobe=p, train_size=args.train_size) for p in args.nprobe]
+        else:
+            runs += [IndexSpec(index_type=t, ef_search=ef) for ef in args.ef_search]
+
+    print(f"{'index':<12}{'param':<14}{'build s':>9}{'MB':>9}{'QPS':>10}{f'R@{args.k}':>8}{'d1 err':>9}")
+    truth = truth_dist = None
+    built = {}
+    for spec in runs:
+        key = (spec.index_type, spec.nlist)
+        if key not in built:
+            t0 = time.perf_counter()
+            sample = base[rng.choice(args.n, size=min(args.n, spec.train_size), replace=False)]
+            index = new_index(spec, args.dim, sample)
+            index.add(base)
+            built[key] = (index, time.perf_counter() - t0, len(faiss.serialize_index(index)) / 1e6)
+        index, build_s, size_mb = built[key]
+        set_search_params(index, spec)
+
+        t0 = time.perf_counter()
+        dist, ids = index.search(queries, args.k)
+        qps = len(queries) / (time.perf_counter() - t0)
+
+        if truth is None:
+            truth, truth_dist = ids, dist
+        recall = np.mean([len(set(a) & set(b)) / args.k for a, b in zip(ids, truth)])
+        # Relative error of the best distance: what decide() thresholds on
+        d1_err = np.mean(np.abs(dist[:, 0] - truth_dist[:, 0]) / np.maximum(truth_dist[:, 0], 1e-9))
+
+        param = {"Flat": "-", "HNSW": f"ef={spec.ef_search}"}.get(spec.index_type, f"nprobe={spec.nprobe}")
+        print(f"{spec.index_type:<12}{param:<14}{build_s:>9.1f}{size_mb:>9.1f}{qps:>10.0f}{recall:>8.3f}{d1_err:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Closed-loop load generator for app.query_server.
+
+Start the server first, then e.g.:
+
+    python -m bench.load_gen --concurrency 16 --requests 400
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from typing import List, Tuple
+
+
+DEFAULT_QUERIES = [
+    "How do I read my radiator meter?",
+    "What does the display of the water meter show?",
+    "How does the pulsonic heat meter work?",
+    "Who can access the consumption data?",
+    "What happens when the battery of the ultego meter is empty?",
+    "How often are the meters read?",
+    "Where is the sensonic meter installed?",
+    "What is the capital of France?",
+]
+
+
+async def http(host: str, port: int, method: str, path: str, payload: dict = None) -> Tuple[int, dict]:
+    reader, writer = await asyncio.open_connection(host, port)
+    body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("latin-1") + body
+    )
+    await writer.drain()
+    raw = await reader.read()
+    writer.close()
+    head, _, data = raw.partition(b"\r\n\r\n")
+    status = int(head.split(b" ", 2)[1])
+    return status, json.loads(data or b"{}")
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def run(args, queries: List[str]) -> None:
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(args.requests))
+
+    async def client() -> None:
+        nonlocal errors
+        for i in counter:
+            t0 = time.perf_counter()
+            try:
+                status, _ = await http(args.host, args.port, "POST", "/query", {"query": queries[i % len(queries)]})
+                ok = status == 200
+            except OSError:
+                ok = False
+            latencies.append((time.perf_counter() - t0) * 1000)
+            errors += not ok
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(args.concurrency)))
+    wall = time.perf_counter() - t0
+
+    print(f"requests={len(latencies)} concurrency={args.concurrency} errors={errors} wall={wall:.2f}s")
+    print(f"throughput={len(latencies) / wall:.1f} req/s")
+    print(
+        f"latency ms: p50={percentile(latencies, 0.50):.1f} p99={percentile(latencies, 0.99):.1f} "
+        f"mean={statistics.mean(latencies):.1f} max={max(latencies):.1f}"
+    )
+
+    _, stats = await http(args.host, args.port, "GET", "/stats")
+    print("\nserver stats:")
+    print(json.dumps(stats, indent=2))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--queries", help="Text file with one query per line (defaults to a built-in set).")
+    args = parser.parse_args()
+
+    queries = DEFAULT_QUERIES
+    if args.queries:
+        with open(args.queries, encoding="utf-8") as f:
+            queries = [line.strip() for line in f if line.strip()]
+    asyncio.run(run(args, queries))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Pages/second of PDF extraction + cleaning versus worker count.
+
+The source PDFs are copied `--copies` times into a temp dir to simulate a larger corpus:
+
+    python -m bench.pdf_extract --source-dir documents/ista_documents --copies 50 --workers 1 2 4 8
+"""
+import argparse
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from rag.ingest import iter_loaded_files, list_files
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source-dir", type=Path, default=Path("documents/ista_documents"))
+    parser.add_argument("--copies", type=int, default=25)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus = Path(tmp)
+        for src in list_files(args.source_dir, "pdf"):
+            for i in range(args.copies):
+                shutil.copy(src, corpus / f"{src.stem}_{i:04d}.pdf")
+        paths = list_files(corpus, "pdf")
+
+        baseline = None
+        rows = []
+        for workers in args.workers:
+            t0 = time.perf_counter()
+            pages = 0
+            contents = []
+            for _, docs in iter_loaded_files(paths, file_type="pdf", workers=workers):
+                pages += len(docs)
+                contents.extend(d.page_content for d in docs)
+            elapsed = time.perf_counter() - t0
+            if baseline is None:
+                baseline = contents
+            elif contents != baseline:
+                raise AssertionError(f"workers={workers} produced different output than workers={args.workers[0]}")
+            rows.append((workers, len(paths), pages, elapsed))
+
+    print(f"\n{'workers':>8}{'files':>8}{'pages':>8}{'seconds':>10}{'pages/s':>10}")
+    for workers, files, pages, elapsed in rows:
+        print(f"{workers:>8}{files:>8}{pages:>8}{elapsed:>10.2f}{pages / elapsed:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
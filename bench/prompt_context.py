@@ -0,0 +1,63 @@
+"""Prompt size (and optionally LLM latency) with verbatim chunks vs the token-budgeted context.
+
+Uses the labelled query set of bench.hybrid_eval against the configured index:
+
+    python -m bench.prompt_context --budget 400 800 1200
+    python -m bench.prompt_context --llm qwen      # also time the LLM on each prompt
+"""
+import argparse
+import json
+import statistics
+import time
+from pathlib import Path
+
+import resources
+from app.pipeline import build_prompt
+from rag.context import count_tokens
+from rag.retrieve import search_with_scores
+
+
+def main() -> None:
+    cfg = resources.get_config()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=Path, default=Path("bench/data/ista_queries.jsonl"))
+    parser.add_argument("--k", type=int, default=cfg.top_k)
+    parser.add_argument("--budget", type=int, nargs="+", default=[cfg.context_max_tokens or 800])
+    parser.add_argument("--llm", choices=["qwen", "gemini"], help="invoke this LLM on every prompt and report latency")
+    args = parser.parse_args()
+
+    queries = [json.loads(line) for line in args.queries.read_text(encoding="utf-8").splitlines() if line.strip()]
+    vs = resources.get_index()
+    lexical = resources.get_lexical()
+    hits = {
+        q["query"]: search_with_scores(vs, q["query"], args.k, lexical=lexical, candidates=cfg.hybrid_candidates, rrf_k=cfg.rrf_k)
+        for q in queries
+    }
+    llm = resources.get_llm(args.llm) if args.llm else None
+
+    print(f"{len(queries)} queries, k={args.k}, tokens ~ chars/4")
+    print(f"{'context':<12}{'tokens':>8}{'p95':>8}{'build ms':>10}{'sources':>9}" + (f"{'llm s':>9}" if llm else ""))
+    for budget in [None] + args.budget:
+        tokens, build_ms, covered, latency = [], [], 0, []
+        for q in queries:
+            t0 = time.perf_counter()
+            prompt = build_prompt(q["query"], hits[q["query"]], budget)
+            build_ms.append(1000 * (time.perf_counter() - t0))
+            tokens.append(count_tokens(prompt))
+            # Does a relevant file still make it into the prompt?
+            covered += any(f"file={name}" in prompt for name in q["relevant"])
+            if llm is not None:
+                t0 = time.perf_counter()
+                llm.invoke(prompt)
+                latency.append(time.perf_counter() - t0)
+
+        p95 = sorted(tokens)[int(0.95 * (len(tokens) - 1))]
+        row = f"{'verbatim' if budget is None else budget:<12}{statistics.mean(tokens):>8.0f}{p95:>8}"
+        row += f"{statistics.mean(build_ms):>10.2f}{covered / len(queries):>9.2f}"
+        if llm is not None:
+            row += f"{statistics.mean(latency):>9.2f}"
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
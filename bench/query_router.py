@@ -0,0 +1,137 @@
+"""Pre-retrieval query router (agent/intent.py): routing accuracy and what it saves.
+
+    python -m bench.query_router --queries bench/data/route_queries.jsonl --llm-latency 0.5
+    python -m bench.query_router --backend onnx --model path/to/local/model
+    python -m bench.query_router --stand-in     # hashed bag-of-words embeddings, no model needed
+
+Each line of the query file is {"query": ..., "path": "docs" | "csv" | "ticket"}. The first
+table scores the routing: accuracy over the labelled queries, the share routed to a
+shortcut at all (the rest go to "agent", which is safe but saves nothing), misroutes (a
+shortcut other than the label) and the confusion per label. Then every query runs end to
+end through batch mode (batch size 1, one at a time) over the PDF folder, ingested with the
+same embeddings, and the CSV tables: once with the full retrieval + agent loop and once
+routed, with bench.fake_llm standing in for the model at --llm-latency per call.
+--stand-in numbers only show the mechanics: the prototypes are tuned for a sentence model.
+"""
+import argparse
+import json
+import logging
+import re
+import tempfile
+import time
+import zlib
+from collections import Counter
+from pathlib import Path
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+class HashedEmbeddings(Embeddings):
+    """Words and character trigrams hashed into `dim` buckets: lexical overlap only."""
+
+    def __init__(self, dim: int = 512) -> None:
+        self.dim = dim
+
+    def _embed(self, text: str) -> List[float]:
+        vec = np.zeros(self.dim, dtype=np.float32)
+        for word in re.findall(r"\w+", text.lower()):
+            vec[zlib.crc32(word.encode("utf-8")) % self.dim] += 1.0
+            padded = f" {word} "
+            for i in range(len(padded) - 2):
+                vec[zlib.crc32(padded[i:i + 3].encode("utf-8")) % self.dim] += 0.3
+        norm = np.linalg.norm(vec)
+        return (vec / norm if norm else vec).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+def main() -> None:
+    from config import Config
+
+    cfg = Config()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=Path, default=Path("bench/data/route_queries.jsonl"))
+    parser.add_argument("--pdf-dir", type=Path, default=Path("documents/ista_documents"))
+    parser.add_argument("--csv-dir", type=Path, default=Path("documents/medical_documents"))
+    parser.add_argument("--model", default=cfg.embed_model)
+    parser.add_argument("--backend", default=cfg.embed_backend)
+    parser.add_argument("--stand-in", action="store_true", help="hashed bag-of-words embeddings instead of --model")
+    parser.add_argument("--margin", type=float, default=cfg.route_margin)
+    parser.add_argument("--min-similarity", type=float, default=cfg.route_min_similarity)
+    parser.add_argument("--max-distance", type=float, default=cfg.max_distance)
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="seconds per fake LLM call")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+    from dataclasses import replace
+
+    import resources
+    from agent.intent import PATHS
+    from app.batch import run_batch
+    from bench.fake_llm import ScriptedChatModel
+    from rag.embeddings import make_embeddings
+    from rag.ingest import ingest_folder
+
+    labelled = [json.loads(line) for line in args.queries.read_text(encoding="utf-8").splitlines() if line.strip()]
+    if args.stand_in:
+        embeddings = HashedEmbeddings()
+    else:
+        embeddings = make_embeddings(args.model, backend=args.backend, batch_size=cfg.embed_batch_size)
+    tmp = Path(tempfile.mkdtemp())
+    cfg = replace(cfg, source_dir=args.pdf_dir, index_dir=tmp / "index", csv_dir=args.csv_dir, embed_cache_dir=None,
+                  ticket_backend="memory", cascade=False, max_distance=args.max_distance,
+                  route_margin=args.margin, route_min_similarity=args.min_similarity)
+    ingest_folder(source_dir=cfg.source_dir, file_type="pdf", index_dir=cfg.index_dir, embed_model=cfg.embed_model,
+                  min_chars_per_page=cfg.min_chars_per_page, chunk_size=cfg.chunk_size,
+                  chunk_overlap=cfg.chunk_overlap, incremental=False, embeddings=embeddings)
+
+    def fresh() -> None:
+        resources.reset()
+        resources.override("config", cfg)
+        resources.override("embeddings", embeddings)
+        # The unrouted agent looks things up in the tables as well, as the real model does for table questions
+        resources.override("llm:qwen", ScriptedChatModel(latency_s=args.llm_latency, csv_table="conditions"))
+
+    fresh()
+    router = resources.get_query_router()
+    t0 = time.perf_counter()
+    routed = [router.route(q["query"]) for q in labelled]
+    route_ms = 1000 * (time.perf_counter() - t0) / len(labelled)
+    confusion = Counter((q["path"], intent.path) for q, intent in zip(labelled, routed))
+    correct = sum(confusion[p, p] for p in PATHS)
+    shortcut = sum(n for (_, got), n in confusion.items() if got != "agent")
+    misrouted = [(q, intent) for q, intent in zip(labelled, routed) if intent.path not in (q["path"], "agent")]
+    n = len(labelled)
+    print(f"routing {n} labelled queries ({route_ms:.2f} ms/query incl. embedding): accuracy {correct / n:.0%}, "
+          f"shortcut taken {shortcut / n:.0%}, misrouted {len(misrouted) / n:.0%}")
+    print(f"{'label':<8}" + "".join(f"{p:>8}" for p in (*PATHS, "agent")))
+    for label in PATHS:
+        print(f"{label:<8}" + "".join(f"{confusion[label, p]:>8}" for p in (*PATHS, "agent")))
+    for q, intent in misrouted:
+        print(f"  misrouted: {q['query']!r} ({q['path']}) -> {intent.path} ({intent.reason}, {intent.score:.3f})")
+
+    source = tmp / "queries.jsonl"
+    source.write_text("".join(json.dumps({"id": f"q{i}", "query": q["query"]}) + "\n" for i, q in enumerate(labelled)))
+    print(f"\n{'end to end':<12}{'llm_calls':>10}{'mean ms':>9}{'p50 ms':>9}{'total s':>9}   outcomes")
+    for label, use_router in (("agent loop", False), ("routed", True)):
+        fresh()
+        out = tmp / f"{label.replace(' ', '-')}.jsonl"
+        t0 = time.perf_counter()
+        with open(source) as f:
+            counts = run_batch(f, out, batch_size=1, concurrency=1, router=use_router)
+        elapsed = time.perf_counter() - t0
+        records = [json.loads(line) for line in out.read_text().splitlines()]
+        calls = sum(r.get("llm_calls", 0) for r in records) / len(records)
+        totals = sorted(r["timings_ms"]["total"] for r in records if "timings_ms" in r)
+        mean = sum(totals) / len(totals)
+        print(f"{label:<12}{calls:>10.2f}{mean:>9.1f}{totals[len(totals) // 2]:>9.1f}{elapsed:>9.2f}   {counts}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Searching per-corpus index shards vs one combined index.
+
+    python -m bench.shards --pdf-files 40 --csv-rows 20000 --queries 200
+
+Builds a synthetic PDF corpus and a synthetic CSV corpus, ingests each to its own shard
+and both together into one index, then times the same queries against the combined
+index, fanned out over both shards (sequentially and on a thread pool), and against a
+single shard. "same top-k" is how often a fan-out returns the combined index's hits.
+The first line is the cost of a shard's lazy load on its first search.
+"""
+import argparse
+import logging
+import random
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf-files", type=int, default=40)
+    parser.add_argument("--csv-rows", type=int, default=20_000, help="rows per synthetic CSV table")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--dim", type=int, default=384)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+
+    from bench.synthetic import WORDS, make_csv_corpus, make_pdf_corpus
+    from config import Config
+    from rag.ingest import ingest_folder
+    from rag.retrieve import ShardedIndex, load_index
+
+    cfg = Config()
+    tmp = Path(tempfile.mkdtemp())
+    make_pdf_corpus(tmp / "pdf", n_files=args.pdf_files, pages_per_file=5)
+    make_csv_corpus(tmp / "csv", rows_per_table=args.csv_rows)
+    embeddings = DeterministicFakeEmbedding(size=args.dim)
+
+    def ingest(source: Path, file_type: str, index_dir: Path) -> None:
+        ingest_folder(source_dir=source, file_type=file_type, index_dir=index_dir, embed_model=cfg.embed_model,
+                      min_chars_per_page=cfg.min_chars_per_page, chunk_size=cfg.chunk_size,
+                      chunk_overlap=cfg.chunk_overlap, incremental=False, embeddings=embeddings,
+                      csv_rows_per_chunk=cfg.csv_rows_per_chunk)
+
+    ingest(tmp / "pdf", "pdf", tmp / "shards" / "docs")
+    ingest(tmp / "csv", "csv", tmp / "shards" / "tables")
+    # The combined index: both corpora's vectors and chunks in one flat index
+    ingest(tmp / "pdf", "pdf", tmp / "combined")
+    combined = load_index(tmp / "combined", cfg.embed_model, embeddings=embeddings, writable=True)
+    tables = load_index(tmp / "shards" / "tables", cfg.embed_model, embeddings=embeddings, writable=True)
+    combined.merge_from(tables)
+
+    loaded = {}
+
+    def shard(name: str):
+        if name not in loaded:
+            loaded[name] = (load_index(tmp / "shards" / name, cfg.embed_model, embeddings=embeddings), None)
+        return loaded[name]
+
+    t0 = time.perf_counter()
+    shard("tables")
+    print(f"lazy load of the 'tables' shard on first search: {1000 * (time.perf_counter() - t0):.1f} ms "
+          f"({loaded['tables'][0].index.ntotal} vectors)\n")
+    shard("docs")
+
+    rng = random.Random(0)
+    queries = [" ".join(rng.sample(WORDS, 6)) for _ in range(args.queries)]
+    vectors = embeddings.embed_documents(queries)
+    reference = [[d.id for d, _ in combined.similarity_search_with_score_by_vector(v, k=args.k)] for v in vectors]
+
+    sequential = ShardedIndex(["docs", "tables"], shard, embeddings)
+    parallel = ShardedIndex(["docs", "tables"], shard, embeddings, executor=ThreadPoolExecutor(2))
+    runs = {
+        "combined index": lambda v, q: combined.similarity_search_with_score_by_vector(v, k=args.k),
+        "fan-out, sequential": lambda v, q: sequential.search_by_vector(v, args.k, query=q),
+        "fan-out, 2 threads": lambda v, q: parallel.search_by_vector(v, args.k, query=q),
+        "one shard (docs)": lambda v, q: parallel.search_by_vector(v, args.k, query=q, corpora=["docs"]),
+    }
+    print(f"{'search':<22}{'p50 ms':>9}{'p95 ms':>9}{'same top-k':>12}")
+    for label, search in runs.items():
+        samples, same = [], 0
+        for vec, query, ref in zip(vectors, queries, reference):
+            t0 = time.perf_counter()
+            hits = search(vec, query)
+            samples.append(time.perf_counter() - t0)
+            same += [d.id for d, _ in hits] == ref
+        samples.sort()
+        agreement = f"{same / len(queries):.0%}" if "one shard" not in label else "-"
+        print(f"{label:<22}{1000 * samples[len(samples) // 2]:>9.3f}{1000 * samples[int(0.95 * len(samples))]:>9.3f}{agreement:>12}")
+
+
+if __name__ == "__main__":
+    main()
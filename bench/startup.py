@@ -0,0 +1,49 @@
+"""Cold-start wall time and peak RSS of a fresh process.
+
+Each run is a new interpreter, so the numbers include imports, model and index
+loading. Run from the repo root:
+
+    python -m bench.startup --runs 5 -- python -m app.query_cli "how do I read my water meter"
+    python -m bench.startup --runs 5 -- python -c "import agent.agent"
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+
+def run_once(cmd) -> tuple:
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    _, status, usage = os.wait4(proc.pid, 0)
+    elapsed = time.perf_counter() - t0
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    rss_mb = usage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+    return elapsed, rss_mb, proc.returncode
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("cmd", nargs=argparse.REMAINDER)
+    args = parser.parse_args()
+
+    cmd = args.cmd[1:] if args.cmd[:1] == ["--"] else args.cmd
+    if not cmd:
+        parser.error("no command given")
+
+    times, rss = [], []
+    for i in range(args.runs):
+        elapsed, rss_mb, code = run_once(cmd)
+        print(f"run {i + 1}: {elapsed:.2f}s  peak_rss={rss_mb:.0f}MB  exit={code}")
+        times.append(elapsed)
+        rss.append(rss_mb)
+
+    print(f"\nmedian: {statistics.median(times):.2f}s  peak_rss={max(rss):.0f}MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Peak RSS and wall time of `ingest_folder` for different batch sizes on a synthetic corpus.
+
+Each configuration runs in a fresh process so peak RSS is not shared between runs:
+
+    python -m bench.streaming_ingest --files 400 --batch-sizes 64 256 100000 --fake-embeddings
+
+A batch size larger than the number of chunks embeds everything in one call, which is
+equivalent to the old build-everything-then-save behaviour.
+"""
+import argparse
+import sys
+import tempfile
+from pathlib import Path
+
+from bench.startup import run_once
+from bench.synthetic import make_pdf_corpus
+
+
+def run_child(args) -> None:
+    from rag.ingest import ingest_folder
+
+    embeddings = None
+    if args.fake_embeddings:
+        from langchain_core.embeddings import DeterministicFakeEmbedding
+
+        embeddings = DeterministicFakeEmbedding(size=384)
+    ingest_folder(
+        source_dir=args.source_dir,
+        file_type="pdf",
+        index_dir=args.index_dir,
+        embed_model=args.embed_model,
+        min_chars_per_page=200,
+        chunk_size=2000,
+        chunk_overlap=150,
+        incremental=False,
+        batch_size=args.batch_size,
+        checkpoint_every=args.checkpoint_every,
+        embeddings=embeddings,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[64, 256, 1_000_000])
+    parser.add_argument("--checkpoint-every", type=int, default=20)
+    parser.add_argument("--embed-model", default="sentence-transformers/all-MiniLM-L6-v2")
+    parser.add_argument("--fake-embeddings", action="store_true", help="Use a deterministic fake encoder.")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--source-dir", type=Path, help=argparse.SUPPRESS)
+    parser.add_argument("--index-dir", type=Path, help=argparse.SUPPRESS)
+    parser.add_argument("--batch-size", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = Path(tmp) / "corpus"
+        make_pdf_corpus(source, args.files, pages_per_file=args.pages)
+        print(f"{'batch':>10}{'seconds':>10}{'peak MB':>10}")
+        for batch_size in args.batch_sizes:
+            cmd = [
+                sys.executable, "-m", "bench.streaming_ingest", "--child",
+                "--source-dir", str(source),
+                "--index-dir", str(Path(tmp) / f"index_{batch_size}"),
+                "--batch-size", str(batch_size),
+                "--checkpoint-every", str(args.checkpoint_every),
+                "--embed-model", args.embed_model,
+            ]
+            if args.fake_embeddings:
+                cmd.append("--fake-embeddings")
+            elapsed, rss_mb, code = run_once(cmd)
+            status = "" if code == 0 else f"  (exit {code})"
+            print(f"{batch_size:>10}{elapsed:>10.2f}{rss_mb:>10.0f}{status}")
+
+
+if __name__ == "__main__":
+    main()
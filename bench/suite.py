@@ -0,0 +1,265 @@
+"""Offline end-to-end benchmark: ingest, index load, search, decide, CSV search and the agent
+graph on a synthetic corpus at several scales, recorded to a JSON baseline and checked against it.
+
+    python -m bench.suite --scales 1 10 100 --update     # (re)record bench/baseline.json
+    python -m bench.suite --scales 1 10                  # compare; exits 1 on a regression, 2 without a baseline
+
+Embeddings are a deterministic fake (--real-embeddings uses the configured model) and the
+LLM is bench.fake_llm.ScriptedChatModel, so nothing needs Ollama, Gemini or the network.
+Scale 1 is 4 PDFs x 5 pages and 500 rows per CSV table. Each scale runs in a fresh
+process; peak_rss_mb is that process's high-water mark once the stage has finished.
+Baselines are machine-specific: record one on the machine you compare on.
+"""
+import argparse
+import json
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+
+DEFAULT_BASELINE = Path("bench/baseline.json")
+# Metrics where bigger is better; everything else (latency, seconds, memory, llm_calls) is lower-is-better
+HIGHER_IS_BETTER = ("_per_s", "qps")
+# Sizes of the workload, not measurements
+INFORMATIONAL = {"chunks", "rows", "queries", "vectors", "files"}
+# Differences below these are noise whatever the relative change
+ABSOLUTE_FLOOR = {"_ms": 0.05, "seconds": 0.05, "_mb": 10.0}
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def latency_stats(samples_s: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples_s)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return {
+        "p50_ms": round(1000 * pick(0.50), 4),
+        "p95_ms": round(1000 * pick(0.95), 4),
+        "max_ms": round(1000 * ordered[-1], 4),
+        "qps": round(len(ordered) / sum(ordered), 1),
+    }
+
+
+def timed_calls(fn, inputs) -> List[float]:
+    samples = []
+    for item in inputs:
+        t0 = time.perf_counter()
+        fn(item)
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+
+def run_scale(scale: int, work: Path, real_embeddings: bool, queries: int, agent_queries: int) -> dict:
+    import resources
+    from agent.tools import make_csv_search_tool
+    from bench.fake_llm import ScriptedChatModel
+    from bench.synthetic import WORDS, make_csv_corpus, make_pdf_corpus
+    from config import Config
+    from rag.decision import decide
+    from rag.index_types import IndexSpec
+    from rag.ingest import ingest_folder
+    from rag.retrieve import search_with_scores
+    from rag.tables import TableCache
+
+    make_pdf_corpus(work / "pdf", n_files=4 * scale, pages_per_file=5)
+    make_csv_corpus(work / "csv", rows_per_table=500 * scale)
+    cfg = Config(
+        source_dir=work / "pdf",
+        index_dir=work / "index",
+        csv_dir=work / "csv",
+        embed_cache_dir=None,
+        ticket_backend="memory",
+    )
+    resources.override("config", cfg)
+    if not real_embeddings:
+        from langchain_core.embeddings import DeterministicFakeEmbedding
+
+        resources.override("embeddings", DeterministicFakeEmbedding(size=384))
+    for name in cfg.cascade_models:
+        resources.override(f"llm:{name}", ScriptedChatModel(csv_table="conditions"))
+    embeddings = resources.get_embeddings()
+    results: Dict[str, dict] = {}
+
+    def ingest(source: Path, index_dir: Path, file_type: str) -> tuple:
+        t0 = time.perf_counter()
+        report = ingest_folder(
+            source_dir=source,
+            file_type=file_type,
+            index_dir=index_dir,
+            embed_model=cfg.embed_model,
+            min_chars_per_page=cfg.min_chars_per_page,
+            chunk_size=cfg.chunk_size,
+            chunk_overlap=cfg.chunk_overlap,
+            incremental=False,
+            batch_size=cfg.ingest_batch_size,
+            checkpoint_every=cfg.checkpoint_every,
+            embeddings=embeddings,
+            index_spec=IndexSpec.from_config(cfg),
+        )
+        return report, time.perf_counter() - t0
+
+    report, seconds = ingest(cfg.source_dir, cfg.index_dir, "pdf")
+    results["ingest_pdf"] = {
+        "files": report.files_embedded,
+        "chunks": report.chunks_embedded,
+        "seconds": round(seconds, 3),
+        "chunks_per_s": round(report.chunks_embedded / seconds, 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+    rows = 500 * scale * len(list(cfg.csv_dir.glob("*.csv")))
+    report, seconds = ingest(cfg.csv_dir, work / "index_csv", "csv")
+    results["ingest_csv"] = {
+        "rows": rows,
+        "chunks": report.chunks_embedded,
+        "seconds": round(seconds, 3),
+        "rows_per_s": round(rows / seconds, 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+    t0 = time.perf_counter()
+    vs = resources.get_index()
+    results["load_index"] = {
+        "vectors": vs.index.ntotal,
+        "seconds": round(time.perf_counter() - t0, 4),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+    rng = random.Random(0)
+    query_set = [" ".join(rng.sample(WORDS, 4)) for _ in range(queries)]
+    hits_by_query = {}
+
+    def search(q: str) -> None:
+        hits_by_query[q] = search_with_scores(vs, q, cfg.top_k)
+
+    search(query_set[0])  # warm-up
+    results["search"] = {"queries": queries, **latency_stats(timed_calls(search, query_set)), "peak_rss_mb": round(peak_rss_mb(), 1)}
+
+    all_hits = list(hits_by_query.values())
+    results["decide"] = {
+        "queries": len(all_hits),
+        **latency_stats(timed_calls(lambda h: decide(h, cfg.max_distance), all_hits)),
+    }
+
+    search_csv = make_csv_search_tool(cfg.csv_dir, cache=TableCache(cfg.csv_dir))
+    tables = ("conditions", "medications", "encounters")
+    csv_inputs = [{"table": t, "search_term": s} for t in tables for s in ("diabetes", "sinusitis", "check", "insulin")]
+    # First lookup per table parses the CSV and builds its column indexes
+    cold = timed_calls(search_csv.invoke, [{"table": t, "search_term": "diabetes"} for t in tables])
+    results["search_csv"] = {
+        "queries": len(csv_inputs),
+        "cold_ms": round(1000 * statistics.mean(cold), 3),
+        **latency_stats(timed_calls(search_csv.invoke, csv_inputs)),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+    from agent.agent import agent
+    from app.pipeline import run_agent
+
+    llm_calls = []
+
+    def ask(q: str) -> None:
+        state = run_agent(agent, q, hits_by_query[q], max_tokens=cfg.context_max_tokens)
+        llm_calls.append(state["llm_calls"])
+
+    ask(query_set[0])  # warm-up: builds the tools and binds them to the model
+    llm_calls.clear()
+    samples = timed_calls(ask, query_set[:agent_queries])
+    results["agent"] = {
+        "queries": agent_queries,
+        **latency_stats(samples),
+        "llm_calls": round(statistics.mean(llm_calls), 2),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+    return results
+
+
+def compare(baseline: dict, current: dict, tolerance: float) -> List[str]:
+    """Human-readable lines for every metric that got worse than `tolerance` allows."""
+    flagged = []
+    for scale, stages in current.items():
+        for stage, metrics in stages.items():
+            for name, value in metrics.items():
+                old = baseline.get(scale, {}).get(stage, {}).get(name)
+                if old is None or name in INFORMATIONAL or not old:
+                    continue
+                higher_better = name.endswith(HIGHER_IS_BETTER)
+                change = (old - value) / old if higher_better else (value - old) / old
+                floor = next((f for suffix, f in ABSOLUTE_FLOOR.items() if name.endswith(suffix)), 0.0)
+                if change > tolerance and abs(value - old) > floor:
+                    flagged.append(f"{scale:>5} {stage}.{name}: {old:g} -> {value:g} ({change:+.0%} worse)")
+    return flagged
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10])
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--update", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="relative slowdown that counts as a regression")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--agent-queries", type=int, default=20)
+    parser.add_argument("--real-embeddings", action="store_true")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--out", type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        import logging
+
+        logging.basicConfig(level=logging.WARNING)
+        with tempfile.TemporaryDirectory() as tmp:
+            results = run_scale(args.child, Path(tmp), args.real_embeddings, args.queries, args.agent_queries)
+        args.out.write_text(json.dumps(results), encoding="utf-8")
+        return
+
+    current = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for scale in args.scales:
+            out = Path(tmp) / f"{scale}.json"
+            cmd = [
+                sys.executable, "-m", "bench.suite", "--child", str(scale), "--out", str(out),
+                "--queries", str(args.queries), "--agent-queries", str(args.agent_queries),
+            ]
+            if args.real_embeddings:
+                cmd.append("--real-embeddings")
+            t0 = time.perf_counter()
+            subprocess.run(cmd, check=True)
+            current[f"{scale}x"] = json.loads(out.read_text(encoding="utf-8"))
+            print(f"scale {scale}x done in {time.perf_counter() - t0:.1f}s", file=sys.stderr)
+
+    for scale, stages in current.items():
+        print(f"\n== {scale}")
+        for stage, metrics in stages.items():
+            print(f"  {stage:<12}" + "  ".join(f"{k}={v:g}" for k, v in metrics.items()))
+
+    if args.update:
+        meta = {"python": platform.python_version(), "machine": platform.machine(), "platform": platform.platform(),
+                "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "real_embeddings": args.real_embeddings}
+        args.baseline.write_text(json.dumps({"meta": meta, "results": current}, indent=2) + "\n", encoding="utf-8")
+        print(f"\nBaseline written to {args.baseline}")
+        return
+
+    if not args.baseline.exists():
+        # Nothing to compare against is a failed check, not a pass
+        print(f"\nNo baseline at {args.baseline}; run with --update to record one.", file=sys.stderr)
+        sys.exit(2)
+    flagged = compare(json.loads(args.baseline.read_text(encoding="utf-8"))["results"], current, args.tolerance)
+    if flagged:
+        print(f"\nREGRESSIONS (> {args.tolerance:.0%} worse than {args.baseline}):")
+        print("\n".join(flagged))
+        sys.exit(1)
+    print(f"\nNo regressions against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Synthetic corpus generator for ingest benchmarks."""
+import random
+from pathlib import Path
+
+import pymupdf
+
+
+WORDS = (
+    "meter radiator heating water consumption reading display battery apartment resident "
+    "billing period device sensor radio transmission value unit cubic metre kilowatt hour "
+    "tenant landlord service annual cost allocation temperature flow return supply valve "
+    "installation maintenance calibration seal replacement warranty data protection portal"
+).split()
+
+
+def paragraph(rng: random.Random, n_words: int) -> str:
+    words = [rng.choice(WORDS) for _ in range(n_words)]
+    sentences = [" ".join(words[i:i + 12]).capitalize() + "." for i in range(0, len(words), 12)]
+    return " ".join(sentences)
+
+
+def make_pdf_corpus(out_dir: Path, n_files: int, pages_per_file: int = 5, words_per_page: int = 350, seed: int = 0) -> list:
+    """Write `n_files` PDFs of random meter-brochure-like text and return their paths."""
+    out_dir.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(seed)
+    paths = []
+    for i in range(n_files):
+        doc = pymupdf.open()
+        for _ in range(pages_per_file):
+            page = doc.new_page()
+            page.insert_textbox(pymupdf.Rect(40, 40, 560, 800), paragraph(rng, words_per_page), fontsize=9)
+        path = out_dir / f"synthetic_{i:05d}.pdf"
+        doc.save(str(path))
+        doc.close()
+        paths.append(path)
+    return paths
+
+
+_DESCRIPTIONS = (
+    "Diabetes mellitus type 2", "Essential hypertension", "Chronic sinusitis", "Acute bronchitis",
+    "Viral sinusitis", "Prediabetes", "Anemia", "Obesity", "Asthma", "Influenza vaccination",
+    "Insulin therapy", "Metformin 500 MG Oral Tablet", "Peanut allergy", "Check up", "Diabetes self management plan",
+)
+_EXTRA_COLUMNS = {
+    "patients": {"FIRST": ("Anna", "Ben", "Carla", "David", "Eva"), "LAST": ("Smith", "Jansen", "de Vries", "Bakker"),
+                 "GENDER": ("F", "M"), "BIRTHDATE": ("1961-04-02", "1975-11-30", "1988-07-14", "2001-01-09")},
+    "encounters": {"ENCOUNTERCLASS": ("ambulatory", "wellness", "emergency", "inpatient")},
+    "careplans": {"REASONDESCRIPTION": _DESCRIPTIONS},
+    "claims": {"PROVIDERID": ("p-001", "p-002", "p-003"), "STATUS": ("BILLED", "CLOSED")},
+    "observations": {"VALUE": ("5.6", "120", "80", "37.2"), "UNITS": ("mmol/L", "mm[Hg]", "Cel")},
+}
+
+
+def make_csv_corpus(out_dir: Path, rows_per_table: int, seed: int = 0) -> list:
+    """Write one synthetic table per entry of `rag.tables.CSV_FILES` and return their paths."""
+    import numpy as np
+    import pandas as pd
+
+    from rag.tables import CSV_FILES
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    patients = np.array([f"{i:08x}-def6-2132-8f92-{i * 7919 % 10**12:012d}" for i in range(max(1, rows_per_table // 20))])
+    paths = []
+    for table, info in CSV_FILES.items():
+        n = rows_per_table
+        columns = {"START": np.array(["2019-03-01", "2020-06-15", "2021-09-30", "2022-12-24"])[rng.integers(0, 4, n)]}
+        for col in info["search_cols"]:
+            if col in ("PATIENT", "PATIENTID", "Id"):
+                columns[col] = patients[rng.integers(0, len(patients), n)]
+            elif col == "DESCRIPTION":
+                columns[col] = np.array(_DESCRIPTIONS)[rng.integers(0, len(_DESCRIPTIONS), n)]
+            elif col == "CODE":
+                columns[col] = rng.integers(10**7, 10**9, n)
+            else:
+                values = np.array(_EXTRA_COLUMNS[table][col])
+                columns[col] = values[rng.integers(0, len(values), n)]
+        path = out_dir / info["file"]
+        pd.DataFrame(columns).to_csv(path, index=False)
+        paths.append(path)
+    return paths
@@ -0,0 +1,100 @@
+"""Throughput of the SQLite ticket store: single vs batched inserts, concurrent writers,
+indexed page lookups and near-duplicate folding.
+
+    python -m bench.tickets --n 20000 --threads 8
+"""
+import argparse
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+from langchain_core.documents import Document
+
+from ticketing.base import TicketRequest
+from ticketing.sqlite import SQLiteTicketing
+
+
+TYPES = ("DOC_GAP_OR_LOW_RELEVANCE", "agent", "escalation")
+
+
+def requests(n: int, dim: int, rng: np.random.Generator, embed: bool = False):
+    out = []
+    for i in range(n):
+        hits = [(Document(page_content=f"text {i}", metadata={"filename": f"file{(i + j) % 200}.pdf", "page": j}), 0.9) for j in range(3)]
+        vec = rng.normal(size=dim).astype(np.float32) if embed else None
+        out.append(TicketRequest(TYPES[i % len(TYPES)], f"query {i}", 1.7, hits, None if vec is None else vec / np.linalg.norm(vec)))
+    return out
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=20_000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--batch", type=int, default=100)
+    parser.add_argument("--dim", type=int, default=384)
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SQLiteTicketing(Path(tmp) / "single.sqlite3")
+        reqs = requests(args.n // 10, args.dim, rng)
+        t0 = time.perf_counter()
+        for r in reqs:
+            store.create_tickets([r])
+        print(f"single inserts      {len(reqs) / (time.perf_counter() - t0):>10,.0f} tickets/s")
+
+        store = SQLiteTicketing(Path(tmp) / "batched.sqlite3")
+        reqs = requests(args.n, args.dim, rng)
+        t0 = time.perf_counter()
+        for i in range(0, len(reqs), args.batch):
+            store.create_tickets(reqs[i:i + args.batch])
+        print(f"batched x{args.batch:<10}{len(reqs) / (time.perf_counter() - t0):>10,.0f} tickets/s")
+
+        # Separate store objects per thread behave like separate processes on one file
+        path = Path(tmp) / "concurrent.sqlite3"
+        SQLiteTicketing(path)
+        per_thread = args.n // 10 // args.threads
+
+        def writer() -> None:
+            own = SQLiteTicketing(path)
+            for r in requests(per_thread, args.dim, np.random.default_rng()):
+                own.create_tickets([r])
+
+        threads = [threading.Thread(target=writer) for _ in range(args.threads)]
+        t0 = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        total = SQLiteTicketing(path).list_tickets(limit=10**9).tickets
+        print(f"{args.threads} writers           {len(total) / (time.perf_counter() - t0):>10,.0f} tickets/s ({len(total)} stored)")
+
+        for label, kwargs in (
+            ("page newest", {}),
+            ("page by type", {"type": "agent"}),
+            ("page by file", {"filename": "file7.pdf"}),
+            ("page by time", {"since": time.time() - 3600}),
+        ):
+            t0 = time.perf_counter()
+            page = store.list_tickets(limit=50, **kwargs)
+            page = store.list_tickets(limit=50, cursor=page.next_cursor, **kwargs)
+            print(f"{label:<20}{1000 * (time.perf_counter() - t0) / 2:>10.3f} ms/page")
+
+        folding = SQLiteTicketing(Path(tmp) / "fold.sqlite3", fold_distance=0.3)
+        base = requests(200, args.dim, rng, embed=True)
+        noisy = []
+        for r in base * 5:
+            vec = np.asarray(r.embedding) + rng.normal(scale=0.005, size=args.dim).astype(np.float32)
+            noisy.append(TicketRequest(r.type, r.query, r.best_distance, r.hits, vec))
+        t0 = time.perf_counter()
+        for i in range(0, len(noisy), args.batch):
+            folding.create_tickets(noisy[i:i + args.batch])
+        elapsed = time.perf_counter() - t0
+        stored = folding.list_tickets(limit=10**9).tickets
+        print(f"folding             {len(noisy) / elapsed:>10,.0f} tickets/s, {len(noisy)} raised -> {len(stored)} stored")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,19 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from pathlib import Path
+from typing import Optional, Tuple
+
+
+@dataclass(frozen=True)
+class Corpus:
+    """A named document collection, ingested to its own index shard."""
+
+    name: str
+    source_dir: Path
+    file_type: str = "pdf"
+    index_dir: Optional[Path] = None  # None: Config.index_root / name
+    description: str = ""  # shown to the agent next to the name
 
 
 @dataclass(frozen=True)
@@ -10,12 +22,127 @@ class Config:
     index_dir: Path = Path("data/indexes/ista_documents")
     file_type: str = "pdf"
     csv_dir: Path = Path("/Users/alejandra/Documents/GitHub/hybrid_llm_workflow/documents/ista_documents/csv")
+    # Several corpora, each with its own shard, searched together or by name (see
+    # rag.retrieve.ShardedIndex), e.g.
+    #   (Corpus("ista", Path("documents/ista_documents"), description="ista metering brochures"),
+    #    Corpus("medical", Path("documents/medical_documents"), "csv", description="patient records"))
+    # Empty: a single corpus from source_dir / file_type / index_dir, named after index_dir.
+    corpora: Tuple[Corpus, ...] = ()
+    index_root: Path = Path("data/indexes")
+    # Threads a search fans out on across shards (<= 1: one shard after the other)
+    shard_workers: int = 4
 
     min_chars_per_page: int = 200
     chunk_size: int = 2000
     chunk_overlap: int = 150
+    incremental_ingest: bool = True
+    ingest_workers: int = 0
+    ingest_batch_size: int = 256
+    checkpoint_every: int = 20
+    # Drop chunks whose 5-word shingles overlap an already kept chunk by at least this
+    # estimated Jaccard similarity before embedding (see rag/dedup.py); None keeps every chunk.
+    # Near-exact only: the ista brochures' shared sections score ~0.72 with one product name
+    # swapped, and dropping those makes that name unsearchable (python -m bench.dedup).
+    dedup_threshold: Optional[float] = 0.9
+    # CSV ingest: rows per document, and which columns become text vs metadata
+    # (text defaults to every column not listed as metadata)
+    csv_rows_per_chunk: int = 50
+    csv_text_columns: Optional[Tuple[str, ...]] = None
+    csv_metadata_columns: Tuple[str, ...] = ()
     top_k: int = 4
 
+    # "dense" or "hybrid" (dense + BM25 fused with reciprocal rank fusion)
+    retrieval_mode: str = "dense"
+    hybrid_candidates: int = 20
+    rrf_k: int = 60
+
     max_distance: float = 1.5
+    # Token budget for retrieved context in the answer prompt and the retrieval tool (None = verbatim chunks)
+    context_max_tokens: Optional[int] = 800
+
+    # On-disk layout: "sqlite" (index.faiss memory-mapped + chunks in docstore.sqlite3, read
+    # per hit) or "pickle" (LangChain's index.faiss + index.pkl, loaded whole). Loading
+    # detects the format; convert old indexes with `python -m rag.convert_index DIR`.
+    index_format: str = "sqlite"
+    # FAISS index: "Flat", "IVF-Flat", "IVF-PQ" or "HNSW" (all L2, see rag/index_types.py)
+    index_type: str = "Flat"
+    ivf_nlist: int = 256
+    pq_m: int = 48
+    hnsw_m: int = 32
+    index_train_size: int = 20_000
+    nprobe: int = 16
+    ef_search: int = 64
 
     embed_model: str = "sentence-transformers/all-MiniLM-L6-v2"
+    # "hf" (sentence-transformers, fp32 PyTorch) or "onnx" (onnxruntime; int8 weights with
+    # embed_quantize), see rag/embeddings.py. embed_threads=None keeps the runtime default.
+    embed_backend: str = "hf"
+    embed_batch_size: int = 64
+    embed_threads: Optional[int] = None
+    embed_quantize: bool = False
+    embed_onnx_dir: Path = Path("data/onnx")
+    embed_cache_dir: Optional[Path] = Path("data/embed_cache")
+    embed_cache_max_rows: int = 200_000
+
+    # "sqlite" (durable, shared between processes) or "memory"
+    ticket_backend: str = "sqlite"
+    ticket_db: Path = Path("data/tickets.sqlite3")
+    # Tickets whose query embeddings are within this L2 distance fold into one (None = never)
+    ticket_fold_distance: Optional[float] = 0.3
+
+    # Model cascade (agent/router.py): chat models cheapest first. Easy questions (close
+    # evidence, short, no table lookups) start on the first; failures escalate to the next.
+    cascade: bool = True
+    cascade_models: Tuple[str, ...] = ("qwen", "gemini")
+    cascade_easy_distance: float = 1.0
+    cascade_max_query_words: int = 25
+    cascade_max_escalations: int = 1
+    llm_timeout_s: float = 120.0
+
+    # Pre-retrieval query router (agent/intent.py): table lookups go straight to search_csv,
+    # out-of-domain questions straight to a ticket, clear document questions get one LLM call
+    # without tools; ambiguous ones take the full agent loop. A path is taken when its closest
+    # prototype (cosine) leads the other paths' by route_margin; below route_min_similarity to
+    # every docs/csv prototype a question is out of domain. route_prototypes adds JSONL
+    # {"query", "path"} lines to the built-in prototypes (tuned for all-MiniLM-L6-v2).
+    query_router: bool = True
+    route_margin: float = 0.05
+    route_min_similarity: float = 0.3
+    route_prototypes: Optional[Path] = None
+
+    # Agent loop: LLM calls per question before it stops and opens a ticket, tool turns
+    # kept verbatim in the prompt (older ones are summarized), and the token cap on each
+    # tool result sent back to the model (None = no limit)
+    agent_max_llm_calls: int = 6
+    history_turns: Optional[int] = 2
+    tool_output_max_tokens: Optional[int] = 1500
+
+    tool_workers: int = 8
+    tool_timeout_s: float = 30.0
+    # Extra tool threads for calls abandoned after tool_timeout_s (a thread can't be killed);
+    # with this many still running, new tool calls fail fast (see agent/tool_pool.py)
+    tool_max_stranded: int = 4
+
+    query_cache_size: int = 1024
+    query_cache_ttl_s: float = 3600.0
+    semantic_cache_distance: Optional[float] = None
+
+    # Span timings and counters (see tracing.py), written to trace_dir as JSON lines
+    trace: bool = False
+    trace_dir: Path = Path("data/traces")
+    log_level: str = "INFO"
+
+    server_host: str = "127.0.0.1"
+    server_port: int = 8765
+    server_workers: int = 4
+    batch_max_size: int = 32
+    batch_max_wait_ms: float = 5.0
+
+    # `python -m app.query_cli --batch FILE`: queries per embed + FAISS call, agent runs in flight
+    query_batch_size: int = 64
+    query_concurrency: int = 4
+
+    def corpus_list(self) -> Tuple[Corpus, ...]:
+        if not self.corpora:
+            return (Corpus(self.index_dir.name, self.source_dir, self.file_type, self.index_dir),)
+        return tuple(c if c.index_dir is not None else replace(c, index_dir=self.index_root / c.name) for c in self.corpora)
@@ -0,0 +1,2 @@
+# conftest.py
+# Lets the tests import the top-level modules (config, resources, rag, ...) as the app does when run from here
@@ -0,0 +1,165 @@
+# rag/context.py
+from __future__ import annotations
+
+import math
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+
+from langchain_core.documents import Document
+
+from rag.lexical import tokenize
+
+
+# Sentence ends, and every line break: CSV rows and other line-oriented chunks have no full stops
+_SENTENCE_RE = re.compile(r"(?<=[.!?])[ \t]+|\s*\n\s*")
+_MIN_OVERLAP = 30
+# A sentence that does not fit is cut to the budget left, unless that is fewer tokens than this
+_MIN_TRUNCATED = 12
+_HEADER_TOKENS = 16
+
+
+def count_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for English subword vocabularies)."""
+    return math.ceil(len(text) / 4)
+
+
+@dataclass
+class Passage:
+    filename: str
+    page: object
+    text: str
+    distance: float
+
+
+def _merge(a: str, b: str) -> Optional[str]:
+    """Join two chunks if one contains the other or the tail of `a` is the head of `b`."""
+    if b in a:
+        return a
+    if a in b:
+        return b
+    head = b[:_MIN_OVERLAP]
+    start = a.find(head)
+    while start != -1:
+        if b.startswith(a[start:]):
+            return a + b[len(a) - start:]
+        start = a.find(head, start + 1)
+    return None
+
+
+def _shingles(text: str, n: int = 3) -> Set[Tuple[str, ...]]:
+    words = tokenize(text)
+    return {tuple(words[i:i + n]) for i in range(max(1, len(words) - n + 1))}
+
+
+def merge_passages(hits: List[Tuple[Document, float]], dedup_threshold: float = 0.8) -> List[Passage]:
+    """Merge overlapping chunks of the same file and page, then drop near-duplicate passages.
+
+    Passages come back ordered by their best (lowest) distance.
+    """
+    groups: Dict[Tuple[str, object], List[Passage]] = {}
+    for doc, dist in hits:
+        fn = doc.metadata.get("filename", "unknown")
+        page = doc.metadata.get("page", doc.metadata.get("page_number", ""))
+        pending = Passage(fn, page, doc.page_content, float(dist))
+        group = groups.setdefault((fn, page), [])
+        # Keep merging until the passage no longer overlaps anything in its group
+        merged = True
+        while merged:
+            merged = False
+            for other in group:
+                text = _merge(other.text, pending.text) or _merge(pending.text, other.text)
+                if text is not None:
+                    group.remove(other)
+                    pending = Passage(fn, page, text, min(other.distance, pending.distance))
+                    merged = True
+                    break
+        group.append(pending)
+
+    kept: List[Passage] = []
+    kept_shingles: List[Set[Tuple[str, ...]]] = []
+    for passage in sorted((p for g in groups.values() for p in g), key=lambda p: p.distance):
+        sh = _shingles(passage.text)
+        if any(len(sh & other) / len(sh | other) >= dedup_threshold for other in kept_shingles):
+            continue
+        kept.append(passage)
+        kept_shingles.append(sh)
+    return kept
+
+
+def _split(text: str) -> List[Tuple[str, str]]:
+    """(sentence, separator before it) pairs; the separator is "\n" if a line break preceded it."""
+    out, sep, start = [], " ", 0
+    for m in _SENTENCE_RE.finditer(text):
+        if text[start:m.start()].strip():
+            out.append((text[start:m.start()].strip(), sep))
+            sep = " "
+        if "\n" in m.group():
+            sep = "\n"
+        start = m.end()
+    if text[start:].strip():
+        out.append((text[start:].strip(), sep))
+    return out
+
+
+def _truncate(sentence: str, max_tokens: int) -> str:
+    """`sentence` cut at a word boundary to fit `max_tokens`, "..." included."""
+    cut = sentence[:max(0, 4 * max_tokens - 4)]
+    if " " in cut:
+        cut = cut[:cut.rindex(" ")]
+    return cut.rstrip() + " ..."
+
+
+def build_context(query: str, hits: List[Tuple[Document, float]], max_tokens: int) -> List[Passage]:
+    """Pack the sentences of the retrieved passages most relevant to `query` into `max_tokens`.
+
+    Passages are split into sentences and at line breaks. Sentences are ranked by
+    idf-weighted overlap with the query (half the score of a matching neighbour carries
+    over, so the sentence around a hit survives too), ties going to the better-ranked
+    passage. A sentence that does not fit is cut to the budget left. The kept sentences
+    are re-assembled in their original order and lines, with "..." marking gaps.
+    """
+    passages = merge_passages(hits)
+    split = [_split(p.text) for p in passages]
+    sentences = [[s for s, _ in group] for group in split]
+    terms = [[set(tokenize(s)) for s in group] for group in sentences]
+    n = sum(len(group) for group in terms) or 1
+    df: Dict[str, int] = {}
+    for group in terms:
+        for words in group:
+            for w in words:
+                df[w] = df.get(w, 0) + 1
+    query_terms = set(tokenize(query))
+
+    candidates = []
+    for pi, group in enumerate(terms):
+        own = [sum(math.log(1 + n / df[w]) for w in words & query_terms) for words in group]
+        for si, score in enumerate(own):
+            neighbour = max(own[si - 1] if si else 0.0, own[si + 1] if si + 1 < len(own) else 0.0)
+            candidates.append((-(score + 0.5 * neighbour), pi, si))
+
+    budget = max_tokens
+    chosen: Dict[int, Dict[int, str]] = {}
+    for _, pi, si in sorted(candidates):
+        # A passage's header (file, page, distance) is paid for once
+        header = 0 if pi in chosen else _HEADER_TOKENS
+        text = sentences[pi][si]
+        if count_tokens(text) + header > budget:
+            if budget - header < _MIN_TRUNCATED:
+                continue
+            text = _truncate(text, budget - header)
+        chosen.setdefault(pi, {})[si] = text
+        budget -= count_tokens(text) + header
+
+    out = []
+    for pi in sorted(chosen):
+        parts, prev = [], None
+        for si in sorted(chosen[pi]):
+            if prev is not None:
+                gap = si != prev + 1 and not parts[-1].endswith("...")  # a cut sentence already ends in one
+                parts.append(" ... " if gap else split[pi][si][1])
+            parts.append(chosen[pi][si])
+            prev = si
+        p = passages[pi]
+        out.append(Passage(p.filename, p.page, "".join(parts), p.distance))
+    return out
@@ -0,0 +1,57 @@
+# rag/convert_index.py
+"""Convert a LangChain pickle index (index.faiss + index.pkl) to the sqlite format in place.
+
+    python -m rag.convert_index data/indexes/ista_documents [--keep-pickle]
+
+index.faiss is kept as is and the pickled docstore becomes
+docstore.sqlite3 (see rag/docstore.py). index.pkl is deleted unless --keep-pickle
+is given, in which case it is renamed to index.pkl.bak. Unpickling the old file is
+only safe for indexes you built yourself.
+"""
+import argparse
+import pickle
+import sys
+import time
+from pathlib import Path
+
+import faiss
+
+from rag.docstore import ChunkStore, write_chunk_store
+from rag.retrieve import DOCSTORE_FILE, current_dir
+
+
+def convert(index_dir: Path, keep_pickle: bool = False) -> int:
+    """Write docstore.sqlite3 from index.pkl; returns the number of chunks converted."""
+    index_dir = Path(index_dir)
+    pkl = index_dir / "index.pkl"
+    if not pkl.exists():
+        raise FileNotFoundError(f"No index.pkl in {index_dir}")
+    index = faiss.read_index(str(index_dir / "index.faiss"))
+    with open(pkl, "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+    if len(index_to_docstore_id) != index.ntotal:
+        raise ValueError(f"index.pkl maps {len(index_to_docstore_id)} ids but index.faiss holds {index.ntotal} vectors")
+    write_chunk_store(index_dir / DOCSTORE_FILE, index_to_docstore_id, docstore)
+    if ChunkStore(index_dir / DOCSTORE_FILE).count() != index.ntotal:
+        raise RuntimeError("docstore.sqlite3 does not match index.faiss; index.pkl was left in place")
+    if keep_pickle:
+        pkl.replace(index_dir / "index.pkl.bak")
+    else:
+        pkl.unlink()
+    return index.ntotal
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("index_dir", type=Path)
+    parser.add_argument("--keep-pickle", action="store_true", help="keep the old docstore as index.pkl.bak")
+    args = parser.parse_args()
+    if (current_dir(args.index_dir) / DOCSTORE_FILE).exists() and not (args.index_dir / "index.pkl").exists():
+        sys.exit(f"{args.index_dir} is already in the sqlite format")
+    t0 = time.perf_counter()
+    n = convert(args.index_dir, keep_pickle=args.keep_pickle)
+    print(f"Converted {n} chunks in {time.perf_counter() - t0:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,8 @@ from typing import List, Tuple
 
 from langchain_core.documents import Document
 
+import tracing
+
 
 @dataclass(frozen=True)
 class Decision():
@@ -11,11 +13,13 @@ class Decision():
     best_distance: float
 
 
+@tracing.traced("decide")
 def decide(hits: List[Tuple[Document, float]], max_distance: float) -> Decision:
     if not hits:
         return Decision(action="ticket", reason="no_hits", best_distance=float("inf"))
 
-    best_dist = hits[0][1]
+    # Hits may be in fused (hybrid) order rather than by distance
+    best_dist = min(dist for _, dist in hits)
     if best_dist > max_distance:
         return Decision(action="ticket", reason="low_relevance", best_distance=best_dist)
 
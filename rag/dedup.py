@@ -0,0 +1,114 @@
+# rag/dedup.py
+"""Exact and near-duplicate chunk detection, run on chunks before they are embedded.
+
+Exact duplicates are matched on a hash of the normalized words. Near duplicates are
+found with MinHash signatures over word shingles: signatures are split into bands, any
+chunk sharing a band with an earlier one is a candidate, and a candidate counts as a
+duplicate when the estimated Jaccard similarity of the two shingle sets reaches the
+threshold. With 128 permutations in 32 bands of 4, a pair at 0.6 similarity becomes a
+candidate with ~99% probability, so thresholds from 0.6 up are not undercut by the banding.
+"""
+from __future__ import annotations
+
+import hashlib
+import re
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+_WORD = re.compile(r"\w+")
+_MERSENNE = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+
+def words(text: str) -> List[str]:
+    return _WORD.findall(text.lower())
+
+
+def shingles(tokens: List[str], size: int = 5) -> List[bytes]:
+    if len(tokens) <= size:
+        return [" ".join(tokens).encode("utf-8")]
+    return list({" ".join(tokens[i:i + size]).encode("utf-8") for i in range(len(tokens) - size + 1)})
+
+
+class MinHasher:
+    """`num_perm` universal hash functions over crc32 shingle hashes; stable across processes."""
+
+    def __init__(self, num_perm: int = 128, seed: int = 1) -> None:
+        rng = np.random.RandomState(seed)
+        self.a = rng.randint(1, int(_MERSENNE), size=num_perm, dtype=np.uint64)
+        self.b = rng.randint(0, int(_MERSENNE), size=num_perm, dtype=np.uint64)
+
+    def signature(self, items: List[bytes]) -> np.ndarray:
+        hashes = np.fromiter((zlib.crc32(s) for s in items), dtype=np.uint64, count=len(items))
+        # uint64 products wrap; as in datasketch, that only perturbs the permutations
+        permuted = (np.outer(hashes, self.a) + self.b) % _MERSENNE & _MAX_HASH
+        return permuted.min(axis=0)
+
+
+def source_entry(metadata: dict) -> dict:
+    """Where a chunk came from: file plus page (PDF) or row range (CSV)."""
+    return {k: metadata[k] for k in ("filename", "page", "row_start", "row_end") if k in metadata}
+
+
+class ChunkDeduper:
+    """Remembers the chunks kept so far and matches new chunks against them."""
+
+    def __init__(self, threshold: float = 0.9, shingle_size: int = 5, num_perm: int = 128, bands: int = 32) -> None:
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.rows = num_perm // bands
+        self.hasher = MinHasher(num_perm)
+        self._band_mix = np.random.RandomState(2).randint(1, 2**63, size=self.rows, dtype=np.uint64)
+        self._exact: Dict[bytes, str] = {}
+        self._buckets: Dict[Tuple[int, int], List[int]] = {}
+        self._ids: List[str] = []
+        self._signatures = np.empty((1024, num_perm), dtype=np.uint64)  # row i belongs to _ids[i]
+
+    def settings(self) -> dict:
+        return {
+            "threshold": self.threshold,
+            "shingle_size": self.shingle_size,
+            "num_perm": len(self.hasher.a),
+            "bands": len(self.hasher.a) // self.rows,
+        }
+
+    def _bands(self, signature: np.ndarray) -> List[Tuple[int, int]]:
+        # One wrapped uint64 dot product per band; a rare collision only adds a candidate
+        band_hashes = signature.reshape(-1, self.rows) @ self._band_mix
+        return list(enumerate(band_hashes.tolist()))
+
+    def match(self, chunk_id: str, text: str) -> Optional[Tuple[str, float]]:
+        """(id of the kept chunk, similarity) if `text` duplicates one; otherwise keep it and return None."""
+        tokens = words(text)
+        digest = hashlib.sha1(" ".join(tokens).encode("utf-8")).digest()
+        if digest in self._exact:
+            return self._exact[digest], 1.0
+
+        signature = self.hasher.signature(shingles(tokens, self.shingle_size))
+        keys = self._bands(signature)
+        candidates = set()
+        for key in keys:
+            candidates.update(self._buckets.get(key, ()))
+        if candidates:
+            rows = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+            similarity = (self._signatures[rows] == signature).mean(axis=1)
+            best = int(np.argmax(similarity))
+            if similarity[best] >= self.threshold:
+                return self._ids[rows[best]], float(similarity[best])
+
+        row = len(self._ids)
+        if row == len(self._signatures):
+            self._signatures = np.concatenate([self._signatures, np.empty_like(self._signatures)])
+        self._signatures[row] = signature
+        self._ids.append(chunk_id)
+        self._exact[digest] = chunk_id
+        for key in keys:
+            self._buckets.setdefault(key, []).append(row)
+        return None
+
+    def __len__(self) -> int:
+        return len(self._ids)
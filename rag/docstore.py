@@ -0,0 +1,182 @@
+# rag/docstore.py
+"""Chunk texts and metadata in SQLite, read one chunk at a time at query time.
+
+Replaces the pickled `index.pkl` (the whole docstore unpickled on load) with
+`docstore.sqlite3` next to `index.faiss`:
+
+    chunks(pos INTEGER PRIMARY KEY,  -- the vector's position in index.faiss
+           id TEXT UNIQUE,           -- docstore id (also the BM25 key)
+           text TEXT, metadata TEXT) -- metadata as JSON
+
+`SQLiteDocstore` and `PositionMap` stand in for LangChain's InMemoryDocstore and
+`index_to_docstore_id` dict, so the FAISS vectorstore searches unchanged while only
+the returned top-k rows are ever read. A file is written whole and never modified
+afterwards (each save of the index writes a new one, see `rag.retrieve.save_index`),
+so readers open it as immutable.
+"""
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterator, List, Mapping, Optional, Union
+
+from langchain_community.docstore.base import Docstore
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_core.documents import Document
+
+
+_SCHEMA = """
+CREATE TABLE chunks (
+    pos INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    text TEXT NOT NULL,
+    metadata TEXT NOT NULL
+);
+"""
+
+_WRITE_BATCH = 10_000
+
+
+def _json_default(value):
+    # numpy scalars from pandas metadata (CSV columns) and anything else odd
+    return value.item() if hasattr(value, "item") else str(value)
+
+
+def write_chunk_store(path: Path, index_to_docstore_id: Mapping[int, str], docstore: Docstore) -> None:
+    """Write every chunk of a vectorstore to `path`, replacing any previous file atomically."""
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.unlink(missing_ok=True)
+    conn = sqlite3.connect(tmp)
+    try:
+        conn.execute("PRAGMA journal_mode=OFF")
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.executescript(_SCHEMA)
+        rows = []
+        for pos, doc_id in sorted(index_to_docstore_id.items()):
+            doc = docstore.search(doc_id)
+            if not isinstance(doc, Document):
+                raise ValueError(f"Docstore has no chunk for id {doc_id}")
+            rows.append((int(pos), doc_id, doc.page_content, json.dumps(doc.metadata, default=_json_default)))
+            if len(rows) >= _WRITE_BATCH:
+                conn.executemany("INSERT INTO chunks VALUES (?, ?, ?, ?)", rows)
+                rows = []
+        conn.executemany("INSERT INTO chunks VALUES (?, ?, ?, ?)", rows)
+        conn.commit()
+    finally:
+        conn.close()
+    with open(tmp, "rb+") as f:
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class ChunkStore:
+    """Read-only access to a `docstore.sqlite3` through one connection shared by all threads.
+
+    The connection is opened up front and keeps the file open, so the store goes on reading
+    the chunks of the index it was loaded with even after a newer save has replaced or
+    deleted the file; row positions always match that index's vectors.
+    """
+
+    _FETCH = 1000
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        if not self.path.exists():
+            raise FileNotFoundError(self.path)
+        # immutable: the file is never changed once written, so SQLite can skip locking entirely
+        self._db = sqlite3.connect(
+            f"{self.path.resolve().as_uri()}?mode=ro&immutable=1", uri=True, check_same_thread=False
+        )
+        self._lock = threading.Lock()
+        self._count: int = self._one("SELECT count(*) FROM chunks", ())[0]
+
+    def _one(self, sql: str, params: tuple) -> Optional[tuple]:
+        with self._lock:
+            return self._db.execute(sql, params).fetchone()
+
+    def _rows(self, sql: str) -> Iterator[tuple]:
+        # Fetched in slices so other threads' lookups are not held up behind a full scan
+        with self._lock:
+            cur = self._db.execute(sql)
+            rows = cur.fetchmany(self._FETCH)
+        while rows:
+            yield from rows
+            with self._lock:
+                rows = cur.fetchmany(self._FETCH)
+
+    def count(self) -> int:
+        return self._count
+
+    def id_at(self, pos: int) -> Optional[str]:
+        row = self._one("SELECT id FROM chunks WHERE pos = ?", (int(pos),))
+        return None if row is None else row[0]
+
+    def position(self, doc_id: str) -> Optional[int]:
+        row = self._one("SELECT pos FROM chunks WHERE id = ?", (doc_id,))
+        return None if row is None else row[0]
+
+    def document(self, doc_id: str) -> Optional[Document]:
+        row = self._one("SELECT text, metadata FROM chunks WHERE id = ?", (doc_id,))
+        if row is None:
+            return None
+        return Document(id=doc_id, page_content=row[0], metadata=json.loads(row[1]))
+
+    def positions(self) -> Iterator[int]:
+        return (row[0] for row in self._rows("SELECT pos FROM chunks ORDER BY pos"))
+
+    def ids(self) -> List[str]:
+        return [row[0] for row in self._rows("SELECT id FROM chunks ORDER BY pos")]
+
+    def iter_rows(self) -> Iterator[tuple]:
+        """(pos, id, text, metadata JSON) in position order."""
+        yield from self._rows("SELECT pos, id, text, metadata FROM chunks ORDER BY pos")
+
+    def load_in_memory(self) -> tuple:
+        """(InMemoryDocstore, index_to_docstore_id dict) for code that adds or deletes chunks."""
+        docs: Dict[str, Document] = {}
+        positions: Dict[int, str] = {}
+        for pos, doc_id, text, metadata in self.iter_rows():
+            docs[doc_id] = Document(id=doc_id, page_content=text, metadata=json.loads(metadata))
+            positions[pos] = doc_id
+        return InMemoryDocstore(docs), positions
+
+
+class SQLiteDocstore(Docstore):
+    """Read-only docstore over a ChunkStore; `search` fetches a single chunk."""
+
+    def __init__(self, store: ChunkStore) -> None:
+        self.store = store
+
+    def search(self, search: str) -> Union[str, Document]:
+        doc = self.store.document(search)
+        # Same contract as InMemoryDocstore: a message instead of a Document when missing
+        return doc if doc is not None else f"ID {search} not found."
+
+
+class PositionMap(Mapping):
+    """Read-only `index_to_docstore_id` over a ChunkStore, looked up per position."""
+
+    def __init__(self, store: ChunkStore) -> None:
+        self.store = store
+
+    def __getitem__(self, pos: int) -> str:
+        doc_id = self.store.id_at(pos)
+        if doc_id is None:
+            raise KeyError(pos)
+        return doc_id
+
+    def __len__(self) -> int:
+        return self.store.count()
+
+    def __iter__(self) -> Iterator[int]:
+        return self.store.positions()
+
+    def values(self) -> List[str]:
+        return self.store.ids()
+
+    def position(self, doc_id: str) -> Optional[int]:
+        return self.store.position(doc_id)
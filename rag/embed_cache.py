@@ -0,0 +1,206 @@
+# rag/embed_cache.py
+from __future__ import annotations
+
+import atexit
+import hashlib
+import json
+import os
+import re
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+_EMPTY = bytes(16)
+
+
+def text_key(text: str, kind: str = "doc") -> bytes:
+    # Queries and documents are keyed apart: some models embed them differently
+    return hashlib.blake2b(f"{kind}\x00{text}".encode("utf-8"), digest_size=16).digest()
+
+
+class EmbeddingCache:
+    """On-disk embedding cache for one model, shareable between processes.
+
+    Vectors live in a memory-mapped float32 matrix (`vectors.npy`) and the 16-byte key of
+    each row in `keys.npy`, whose extra last row holds (count, cursor); the key -> row map
+    is rebuilt from `keys.npy` on open. Once `max_rows` is reached the oldest rows are
+    overwritten first. Appends from several processes are serialised with a lock file and
+    always continue at the shared cursor; every read checks the row still holds the key it
+    was looked up by, so a row another process has reused reads as a miss. The mapping is
+    synced to disk every `flush_every` new rows and on `close()` (also run at exit).
+    """
+
+    _LAYOUT = 2
+
+    def __init__(self, root: Path, model_name: str, max_rows: int = 200_000, flush_every: int = 1024) -> None:
+        self.dir = Path(root) / re.sub(r"[^A-Za-z0-9_.-]+", "__", model_name)
+        self.max_rows = max_rows
+        self.flush_every = flush_every
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._rows: Dict[bytes, int] = {}
+        self._vectors: Optional[np.memmap] = None
+        self._keys: Optional[np.memmap] = None
+        self._unflushed = 0
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self._lock_file = open(self.dir / "lock", "a+b")
+        with self._file_lock():
+            self._open_existing()
+        atexit.register(self.close)
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        if fcntl is None:  # no advisory locks (Windows): one writing process per cache directory
+            yield
+            return
+        fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _open_existing(self) -> None:
+        meta_path = self.dir / "meta.json"
+        if self._vectors is not None or not meta_path.exists():
+            return
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        if meta.get("max_rows") != self.max_rows or meta.get("layout") != self._LAYOUT:
+            return  # another size or an older layout: start over on the first put
+        self._map(meta["dim"], mode="r+")
+        count = int(self._keys[self.max_rows, 0])
+        for row in range(count):
+            key = self._keys[row].tobytes()
+            if key != _EMPTY:
+                self._rows[key] = row
+
+    def _map(self, dim: int, mode: str) -> None:
+        self._vectors = np.lib.format.open_memmap(
+            self.dir / "vectors.npy", mode=mode, dtype=np.float32, shape=(self.max_rows, dim)
+        )
+        self._keys = np.lib.format.open_memmap(
+            self.dir / "keys.npy", mode=mode, dtype=np.uint64, shape=(self.max_rows + 1, 2)
+        )
+
+    def _create(self, dim: int) -> None:
+        self._map(dim, mode="w+")
+        meta = {"dim": dim, "max_rows": self.max_rows, "layout": self._LAYOUT}
+        tmp = self.dir / "meta.json.tmp"
+        tmp.write_text(json.dumps(meta), encoding="utf-8")
+        os.replace(tmp, self.dir / "meta.json")
+
+    def get_many(self, keys: List[bytes]) -> List[Optional[np.ndarray]]:
+        with self._lock:
+            out = []
+            for key in keys:
+                row = self._rows.get(key)
+                vec = None
+                if row is not None:
+                    # Check the key on both sides of the copy: a writer clears it before rewriting the row
+                    if self._keys[row].tobytes() == key:
+                        vec = np.array(self._vectors[row])
+                    if self._keys[row].tobytes() != key:
+                        vec = None
+                        del self._rows[key]
+                out.append(vec)
+            found = sum(v is not None for v in out)
+            self.hits += found
+            self.misses += len(keys) - found
+            return out
+
+    def put_many(self, keys: List[bytes], vectors: List[List[float]]) -> None:
+        if not keys:
+            return
+        with self._lock, self._file_lock():
+            if self._vectors is None:
+                self._open_existing()  # another process may have created it since
+                if self._vectors is None:
+                    self._create(len(vectors[0]))
+            header = self._keys[self.max_rows]
+            count, cursor = int(header[0]), int(header[1])
+            for key, vec in zip(keys, vectors):
+                row = self._rows.get(key)
+                if row is not None and self._keys[row].tobytes() == key:
+                    continue
+                row = cursor
+                old = self._keys[row].tobytes()
+                if row < count and old != _EMPTY:
+                    if self._rows.get(old) == row:
+                        del self._rows[old]
+                    self.evictions += 1
+                # Clear the key before writing the vector so no reader pairs a key with the wrong vector
+                self._keys[row] = 0
+                self._vectors[row] = vec
+                self._keys[row] = np.frombuffer(key, dtype=np.uint64)
+                self._rows[key] = row
+                cursor = (row + 1) % self.max_rows
+                count = max(count, row + 1)
+                self._unflushed += 1
+            header[0], header[1] = count, cursor
+            if self._unflushed >= self.flush_every:
+                self._flush()
+
+    def _flush(self) -> None:
+        self._vectors.flush()
+        self._keys.flush()
+        self._unflushed = 0
+
+    def close(self) -> None:
+        """Sync pending rows to disk."""
+        with self._lock:
+            if self._vectors is not None and self._unflushed:
+                self._flush()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        entries = 0
+        if self._keys is not None:
+            count = int(self._keys[self.max_rows, 0])
+            entries = int(self._keys[:count].any(axis=1).sum())
+        return {
+            "entries": entries,
+            "max_rows": self.max_rows,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+class CachedEmbeddings(Embeddings):
+    """Wraps an Embeddings model so identical texts are only ever encoded once."""
+
+    def __init__(self, base: Embeddings, cache: EmbeddingCache) -> None:
+        self.base = base
+        self.cache = cache
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [text_key(t) for t in texts]
+        cached = self.cache.get_many(keys)
+        missing = [i for i, vec in enumerate(cached) if vec is None]
+        if missing:
+            fresh = self.base.embed_documents([texts[i] for i in missing])
+            self.cache.put_many([keys[i] for i in missing], fresh)
+            for i, vec in zip(missing, fresh):
+                cached[i] = vec
+        # Round fresh vectors to float32 too, so a hit and a miss return identical values
+        return np.asarray(cached, dtype=np.float32).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        key = text_key(text, kind="query")
+        (vec,) = self.cache.get_many([key])
+        if vec is None:
+            vec = self.base.embed_query(text)
+            self.cache.put_many([key], [vec])
+        return np.asarray(vec, dtype=np.float32).tolist()
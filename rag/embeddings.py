@@ -0,0 +1,179 @@
+# rag/embeddings.py
+"""Embedding backends, selected by `Config.embed_backend`.
+
+    "hf"    sentence-transformers on PyTorch (fp32), the original backend
+    "onnx"  the same model's ONNX export on onnxruntime, optionally dynamically
+            quantized to int8 weights (`quantize=True`)
+
+Both take an explicit batch size and intra-op thread count. The ONNX backend sorts
+inputs by length so each batch pads to similar lengths; sentence-transformers
+already does that inside `encode`.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import re
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from rag.embed_cache import CachedEmbeddings, EmbeddingCache
+
+log = logging.getLogger(__name__)
+
+
+def _model_file(model_name: str, filename: str) -> str:
+    """`filename` from a local model directory, or downloaded from the Hugging Face hub."""
+    if Path(model_name).is_dir():
+        local = Path(model_name) / filename
+        if not local.exists():
+            raise FileNotFoundError(local)
+        return str(local)
+    from huggingface_hub import hf_hub_download
+
+    return hf_hub_download(model_name, filename)
+
+
+class OnnxEmbeddings(Embeddings):
+    """Sentence-transformers model run through onnxruntime: tokenize, encode, pool, normalize.
+
+    The ONNX graph, tokenizer and pooling settings come from the model's Hugging Face
+    repo or a local copy of it (sentence-transformers publish `onnx/model.onnx` for
+    their models). With
+    `quantize` the graph's weights are quantized to int8 once and the result is kept
+    in `onnx_dir`.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        batch_size: int = 64,
+        threads: Optional[int] = None,
+        quantize: bool = False,
+        onnx_dir: Path = Path("data/onnx"),
+        onnx_file: str = "onnx/model.onnx",
+        sort_by_length: bool = True,
+    ) -> None:
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        def fetch(filename: str) -> Optional[str]:
+            try:
+                return _model_file(model_name, filename)
+            except Exception:
+                return None
+
+        self.batch_size = batch_size
+        self.sort_by_length = sort_by_length
+        st_config = fetch("sentence_bert_config.json")
+        max_length = json.loads(Path(st_config).read_text())["max_seq_length"] if st_config else 512
+        pooling = fetch("1_Pooling/config.json")
+        self.pooling = "mean"
+        if pooling and json.loads(Path(pooling).read_text()).get("pooling_mode_cls_token"):
+            self.pooling = "cls"
+        modules = fetch("modules.json")
+        self.normalize = bool(modules) and any(m["type"].endswith("Normalize") for m in json.loads(Path(modules).read_text()))
+
+        self.tokenizer = Tokenizer.from_file(_model_file(model_name, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        if self.tokenizer.padding is None:
+            self.tokenizer.enable_padding()
+
+        model_path = _model_file(model_name, onnx_file)
+        if quantize:
+            model_path = str(quantized_model(model_path, Path(onnx_dir) / re.sub(r"[^A-Za-z0-9_.-]+", "__", model_name)))
+
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feed = {"input_ids": ids, "attention_mask": mask}
+        if "token_type_ids" in self.input_names:
+            feed["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+        hidden = self.session.run(None, feed)[0]
+        if self.pooling == "cls":
+            pooled = hidden[:, 0]
+        else:
+            weights = mask[:, :, None].astype(np.float32)
+            pooled = (hidden * weights).sum(axis=1) / np.maximum(weights.sum(axis=1), 1e-9)
+        if self.normalize:
+            pooled = pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+        return pooled.astype(np.float32)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        # Similar lengths per batch: padding to the longest text wastes less compute
+        order = list(range(len(texts)))
+        if self.sort_by_length:
+            order.sort(key=lambda i: len(texts[i]))
+        out: List[Optional[np.ndarray]] = [None] * len(texts)
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            for i, vec in zip(batch, self._encode([texts[i] for i in batch])):
+                out[i] = vec
+        return np.asarray(out).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._encode([text])[0].tolist()
+
+
+def quantized_model(model_path: str, out_dir: Path) -> Path:
+    """int8 dynamic quantization of an ONNX model (weights only), computed once per model."""
+    out = out_dir / "model_qint8.onnx"
+    if not out.exists():
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        out_dir.mkdir(parents=True, exist_ok=True)
+        log.info("Quantizing %s to int8 -> %s", model_path, out)
+        tmp = out.with_suffix(".tmp.onnx")
+        quantize_dynamic(model_path, tmp, weight_type=QuantType.QInt8)
+        tmp.replace(out)
+    return out
+
+
+def embedding_tag(embed_model: str, backend: str = "hf", quantize: bool = False) -> str:
+    """Name the vectors of a model/backend pair: int8 vectors differ slightly from fp32 ones."""
+    if backend == "onnx" and quantize:
+        return f"{embed_model}@onnx-int8"
+    return embed_model
+
+
+def make_embeddings(
+    embed_model: str,
+    cache_dir: Optional[Path] = None,
+    cache_max_rows: int = 200_000,
+    backend: str = "hf",
+    batch_size: int = 64,
+    threads: Optional[int] = None,
+    quantize: bool = False,
+    onnx_dir: Path = Path("data/onnx"),
+) -> Embeddings:
+    """Build the embedding model, wrapped in a persistent cache when `cache_dir` is set."""
+    if backend == "onnx":
+        embeddings = OnnxEmbeddings(embed_model, batch_size=batch_size, threads=threads, quantize=quantize, onnx_dir=onnx_dir)
+    elif backend == "hf":
+        from langchain_huggingface import HuggingFaceEmbeddings
+
+        if threads:
+            import torch
+
+            torch.set_num_threads(threads)
+        embeddings = HuggingFaceEmbeddings(model_name=embed_model, encode_kwargs={"batch_size": batch_size})
+    else:
+        raise ValueError(f"Unknown embedding backend {backend!r}; expected 'hf' or 'onnx'")
+    if cache_dir is None:
+        return embeddings
+    tag = embedding_tag(embed_model, backend, quantize)
+    return CachedEmbeddings(embeddings, EmbeddingCache(cache_dir, tag, max_rows=cache_max_rows))
@@ -0,0 +1,104 @@
+# rag/index_types.py
+from __future__ import annotations
+
+from dataclasses import asdict, dataclass
+from typing import Optional
+
+import faiss
+import numpy as np
+
+
+INDEX_TYPES = ("Flat", "IVF-Flat", "IVF-PQ", "HNSW")
+
+
+@dataclass(frozen=True)
+class IndexSpec:
+    """Which FAISS index to build and how to search it.
+
+    Every type uses the (squared) L2 metric of the default flat index, so the distances
+    that `rag.decision.decide` thresholds on keep the same meaning; IVF-PQ distances are
+    approximations of the same quantity.
+    """
+
+    index_type: str = "Flat"
+    nlist: int = 256
+    pq_m: int = 48
+    hnsw_m: int = 32
+    train_size: int = 20_000
+    nprobe: int = 16
+    ef_search: int = 64
+
+    @property
+    def needs_training(self) -> bool:
+        return self.index_type.startswith("IVF")
+
+    @property
+    def supports_delete(self) -> bool:
+        # LangChain's FAISS.delete renumbers positions like a flat index would;
+        # IVF keeps the original labels and HNSW cannot remove at all.
+        return self.index_type == "Flat"
+
+    @classmethod
+    def from_config(cls, cfg) -> "IndexSpec":
+        return cls(
+            index_type=cfg.index_type,
+            nlist=cfg.ivf_nlist,
+            pq_m=cfg.pq_m,
+            hnsw_m=cfg.hnsw_m,
+            train_size=cfg.index_train_size,
+            nprobe=cfg.nprobe,
+            ef_search=cfg.ef_search,
+        )
+
+    def build_settings(self) -> dict:
+        """The fields that change what is stored, recorded in the ingest manifest."""
+        fields = asdict(self)
+        fields.pop("nprobe")
+        fields.pop("ef_search")
+        return fields
+
+
+def _largest_divisor_at_most(n: int, limit: int) -> int:
+    return max(d for d in range(1, min(n, limit) + 1) if n % d == 0)
+
+
+def factory_string(spec: IndexSpec, dim: int, n_train: int) -> str:
+    if spec.index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type {spec.index_type!r}. Options: {', '.join(INDEX_TYPES)}")
+    if spec.index_type == "Flat":
+        return "Flat"
+    if spec.index_type == "HNSW":
+        return f"HNSW{spec.hnsw_m}"
+
+    # k-means wants ~39 points per centroid; shrink nlist rather than train on too little data
+    nlist = max(1, min(spec.nlist, n_train // 39))
+    if spec.index_type == "IVF-Flat":
+        return f"IVF{nlist},Flat"
+
+    m = _largest_divisor_at_most(dim, spec.pq_m)
+    # Same rule for the PQ codebooks: 2**nbits centroids per sub-quantizer
+    nbits = int(min(8, max(1, np.floor(np.log2(max(n_train, 1) / 39)))))
+    return f"IVF{nlist},PQ{m}x{nbits}"
+
+
+def new_index(spec: IndexSpec, dim: int, sample: Optional[np.ndarray] = None) -> faiss.Index:
+    """Create an empty index, trained on `sample` when the type needs it."""
+    n_train = 0 if sample is None else len(sample)
+    index = faiss.index_factory(dim, factory_string(spec, dim, n_train), faiss.METRIC_L2)
+    if not index.is_trained:
+        if not n_train:
+            raise ValueError(f"{spec.index_type} index needs training vectors")
+        index.train(np.ascontiguousarray(sample, dtype=np.float32))
+    set_search_params(index, spec)
+    return index
+
+
+def set_search_params(index: faiss.Index, spec: IndexSpec) -> None:
+    """Apply the query-time knobs (nprobe for IVF, efSearch for HNSW) to a built index."""
+    try:
+        faiss.extract_index_ivf(index).nprobe = spec.nprobe
+    except RuntimeError:
+        pass
+    hnsw = getattr(faiss.downcast_index(index), "hnsw", None)
+    if hnsw is not None:
+        hnsw.efSearch = spec.ef_search
@@ -1,17 +1,42 @@
 # rag/ingest.py
 from __future__ import annotations
 
+import logging
 import re
+from collections import deque
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from itertools import islice
 from pathlib import Path
-from typing import List
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 
+import numpy as np
 import pandas as pd
 
 from langchain_community.document_loaders import PyMuPDFLoader
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_community.vectorstores import FAISS
-from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+import tracing
+from rag.dedup import ChunkDeduper, source_entry
+from rag.embeddings import embedding_tag, make_embeddings
+from rag.index_types import IndexSpec, new_index
+from rag.lexical import BM25Index, load_lexical
+from rag.manifest import FileEntry, Manifest, file_sha256, iter_chunk_ids, load_manifest, save_manifest
+from rag.retrieve import current_dir, load_index, save_index
+
+
+log = logging.getLogger(__name__)
+
+_NOT_SYMBOL_OR_DIGIT = re.compile(r"[^0-9\s,.\-:/]")
+_LETTER = re.compile(r"[A-Za-zÄÖÜäöüß]")
+_SPACES = re.compile(r"[ \t]+")
+_BLANK_LINES = re.compile(r"\n{3,}")
 
 
 def clean_extracted_text(text: str) -> str:
@@ -24,84 +49,200 @@ def clean_extracted_text(text: str) -> str:
             continue
 
         # Drop lines containing only symbols/digits (e.g., page numbers, figure numbers)
-        only_symbols_digits = re.sub(r"[0-9\s,.\-:/]", "", ln) == ""
-        if only_symbols_digits and len(ln) <= 40:
+        if len(ln) <= 40 and not _NOT_SYMBOL_OR_DIGIT.search(ln):
             continue
 
         # Drop very short lines that are mostly non-letters
-        letters = re.findall(r"[A-Za-zÄÖÜäöüß]", ln)
-        if len(letters) < 10 and len(ln) < 25:
+        if len(ln) < 25 and len(_LETTER.findall(ln)) < 10:
             continue
 
         cleaned_lines.append(ln)
 
     text = "\n".join(cleaned_lines)
-    text = re.sub(r"[ \t]+", " ", text)
-    text = re.sub(r"\n{3,}", "\n\n", text)
+    text = _SPACES.sub(" ", text)
+    text = _BLANK_LINES.sub("\n\n", text)
     return text.strip()
 
 
-def load_files(source_dir: Path, file_type: str = 'pdf', rows_per_chunk: int = 50) -> List[Document]:
-    """Load PDF or CSV files from a directory into Documents.
+def _format_rows(df: pd.DataFrame, columns: Sequence[str]) -> List[str]:
+    """Render every row as "col1: val1 | col2: val2 | ..." from per-column string arrays."""
+    # pandas >= 3 keeps missing values as NaN through astype(str); spell them like str(nan)
+    if not columns:
+        return [""] * len(df)
+    values = [df[col].astype(str).fillna("nan").to_numpy(dtype=object) for col in columns]
+    template = " | ".join(str(col).replace("{", "{{").replace("}", "}}") + ": {}" for col in columns)
+    return [template.format(*row) for row in zip(*values)]
+
+
+def iter_csv_documents(
+    path: Path,
+    rows_per_chunk: int = 50,
+    text_columns: Optional[Sequence[str]] = None,
+    metadata_columns: Sequence[str] = (),
+    read_chunksize: int = 10_000,
+) -> Iterator[Document]:
+    """Stream a CSV as Documents of `rows_per_chunk` rows without loading the whole table.
+
+    `text_columns` (default: every column not in `metadata_columns`) are rendered into the
+    page content; each of `metadata_columns` is stored in the metadata as the list of its
+    distinct values within the document. Columns a file does not have are ignored.
+    """
+    # Keep document boundaries independent of how the file is read
+    read_chunksize = max(1, read_chunksize // rows_per_chunk) * rows_per_chunk
+    offset = 0
+    for frame in pd.read_csv(path, chunksize=read_chunksize):
+        if text_columns is None:
+            cols = [c for c in frame.columns if c not in metadata_columns]
+        else:
+            cols = [c for c in text_columns if c in frame.columns]
+        meta = {c: frame[c].to_numpy() for c in metadata_columns if c in frame.columns}
+        lines = _format_rows(frame, cols)
+        for start in range(0, len(frame), rows_per_chunk):
+            end = min(start + rows_per_chunk, len(frame))
+            metadata = {
+                "source": str(path),
+                "filename": path.name,
+                "row_start": offset + start,
+                "row_end": offset + end,
+            }
+            for col, values in meta.items():
+                metadata[col] = pd.unique(values[start:end]).tolist()
+            yield Document(page_content=f"File: {path.name}\n" + "\n".join(lines[start:end]), metadata=metadata)
+        offset += len(frame)
+
+
+def load_file(
+    path: Path,
+    file_type: str = 'pdf',
+    rows_per_chunk: int = 50,
+    text_columns: Optional[Sequence[str]] = None,
+    metadata_columns: Sequence[str] = (),
+) -> List[Document]:
+    """Load a single PDF or CSV file into Documents.
     
     Args:
-        source_dir: Directory containing the files to load.
-        file_type: Type of files to load ('pdf' or 'csv').
+        path: File to load.
+        file_type: Type of the file ('pdf' or 'csv').
         rows_per_chunk: For CSVs, number of rows to combine into one document.
+        text_columns: For CSVs, columns rendered into the text (default: all but metadata).
+        metadata_columns: For CSVs, columns kept as document metadata instead.
     
     Returns:
         List of Document objects with content and metadata.
     """
+    docs: List[Document] = []
+    if file_type == 'pdf':
+        pages = PyMuPDFLoader(str(path)).load()
+        # Clean extracted text only for PDFs (removes noise like page numbers)
+        for d in pages:
+            d.page_content = clean_extracted_text(d.page_content)
+            d.metadata["source"] = str(path)
+            d.metadata["filename"] = path.name
+        docs.extend(pages)
+        
+    elif file_type == 'csv':
+        docs.extend(iter_csv_documents(path, rows_per_chunk, text_columns, metadata_columns))
+    else:
+        raise ValueError(f"Unsupported file type: {file_type}")
+    
+    log.info("Loaded %d documents from %s", len(docs), path.name)
+    return docs
+
+
+def list_files(source_dir: Path, file_type: str = 'pdf') -> List[Path]:
     paths = sorted(source_dir.glob(f"*.{file_type}"))
 
     if not paths:
         raise FileNotFoundError(f"No {file_type.upper()} files found in {source_dir}")
+    return paths
 
-    docs: List[Document] = []
-    for path in paths:
-        if file_type == 'pdf':
-            pages = PyMuPDFLoader(str(path)).load()
-            # Clean extracted text only for PDFs (removes noise like page numbers)
-            for d in pages:
-                d.page_content = clean_extracted_text(d.page_content)
-                d.metadata["source"] = str(path)
-                d.metadata["filename"] = path.name
-            docs.extend(pages)
-            
-        elif file_type == 'csv':
-            # Use pandas to batch rows together for efficiency
-            df = pd.read_csv(path)
-            columns = df.columns.tolist()
-            
-            # Group rows into chunks to reduce document count
-            for start_idx in range(0, len(df), rows_per_chunk):
-                chunk_df = df.iloc[start_idx:start_idx + rows_per_chunk]
-                
-                # Format each row as "col1: val1 | col2: val2 | ..."
-                rows_text = []
-                for _, row in chunk_df.iterrows():
-                    row_str = " | ".join(f"{col}: {row[col]}" for col in columns)
-                    rows_text.append(row_str)
-                
-                content = f"File: {path.name}\n" + "\n".join(rows_text)
-                
-                doc = Document(
-                    page_content=content,
-                    metadata={
-                        "source": str(path),
-                        "filename": path.name,
-                        "row_start": start_idx,
-                        "row_end": min(start_idx + rows_per_chunk, len(df)),
-                    }
-                )
-                docs.append(doc)
-            
-            pages = len(range(0, len(df), rows_per_chunk))
-        else:
-            raise ValueError(f"Unsupported file type: {file_type}")
-        
-        print(f"Loaded {len(pages) if file_type == 'pdf' else pages} documents from {path.name}")
 
+def iter_loaded_files(
+    paths: List[Path],
+    file_type: str = 'pdf',
+    rows_per_chunk: int = 50,
+    workers: int = 0,
+    text_columns: Optional[Sequence[str]] = None,
+    metadata_columns: Sequence[str] = (),
+) -> Iterator[Tuple[Path, Iterable[Document]]]:
+    """Yield (path, documents) for each path, in input order.
+    
+    With `workers > 1` PDFs are extracted and cleaned in a process pool. At most
+    `2 * workers` files are in flight, so results stream back without piling up.
+    If the pool cannot be started or dies, the remaining files are loaded serially.
+    CSVs are read in this process and their documents come as a lazy iterator, so a
+    file is never held whole (nor pickled back from a worker): consume it before the
+    next file.
+    """
+    if file_type == "csv":
+        for path in paths:
+            yield path, iter_csv_documents(path, rows_per_chunk, text_columns, metadata_columns)
+        return
+    load = partial(
+        load_file,
+        file_type=file_type,
+        rows_per_chunk=rows_per_chunk,
+        text_columns=text_columns,
+        metadata_columns=metadata_columns,
+    )
+    if workers <= 1 or len(paths) <= 1:
+        for path in paths:
+            yield path, load(path)
+        return
+
+    done = 0
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = deque()
+            submitted = iter(paths)
+            for path in islice(submitted, 2 * workers):
+                pending.append((path, pool.submit(load, path)))
+            while pending:
+                path, fut = pending.popleft()
+                docs = fut.result()
+                for nxt in islice(submitted, 1):
+                    pending.append((nxt, pool.submit(load, nxt)))
+                done += 1
+                yield path, docs
+    except (BrokenProcessPool, OSError) as e:
+        log.warning("Process pool failed (%s), loading the remaining files serially", e)
+        for path in paths[done:]:
+            yield path, load(path)
+
+
+def load_files(
+    source_dir: Path,
+    file_type: str = 'pdf',
+    rows_per_chunk: int = 50,
+    workers: int = 0,
+    text_columns: Optional[Sequence[str]] = None,
+    metadata_columns: Sequence[str] = (),
+) -> List[Document]:
+    """Load PDF or CSV files from a directory into Documents.
+    
+    Args:
+        source_dir: Directory containing the files to load.
+        file_type: Type of files to load ('pdf' or 'csv').
+        rows_per_chunk: For CSVs, number of rows to combine into one document.
+        workers: Number of extraction processes; 0 or 1 loads serially.
+        text_columns: For CSVs, columns rendered into the text (default: all but metadata).
+        metadata_columns: For CSVs, columns kept as document metadata instead.
+    
+    Returns:
+        List of Document objects with content and metadata.
+    """
+    docs: List[Document] = []
+    paths = list_files(source_dir, file_type)
+    loaded = iter_loaded_files(
+        paths,
+        file_type=file_type,
+        rows_per_chunk=rows_per_chunk,
+        workers=workers,
+        text_columns=text_columns,
+        metadata_columns=metadata_columns,
+    )
+    for _, file_docs in loaded:
+        docs.extend(file_docs)
     return docs
 
 
@@ -118,18 +259,249 @@ def chunk_docs(docs: List[Document], chunk_size: int, chunk_overlap: int) -> Lis
     return splitter.split_documents(docs)
 
 
+def iter_file_chunks(
+    name: str,
+    sha256: str,
+    docs: Iterable[Document],
+    min_chars_per_page: int,
+    chunk_size: int,
+    chunk_overlap: int,
+) -> Iterator[Tuple[str, Document]]:
+    """(chunk id, chunk) for one file, filtering and chunking its documents one at a time."""
+    ids = iter_chunk_ids(name, sha256)
+    for doc in docs:
+        with tracing.span("ingest.chunk", docs=1) as span:
+            chunks = chunk_docs(filter_pages([doc], min_chars_per_page), chunk_size, chunk_overlap)
+            span.set(chunks=len(chunks))
+        tracing.count("ingest.chunks", len(chunks))
+        for chunk in chunks:
+            yield next(ids), chunk
+
+
 def build_and_save_index(
     docs: List[Document],
     embed_model: str,
     index_dir: Path,
+    ids: Optional[List[str]] = None,
+    embeddings: Optional[Embeddings] = None,
+    index_format: str = "sqlite",
 ) -> None:
-    embeddings = HuggingFaceEmbeddings(model_name=embed_model)
-    vectorstore = FAISS.from_documents(docs, embeddings)
+    if embeddings is None:
+        embeddings = make_embeddings(embed_model)
+    vectorstore = FAISS.from_documents(docs, embeddings, ids=ids)
+    lexical = BM25Index()
+    lexical.add(vectorstore.index_to_docstore_id.values(), (d.page_content for d in docs))
 
     index_dir.parent.mkdir(parents=True, exist_ok=True)
-    vectorstore.save_local(str(index_dir))
+    save_index(vectorstore, index_dir, index_format, lexical=lexical)
 
 
+class IndexWriter:
+    """Embeds chunks in fixed-size batches, adds them to a FAISS index and checkpoints it.
+
+    A file is recorded in the manifest only once all of its chunks are in the index.
+    Files still in progress at a checkpoint are written with an invalid size and hash,
+    so the next incremental run deletes their partial vectors and redoes them.
+
+    For index types that need training (IVF), embedded batches are held back until
+    `spec.train_size` vectors are available, the index is trained on them, and only
+    then does adding (and checkpointing) start.
+
+    Sources of dropped duplicate chunks (`add_source`) are merged into the kept chunk's
+    "sources" metadata at the next checkpoint after that chunk is in the index.
+    """
+
+    def __init__(
+        self,
+        vectorstore: Optional[FAISS],
+        embeddings: Embeddings,
+        index_dir: Path,
+        manifest: Manifest,
+        batch_size: int,
+        checkpoint_every: int,
+        spec: IndexSpec = IndexSpec(),
+        lexical: Optional[BM25Index] = None,
+        index_format: str = "sqlite",
+    ) -> None:
+        self.vectorstore = vectorstore
+        self.spec = spec
+        self.index_format = index_format
+        self.lexical = lexical if lexical is not None else BM25Index()
+        self.embeddings = embeddings
+        self.index_dir = index_dir
+        self.manifest = manifest
+        self.batch_size = max(1, batch_size)
+        self.checkpoint_every = checkpoint_every
+        self.batches = 0
+        self._dirty = True  # the caller may already have deleted vectors
+        self._buffer: List[Tuple[str, str, Document]] = []  # (file name, chunk id, chunk)
+        self._pending: Dict[str, Tuple[FileEntry, int]] = {}  # file name -> (entry, chunks not yet added)
+        self._reading: set = set()  # files whose chunks are still being read
+        self._added: Dict[str, List[str]] = {}
+        self._untrained: List[Tuple[List[str], List[List[float]], List[dict], List[str]]] = []
+        self._untrained_count = 0
+        self._sources: Dict[str, List[dict]] = {}  # kept chunk id -> sources of its duplicates
+
+    def add_source(self, chunk_id: str, source: dict) -> None:
+        self._sources.setdefault(chunk_id, []).append(source)
+
+    def _merge_sources(self) -> None:
+        for chunk_id in list(self._sources):
+            doc = self.vectorstore.docstore.search(chunk_id)
+            if not isinstance(doc, Document):
+                continue  # still waiting in the buffer
+            sources = doc.metadata.get("sources") or [source_entry(doc.metadata)]
+            sources.extend(s for s in self._sources.pop(chunk_id) if s not in sources)
+            doc.metadata["sources"] = sources
+
+    def add_file(self, name: str, entry: FileEntry, chunks: Iterable[Tuple[str, Document]]) -> None:
+        """Queue a file's (chunk id, chunk) pairs, read lazily; each id is appended to `entry.chunk_ids`."""
+        self._dirty = True
+        self._pending[name] = (entry, 0)
+        self._added[name] = []
+        self._reading.add(name)
+        for cid, chunk in chunks:
+            entry.chunk_ids.append(cid)
+            self._pending[name] = (entry, self._pending[name][1] + 1)
+            self._buffer.append((name, cid, chunk))
+            if len(self._buffer) >= self.batch_size:
+                self.flush()
+        self._reading.discard(name)
+        if not self._pending[name][1]:
+            self._done(name)
+
+    def _done(self, name: str) -> None:
+        self.manifest.files[name] = self._pending.pop(name)[0]
+        del self._added[name]
+
+    def flush(self) -> None:
+        if not self._buffer:
+            return
+        self._dirty = True
+        batch, self._buffer = self._buffer, []
+        texts = [chunk.page_content for _, _, chunk in batch]
+        with tracing.span("ingest.embed", chunks=len(texts)):
+            vectors = self.embeddings.embed_documents(texts)
+        metadatas = [chunk.metadata for _, _, chunk in batch]
+        ids = [cid for _, cid, _ in batch]
+        with tracing.span("ingest.lexical", chunks=len(texts)):
+            self.lexical.add(ids, texts)
+        if self.vectorstore is not None:
+            with tracing.span("ingest.add", chunks=len(texts)):
+                self.vectorstore.add_embeddings(list(zip(texts, vectors)), metadatas=metadatas, ids=ids)
+        else:
+            self._untrained.append((texts, vectors, metadatas, ids))
+            self._untrained_count += len(texts)
+            if not self.spec.needs_training or self._untrained_count >= self.spec.train_size:
+                self._create_store()
+
+        for name, cid, _ in batch:
+            self._added[name].append(cid)
+            entry, remaining = self._pending[name]
+            self._pending[name] = (entry, remaining - 1)
+            if remaining == 1 and name not in self._reading:
+                self._done(name)
+
+        self.batches += 1
+        if self.checkpoint_every and self.batches % self.checkpoint_every == 0:
+            self.checkpoint()
+
+    @tracing.traced("ingest.train")
+    def _create_store(self) -> None:
+        pending, self._untrained = self._untrained, []
+        sample = np.asarray([vec for _, vectors, _, _ in pending for vec in vectors], dtype=np.float32)
+        index = new_index(self.spec, sample.shape[1], sample[: self.spec.train_size])
+        self.vectorstore = FAISS(
+            embedding_function=self.embeddings,
+            index=index,
+            docstore=InMemoryDocstore(),
+            index_to_docstore_id={},
+        )
+        for texts, vectors, metadatas, ids in pending:
+            self.vectorstore.add_embeddings(list(zip(texts, vectors)), metadatas=metadatas, ids=ids)
+
+    @tracing.traced("ingest.checkpoint")
+    def checkpoint(self) -> None:
+        if self.vectorstore is None:
+            return
+        partial = Manifest(settings=self.manifest.settings, files=dict(self.manifest.files))
+        for name, cids in self._added.items():
+            partial.files[name] = FileEntry(size=-1, mtime_ns=-1, sha256="", chunk_ids=list(cids))
+        self._merge_sources()
+        save_index(self.vectorstore, self.index_dir, self.index_format, lexical=self.lexical)
+        save_manifest(self.index_dir, partial)
+        self._dirty = False
+        log.info("Checkpoint: %d vectors after %d batches", self.vectorstore.index.ntotal, self.batches)
+
+    def close(self) -> None:
+        self.flush()
+        if self.vectorstore is None and self._untrained:
+            # Fewer vectors than train_size in total: train on everything there is
+            self._create_store()
+        if self.vectorstore is None:
+            raise ValueError(f"No chunks to index in {self.index_dir}")
+        if self._dirty:
+            self.checkpoint()
+
+
+@dataclass
+class IngestReport:
+    full_rebuild: bool = False
+    files_skipped: int = 0
+    files_embedded: int = 0
+    files_deleted: int = 0
+    chunks_skipped: int = 0
+    chunks_embedded: int = 0
+    chunks_deleted: int = 0
+    chunks_duplicate: int = 0
+
+    def __str__(self) -> str:
+        mode = "full rebuild" if self.full_rebuild else "incremental"
+        return (
+            f"{mode}: files skipped={self.files_skipped} embedded={self.files_embedded} deleted={self.files_deleted} | "
+            f"chunks skipped={self.chunks_skipped} embedded={self.chunks_embedded} deleted={self.chunks_deleted} "
+            f"duplicates dropped={self.chunks_duplicate}"
+        )
+
+
+def _drop_sources(vectorstore: FAISS, old_files: Dict[str, FileEntry], manifest: Manifest) -> None:
+    """Remove files that are being re-ingested or are gone from the "sources" of chunks they duplicated."""
+    for name, entry in old_files.items():
+        if name in manifest.files:
+            continue
+        for cid in entry.duplicate_of:
+            doc = vectorstore.docstore.search(cid)
+            if not isinstance(doc, Document) or "sources" not in doc.metadata:
+                continue
+            own = source_entry(doc.metadata)
+            sources = [s for s in doc.metadata["sources"] if s.get("filename") != name or s == own]
+            if len(sources) > 1:
+                doc.metadata["sources"] = sources
+            else:
+                del doc.metadata["sources"]
+
+
+def _drop_duplicates(
+    chunks: Iterable[Tuple[str, Document]],
+    deduper: ChunkDeduper,
+    writer: IndexWriter,
+    entry: FileEntry,
+    report: IngestReport,
+) -> Iterator[Tuple[str, Document]]:
+    """`chunks` without the duplicates of chunks kept so far; those are recorded as sources of the kept one."""
+    for cid, chunk in chunks:
+        with tracing.span("ingest.dedup", chunks=1):
+            match = deduper.match(cid, chunk.page_content)
+        if match is None:
+            yield cid, chunk
+            continue
+        writer.add_source(match[0], source_entry(chunk.metadata))
+        if match[0] not in entry.duplicate_of:
+            entry.duplicate_of.append(match[0])
+        report.chunks_duplicate += 1
+
+
+@tracing.traced("ingest.total")
 def ingest_folder(
     source_dir: Path,
     file_type: str,
@@ -138,19 +510,179 @@ def ingest_folder(
     min_chars_per_page: int,
     chunk_size: int,
     chunk_overlap: int,
-) -> None:
-    print("Loading files...")
-    docs = load_files(source_dir, file_type=file_type)
-    print(f"Total documents loaded: {len(docs)}")
-    
-    print("Filtering pages...")
-    kept = filter_pages(docs, min_chars_per_page=min_chars_per_page)
-    print(f"Documents after filtering: {len(kept)}")
-    
-    print("Chunking documents...")
-    chunks = chunk_docs(kept, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
-    print(f"Total chunks: {len(chunks)}")
-    
-    print("Building embeddings and index (this may take a few minutes)...")
-    build_and_save_index(chunks, embed_model=embed_model, index_dir=index_dir)
-    print("Done!")
+    incremental: bool = True,
+    workers: int = 0,
+    batch_size: int = 256,
+    checkpoint_every: int = 20,
+    embeddings: Optional[Embeddings] = None,
+    index_spec: IndexSpec = IndexSpec(),
+    csv_rows_per_chunk: int = 50,
+    csv_text_columns: Optional[Sequence[str]] = None,
+    csv_metadata_columns: Sequence[str] = (),
+    index_format: str = "sqlite",
+    dedup_threshold: Optional[float] = None,
+    embed_backend: str = "hf",
+    embed_quantize: bool = False,
+) -> IngestReport:
+    """Index the files in `source_dir`, re-embedding only files that changed since the last run.
+
+    A manifest next to the index records each file's size, mtime, content hash and chunk ids.
+    Unchanged files are skipped, changed and removed files have their vectors deleted, and a
+    change in embedding model, backend quantization (`embed_backend`/`embed_quantize`, see
+    `rag.embeddings.embedding_tag`) or chunking settings (or `incremental=False`) forces a
+    full rebuild.
+
+    Files stream through load -> filter -> chunk one at a time and chunks are embedded and
+    added in batches of `batch_size`, so memory stays bounded by the batch and the largest
+    PDF; a CSV is read, chunked and embedded a few thousand rows at a time (see
+    `iter_csv_documents`), never held whole. The index and manifest are saved every `checkpoint_every` batches; rerunning after a
+    crash resumes from the last checkpoint. `index_format` is "sqlite" (memory-mappable, see
+    `rag.retrieve.save_index`) or LangChain's "pickle".
+
+    With `dedup_threshold`, each chunk is matched against the chunks kept so far (this run's
+    and the index's) before embedding; exact and near duplicates (estimated shingle Jaccard
+    >= the threshold, see `rag.dedup`) are dropped and listed in the kept chunk's "sources"
+    metadata. A file whose duplicates point at chunks being deleted is re-ingested with them.
+    """
+    settings = {
+        # The tag, not just the model name: int8 vectors must not be mixed with fp32 ones
+        "embed_model": embedding_tag(embed_model, embed_backend, embed_quantize),
+        "file_type": file_type,
+        "min_chars_per_page": min_chars_per_page,
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+        "index": index_spec.build_settings(),
+    }
+    if file_type == "csv":
+        settings["csv"] = {
+            "rows_per_chunk": csv_rows_per_chunk,
+            "text_columns": None if csv_text_columns is None else list(csv_text_columns),
+            "metadata_columns": list(csv_metadata_columns),
+        }
+    deduper = ChunkDeduper(dedup_threshold) if dedup_threshold is not None else None
+    if deduper is not None:
+        settings["dedup"] = deduper.settings()
+    paths = list_files(source_dir, file_type)
+
+    previous = load_manifest(index_dir) if incremental else None
+    if previous is not None and previous.settings != settings:
+        log.warning("Ingestion settings changed since the last run, rebuilding the whole index.")
+        previous = None
+    if previous is not None and not (current_dir(index_dir) / "index.faiss").exists():
+        previous = None
+    old_files = previous.files if previous is not None else {}
+
+    report = IngestReport(full_rebuild=previous is None)
+    manifest = Manifest(settings=settings)
+    changed = []
+    with tracing.span("ingest.scan", files=len(paths)):
+        for path in paths:
+            st = path.stat()
+            entry = old_files.get(path.name)
+            if entry is not None and entry.size == st.st_size and entry.mtime_ns == st.st_mtime_ns:
+                manifest.files[path.name] = entry
+                continue
+            sha = file_sha256(path)
+            if entry is not None and entry.sha256 == sha:
+                # Touched but not modified
+                manifest.files[path.name] = FileEntry(st.st_size, st.st_mtime_ns, sha, entry.chunk_ids, entry.duplicate_of)
+                continue
+            changed.append((path, st, sha))
+
+    # An unchanged file whose duplicates were represented by chunks that are about to be
+    # deleted would lose that text: re-ingest it too (repeatedly, as it frees chunks itself)
+    while True:
+        going = {cid for name, entry in old_files.items() if name not in manifest.files for cid in entry.chunk_ids}
+        orphaned = [name for name, entry in manifest.files.items() if going.intersection(entry.duplicate_of)]
+        if not orphaned:
+            break
+        for name in orphaned:
+            entry = manifest.files.pop(name)
+            changed.append((source_dir / name, (source_dir / name).stat(), entry.sha256))
+
+    for entry in manifest.files.values():
+        report.files_skipped += 1
+        report.chunks_skipped += len(entry.chunk_ids)
+
+    delete_ids = []
+    for name, entry in old_files.items():
+        if name not in manifest.files:
+            delete_ids.extend(entry.chunk_ids)
+            if not (source_dir / name).exists():
+                report.files_deleted += 1
+    report.chunks_deleted = len(delete_ids)
+
+    if delete_ids and not index_spec.supports_delete:
+        log.warning("%s indexes cannot drop vectors, rebuilding the whole index.", index_spec.index_type)
+        return ingest_folder(
+            source_dir, file_type, index_dir, embed_model, min_chars_per_page, chunk_size, chunk_overlap,
+            incremental=False, workers=workers, batch_size=batch_size, checkpoint_every=checkpoint_every,
+            embeddings=embeddings, index_spec=index_spec, csv_rows_per_chunk=csv_rows_per_chunk,
+            csv_text_columns=csv_text_columns, csv_metadata_columns=csv_metadata_columns,
+            index_format=index_format, dedup_threshold=dedup_threshold,
+            embed_backend=embed_backend, embed_quantize=embed_quantize,
+        )
+
+    log.info("Loading %d new or changed files (%d unchanged)...", len(changed), report.files_skipped)
+    if embeddings is None:
+        embeddings = make_embeddings(embed_model, backend=embed_backend, quantize=embed_quantize)
+    vectorstore = None
+    lexical = BM25Index()
+    if not report.full_rebuild:
+        vectorstore = load_index(index_dir, embed_model, embeddings=embeddings, spec=index_spec, writable=True)
+        lexical = load_lexical(index_dir)
+        if lexical is None:
+            # Index predates the lexical side: backfill it from the docstore
+            lexical = BM25Index()
+            ids = list(vectorstore.index_to_docstore_id.values())
+            lexical.add(ids, (vectorstore.docstore.search(i).page_content for i in ids))
+        # Ids can already be gone if a previous run died between saving the index and the manifest
+        present = set(vectorstore.index_to_docstore_id.values())
+        stale = [i for i in delete_ids if i in present]
+        with tracing.span("ingest.delete", chunks=len(stale)):
+            if stale:
+                vectorstore.delete(stale)
+            lexical.remove(delete_ids)
+        _drop_sources(vectorstore, old_files, manifest)
+        if deduper is not None:
+            with tracing.span("ingest.dedup_seed"):
+                for cid in manifest.all_chunk_ids():
+                    doc = vectorstore.docstore.search(cid)
+                    if isinstance(doc, Document):
+                        deduper.match(cid, doc.page_content)
+
+    writer = IndexWriter(
+        vectorstore,
+        embeddings,
+        index_dir=index_dir,
+        manifest=manifest,
+        batch_size=batch_size,
+        checkpoint_every=checkpoint_every,
+        spec=index_spec,
+        lexical=lexical,
+        index_format=index_format,
+    )
+    file_stats = {path: (st, sha) for path, st, sha in changed}
+    loaded = iter_loaded_files(
+        list(file_stats),
+        file_type=file_type,
+        rows_per_chunk=csv_rows_per_chunk,
+        workers=workers,
+        text_columns=csv_text_columns,
+        metadata_columns=csv_metadata_columns,
+    )
+    for path, docs in tracing.traced_iter("ingest.load", loaded):
+        st, sha = file_stats[path]
+        tracing.count("ingest.files")
+        entry = FileEntry(st.st_size, st.st_mtime_ns, sha)
+        chunks = iter_file_chunks(path.name, sha, docs, min_chars_per_page, chunk_size, chunk_overlap)
+        if deduper is not None:
+            chunks = _drop_duplicates(chunks, deduper, writer, entry, report)
+        writer.add_file(path.name, entry, chunks)
+        report.chunks_embedded += len(entry.chunk_ids)
+    report.files_embedded = len(changed)
+
+    if report.full_rebuild or changed or delete_ids:
+        writer.close()
+    log.info("Done! Embedded %d chunks in %d batches", report.chunks_embedded, writer.batches)
+    return report
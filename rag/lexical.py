@@ -0,0 +1,109 @@
+# rag/lexical.py
+from __future__ import annotations
+
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+
+LEXICAL_NAME = "bm25.json"
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    return _WORD_RE.findall(text.lower())
+
+
+class _Built(NamedTuple):
+    postings: Dict[str, Dict[str, int]]
+    lengths: Dict[str, int]
+    n: int
+    total_len: int
+
+
+class BM25Index:
+    """Okapi BM25 over the chunks of a FAISS index, keyed by the same docstore ids.
+
+    Only per-chunk term counts are persisted; the inverted index is rebuilt on load,
+    which keeps adds and deletes trivial to mirror from the vector index. The rebuild
+    happens on the first search after a change and is published as one immutable
+    snapshot, so concurrent searches (shard fan-out, server threads) never see half of it.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75) -> None:
+        self.k1 = k1
+        self.b = b
+        self.docs: Dict[str, Dict[str, int]] = {}
+        self._built: Optional[_Built] = None
+        self._lock = threading.Lock()
+
+    def add(self, ids: Iterable[str], texts: Iterable[str]) -> None:
+        with self._lock:
+            for doc_id, text in zip(ids, texts):
+                self.docs[doc_id] = dict(Counter(tokenize(text)))
+            self._built = None
+
+    def remove(self, ids: Iterable[str]) -> None:
+        with self._lock:
+            for doc_id in ids:
+                self.docs.pop(doc_id, None)
+            self._built = None
+
+    def _build(self) -> _Built:
+        built = self._built
+        if built is None:
+            with self._lock:
+                built = self._built
+                if built is None:
+                    postings: Dict[str, Dict[str, int]] = {}
+                    lengths: Dict[str, int] = {}
+                    for doc_id, counts in self.docs.items():
+                        lengths[doc_id] = sum(counts.values())
+                        for term, tf in counts.items():
+                            postings.setdefault(term, {})[doc_id] = tf
+                    built = self._built = _Built(postings, lengths, len(lengths), sum(lengths.values()))
+        return built
+
+    def search(self, query: str, k: int) -> List[Tuple[str, float]]:
+        postings, lengths, n, total_len = self._build()
+        if not n:
+            return []
+        avg_len = total_len / n
+        scores: Dict[str, float] = {}
+        for term in set(tokenize(query)):
+            docs = postings.get(term)
+            if not docs:
+                continue
+            idf = math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            for doc_id, tf in docs.items():
+                norm = tf + self.k1 * (1 - self.b + self.b * lengths[doc_id] / avg_len)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / norm
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    def save(self, index_dir: Path) -> None:
+        index_dir.mkdir(parents=True, exist_ok=True)
+        path = index_dir / LEXICAL_NAME
+        tmp = path.with_suffix(".json.tmp")
+        with self._lock:
+            payload = json.dumps({"k1": self.k1, "b": self.b, "docs": self.docs})
+        tmp.write_text(payload, encoding="utf-8")
+        os.replace(tmp, path)
+
+
+def load_lexical(index_dir: Path) -> Optional[BM25Index]:
+    """The BM25 index saved with the index in `index_dir` (its current version), or None."""
+    from rag.retrieve import current_dir
+
+    path = current_dir(index_dir) / LEXICAL_NAME
+    if not path.exists():
+        return None
+    raw = json.loads(path.read_text(encoding="utf-8"))
+    index = BM25Index(k1=raw["k1"], b=raw["b"])
+    index.docs = raw["docs"]
+    return index
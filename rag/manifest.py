@@ -0,0 +1,68 @@
+# rag/manifest.py
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from dataclasses import asdict, dataclass, field
+from itertools import count
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+
+MANIFEST_NAME = "manifest.json"
+
+
+@dataclass
+class FileEntry:
+    size: int
+    mtime_ns: int
+    sha256: str
+    chunk_ids: List[str] = field(default_factory=list)
+    # Chunks of other files (or of this one) that stand in for this file's dropped duplicates
+    duplicate_of: List[str] = field(default_factory=list)
+
+
+@dataclass
+class Manifest:
+    """What went into an index: the settings it was built with and the chunks of every source file."""
+
+    settings: Dict[str, Any]
+    files: Dict[str, FileEntry] = field(default_factory=dict)
+
+    def all_chunk_ids(self) -> List[str]:
+        return [cid for entry in self.files.values() for cid in entry.chunk_ids]
+
+
+def file_sha256(path: Path, block_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def iter_chunk_ids(name: str, sha256: str) -> Iterator[str]:
+    """Ids for a file's chunks in order, as many as it turns out to have."""
+    # Content hash keeps ids stable across runs; the name keeps identical files apart
+    prefix = hashlib.sha1(name.encode("utf-8")).hexdigest()[:8]
+    return (f"{prefix}-{sha256[:16]}-{i}" for i in count())
+
+
+def load_manifest(index_dir: Path) -> Optional[Manifest]:
+    path = index_dir / MANIFEST_NAME
+    if not path.exists():
+        return None
+    raw = json.loads(path.read_text(encoding="utf-8"))
+    return Manifest(
+        settings=raw["settings"],
+        files={name: FileEntry(**entry) for name, entry in raw["files"].items()},
+    )
+
+
+def save_manifest(index_dir: Path, manifest: Manifest) -> None:
+    index_dir.mkdir(parents=True, exist_ok=True)
+    path = index_dir / MANIFEST_NAME
+    tmp = path.with_suffix(".json.tmp")
+    tmp.write_text(json.dumps(asdict(manifest), indent=2), encoding="utf-8")
+    os.replace(tmp, path)
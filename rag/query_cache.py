@@ -0,0 +1,163 @@
+# rag/query_cache.py
+from __future__ import annotations
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Hashable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from langchain_core.documents import Document
+
+
+# CURRENT changes on every versioned save; the flat files are the pickle (and pre-version) layout
+_INDEX_FILES = ("CURRENT", "index.faiss", "index.pkl", "docstore.sqlite3", "bm25.json")
+
+
+def index_version(index_dir: Path) -> str:
+    """Cheap fingerprint of the index on disk; changes whenever ingest saves the index."""
+    parts = []
+    for name in _INDEX_FILES:
+        path = Path(index_dir) / name
+        if path.exists():
+            st = path.stat()
+            parts.append(f"{name}:{st.st_mtime_ns}:{st.st_size}")
+    return "|".join(parts)
+
+
+def normalize_query(query: str) -> str:
+    return re.sub(r"\s+", " ", query).strip().strip("?!. ").lower()
+
+
+def hit_ids(hits: List[Tuple[Document, float]]) -> Tuple[str, ...]:
+    return tuple(
+        doc.id or f"{doc.metadata.get('filename')}:{doc.metadata.get('page')}:{hash(doc.page_content)}"
+        for doc, _ in hits
+    )
+
+
+class TTLCache:
+    """LRU cache whose entries also expire `ttl` seconds after they were stored."""
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        item = self._data.get(key)
+        if item is None or time.monotonic() - item[0] > self.ttl:
+            if item is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return item[1]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        self._data[key] = (time.monotonic(), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def keys(self) -> List[Hashable]:
+        return list(self._data)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class QueryCache:
+    """Two-level cache: query -> retrieval hits, and (query, hit ids) -> final answer.
+
+    Both levels are dropped whenever `index_version` of `index_dir` (or of any of several
+    shard directories) changes. With
+    `semantic_distance` set, a query whose embedding lies within that L2 distance of a
+    cached query reuses its hits.
+    """
+
+    def __init__(
+        self,
+        index_dir: Union[Path, Sequence[Path]],
+        maxsize: int = 1024,
+        ttl: float = 3600.0,
+        semantic_distance: Optional[float] = None,
+    ) -> None:
+        self.index_dirs = [Path(index_dir)] if isinstance(index_dir, (str, Path)) else [Path(d) for d in index_dir]
+        self.semantic_distance = semantic_distance
+        self.hits = TTLCache(maxsize, ttl)
+        self.answers = TTLCache(maxsize, ttl)
+        self.semantic_hits = 0
+        self.invalidations = 0
+        self._version = self._index_version()
+        self._vectors: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _index_version(self) -> str:
+        return "||".join(index_version(d) for d in self.index_dirs)
+
+    def _check_version(self) -> None:
+        version = self._index_version()
+        if version != self._version:
+            self._version = version
+            self.hits.clear()
+            self.answers.clear()
+            self._vectors.clear()
+            self.invalidations += 1
+
+    def get_hits(self, query: str, embedding: Optional[Sequence[float]] = None) -> Optional[List[Tuple[Document, float]]]:
+        key = normalize_query(query)
+        with self._lock:
+            self._check_version()
+            found = self.hits.get(key)
+            if found is not None or embedding is None or self.semantic_distance is None or not self._vectors:
+                return found
+
+            names = list(self._vectors)
+            matrix = np.stack([self._vectors[n] for n in names])
+            dists = np.linalg.norm(matrix - np.asarray(embedding, dtype=np.float32), axis=1)
+            best = int(np.argmin(dists))
+            if dists[best] <= self.semantic_distance:
+                found = self.hits.get(names[best])
+                # The semantic lookup already counted this query; drop the exact-lookup miss
+                self.hits.misses -= 1
+                if found is not None:
+                    self.semantic_hits += 1
+            return found
+
+    def put_hits(self, query: str, hits: List[Tuple[Document, float]], embedding: Optional[Sequence[float]] = None) -> None:
+        key = normalize_query(query)
+        with self._lock:
+            self._check_version()
+            self.hits.put(key, hits)
+            if embedding is not None and self.semantic_distance is not None:
+                self._vectors[key] = np.asarray(embedding, dtype=np.float32)
+                live = set(self.hits.keys())
+                for stale in [k for k in self._vectors if k not in live]:
+                    del self._vectors[stale]
+
+    def get_answer(self, query: str, hits: List[Tuple[Document, float]]) -> Optional[Any]:
+        with self._lock:
+            self._check_version()
+            return self.answers.get((normalize_query(query), hit_ids(hits)))
+
+    def put_answer(self, query: str, hits: List[Tuple[Document, float]], answer: Any) -> None:
+        with self._lock:
+            self._check_version()
+            self.answers.put((normalize_query(query), hit_ids(hits)), answer)
+
+    def stats(self) -> dict:
+        return {
+            "retrieval": {"size": len(self.hits), "hits": self.hits.hits, "misses": self.hits.misses},
+            "answers": {"size": len(self.answers), "hits": self.answers.hits, "misses": self.answers.misses},
+            "semantic_hits": self.semantic_hits,
+            "invalidations": self.invalidations,
+        }
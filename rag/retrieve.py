@@ -1,18 +1,397 @@
+import heapq
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import Executor
 from pathlib import Path
-from typing import List, Tuple
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
 
+import faiss
+import numpy as np
 from langchain_community.vectorstores import FAISS
-from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
 
+import tracing
+from rag.docstore import ChunkStore, PositionMap, SQLiteDocstore, write_chunk_store
+from rag.embeddings import make_embeddings
+from rag.index_types import IndexSpec, set_search_params
+from rag.lexical import LEXICAL_NAME, BM25Index
 
-def load_index(index_dir: Path, embed_model: str) -> FAISS:
-    embeddings = HuggingFaceEmbeddings(model_name=embed_model)
-    return FAISS.load_local(
-        str(index_dir),
-        embeddings,
-        allow_dangerous_deserialization=True,
-    )
 
-def search_with_scores(vectorstore: FAISS, query: str, k: int) -> List[Tuple[Document, float]]:
-    return vectorstore.similarity_search_with_score(query, k=k)
+INDEX_FORMATS = ("sqlite", "pickle")
+DOCSTORE_FILE = "docstore.sqlite3"
+_direct_map_lock = threading.Lock()
+# Names the subdirectory holding the current index.faiss + docstore.sqlite3 (+ bm25.json) set
+CURRENT_FILE = "CURRENT"
+
+
+def current_dir(index_dir: Path) -> Path:
+    """The directory the index in `index_dir` is read from: the version CURRENT names, else `index_dir`."""
+    index_dir = Path(index_dir)
+    try:
+        return index_dir / (index_dir / CURRENT_FILE).read_text(encoding="utf-8").strip()
+    except FileNotFoundError:
+        return index_dir  # pickle format, or written before versioned saves
+
+
+def load_index(
+    index_dir: Path,
+    embed_model: str,
+    embeddings: Optional[Embeddings] = None,
+    spec: Optional[IndexSpec] = None,
+    writable: bool = False,
+) -> FAISS:
+    """Open the index in `index_dir`, in whichever format `save_index` wrote it.
+
+    The "sqlite" format memory-maps the vectors and reads chunks from the docstore
+    only for the hits a search returns. `writable=True` (for ingest) reads it all into
+    memory instead, so chunks can be added and deleted. The "pickle" format is
+    LangChain's index.faiss + index.pkl, always read whole.
+    """
+    if embeddings is None:
+        embeddings = make_embeddings(embed_model)
+    index_dir = Path(index_dir)
+    with tracing.span("index.load") as span:
+        files = current_dir(index_dir)
+        if (files / DOCSTORE_FILE).exists():
+            store = ChunkStore(files / DOCSTORE_FILE)
+            if writable:
+                index = faiss.read_index(str(files / "index.faiss"))
+                docstore, index_to_docstore_id = store.load_in_memory()
+            else:
+                index = _read_mmapped(files / "index.faiss", ivf=spec is not None and spec.needs_training)
+                docstore, index_to_docstore_id = SQLiteDocstore(store), PositionMap(store)
+            vectorstore = FAISS(embeddings, index, docstore, index_to_docstore_id)
+        else:
+            vectorstore = FAISS.load_local(
+                str(index_dir),
+                embeddings,
+                allow_dangerous_deserialization=True,
+            )
+        span.set(vectors=vectorstore.index.ntotal)
+    if spec is not None:
+        set_search_params(vectorstore.index, spec)
+    return vectorstore
+
+
+def _read_mmapped(path: Path, ivf: bool) -> faiss.Index:
+    """Read an index leaving its vectors on disk: flat codes (Flat, HNSW) or IVF inverted lists."""
+    # The two flags need different readers and each fails on the other kind of index
+    flags = [faiss.IO_FLAG_MMAP_IFC, faiss.IO_FLAG_MMAP]
+    if ivf:
+        flags.reverse()
+    try:
+        return faiss.read_index(str(path), flags[0] | faiss.IO_FLAG_READ_ONLY)
+    except RuntimeError:
+        return faiss.read_index(str(path), flags[1] | faiss.IO_FLAG_READ_ONLY)
+
+
+def save_index(
+    vectorstore: FAISS, index_dir: Path, index_format: str = "sqlite", lexical: Optional[BM25Index] = None
+) -> None:
+    """Write `vectorstore` to `index_dir` as "sqlite" (index.faiss + docstore.sqlite3) or "pickle".
+
+    The "sqlite" pair, and `lexical` (bm25.json) when given, go into a new version
+    subdirectory, and only once all files are complete is CURRENT switched to it
+    (atomically), so a loader always gets a matching set. The previous version is kept for loaders that read CURRENT just before the
+    switch; older ones are deleted, which a process still serving them does not notice
+    (it holds the index memory-mapped and the docstore open). Saving as "pickle" removes
+    CURRENT, so `load_index` never picks up a stale sqlite version.
+    """
+    if index_format not in INDEX_FORMATS:
+        raise ValueError(f"Unknown index format {index_format!r}. Options: {', '.join(INDEX_FORMATS)}")
+    index_dir = Path(index_dir)
+    index_dir.mkdir(parents=True, exist_ok=True)
+    previous = current_dir(index_dir)
+    if index_format == "pickle":
+        vectorstore.save_local(str(index_dir))
+        _save_lexical(lexical, index_dir)
+        (index_dir / CURRENT_FILE).unlink(missing_ok=True)
+        (index_dir / DOCSTORE_FILE).unlink(missing_ok=True)
+        _prune_versions(index_dir, keep={previous.name})
+        return
+    version = index_dir / f"v{time.time_ns()}"
+    version.mkdir()
+    faiss.write_index(vectorstore.index, str(version / "index.faiss"))
+    write_chunk_store(version / DOCSTORE_FILE, vectorstore.index_to_docstore_id, vectorstore.docstore)
+    _save_lexical(lexical, version)
+    tmp = index_dir / f"{CURRENT_FILE}.tmp"
+    tmp.write_text(version.name, encoding="utf-8")
+    os.replace(tmp, index_dir / CURRENT_FILE)
+    for name in ("index.faiss", "index.pkl", DOCSTORE_FILE, LEXICAL_NAME):
+        (index_dir / name).unlink(missing_ok=True)
+    _prune_versions(index_dir, keep={version.name, previous.name})
+
+
+def _save_lexical(lexical: Optional[BM25Index], files: Path) -> None:
+    if lexical is not None:
+        lexical.save(files)
+    else:
+        (files / LEXICAL_NAME).unlink(missing_ok=True)  # a stale one would not match the new chunk ids
+
+
+def _prune_versions(index_dir: Path, keep: set) -> None:
+    for path in index_dir.glob("v[0-9]*"):
+        if path.is_dir() and path.name not in keep:
+            # Files still open elsewhere can't be deleted on Windows: left for the next save
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def search_with_scores(
+    vectorstore: FAISS,
+    query: str,
+    k: int,
+    lexical: Optional[BM25Index] = None,
+    candidates: int = 20,
+    rrf_k: int = 60,
+) -> List[Tuple[Document, float]]:
+    """Top-k hits with their L2 distance; fused with BM25 when a lexical index is given."""
+    with tracing.span("retrieve.embed"):
+        embedding = vectorstore.embedding_function.embed_query(query)
+    return search_by_vector(vectorstore, embedding, k, query=query, lexical=lexical, candidates=candidates, rrf_k=rrf_k)
+
+
+def search_by_vector(
+    vectorstore: FAISS,
+    embedding: List[float],
+    k: int,
+    query: Optional[str] = None,
+    lexical: Optional[BM25Index] = None,
+    candidates: int = 20,
+    rrf_k: int = 60,
+) -> List[Tuple[Document, float]]:
+    if lexical is None or query is None:
+        with tracing.span("retrieve.search", k=k):
+            return vectorstore.similarity_search_with_score_by_vector(embedding, k=k)
+    return hybrid_search(vectorstore, lexical, query, embedding, k, candidates=candidates, rrf_k=rrf_k)
+
+
+def search_batch(
+    vectorstore: FAISS,
+    embeddings: List[List[float]],
+    k: int,
+    queries: Optional[List[str]] = None,
+    lexical: Optional[BM25Index] = None,
+    candidates: int = 20,
+    rrf_k: int = 60,
+) -> List[List[Tuple[Document, float]]]:
+    """`search_by_vector` for many queries at once: one FAISS search over the whole matrix."""
+    if not embeddings:
+        return []
+    hybrid = lexical is not None and queries is not None
+    n = max(k, candidates) if hybrid else k
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    if getattr(vectorstore, "_normalize_L2", False):
+        faiss.normalize_L2(matrix)
+    with tracing.span("retrieve.search_batch", queries=len(matrix), k=n):
+        scores, positions = vectorstore.index.search(matrix, n)
+        dense_lists = []
+        for row_scores, row_positions in zip(scores, positions):
+            dense = []
+            for dist, pos in zip(row_scores, row_positions):
+                if pos == -1:
+                    continue  # fewer than n vectors in the index
+                doc_id = vectorstore.index_to_docstore_id[int(pos)]
+                doc = vectorstore.docstore.search(doc_id)
+                if not isinstance(doc, Document):
+                    raise ValueError(f"Could not find document for id {doc_id}, got {doc}")
+                dense.append((doc, float(dist)))
+            dense_lists.append(dense)
+    if not hybrid:
+        return dense_lists
+    results = []
+    for query, vec, dense in zip(queries, matrix, dense_lists):
+        with tracing.span("retrieve.bm25", k=n):
+            sparse = lexical.search(query, n)
+        results.append(_fuse(vectorstore, dense, sparse, vec, k, rrf_k))
+    return results
+
+
+def _position(vectorstore: FAISS, doc_id: str) -> int:
+    if isinstance(vectorstore.index_to_docstore_id, PositionMap):
+        return vectorstore.index_to_docstore_id.position(doc_id)
+    # Reverse docstore map, cached on the store and rebuilt if the index grew or shrank
+    positions = getattr(vectorstore, "_positions", None)
+    if positions is None or len(positions) != len(vectorstore.index_to_docstore_id):
+        positions = {v: k for k, v in vectorstore.index_to_docstore_id.items()}
+        vectorstore._positions = positions
+    return positions[doc_id]
+
+
+def ensure_direct_map(index: faiss.Index) -> None:
+    """Let `index.reconstruct` look vectors up by position: IVF indexes need a direct map for that.
+
+    Building it mutates the index, so do it once at load time (`resources.get_index`) rather
+    than from concurrent searches; the lock covers callers that load indexes themselves.
+    """
+    try:
+        ivf = faiss.extract_index_ivf(index)
+    except RuntimeError:
+        return  # Flat and HNSW reconstruct without one
+    with _direct_map_lock:
+        if ivf.direct_map.type == faiss.DirectMap.NoMap:
+            ivf.make_direct_map()
+
+
+def _dense_distance(vectorstore: FAISS, doc_id: str, embedding: np.ndarray) -> float:
+    ensure_direct_map(vectorstore.index)
+    vec = vectorstore.index.reconstruct(_position(vectorstore, doc_id))
+    return float(np.sum((vec - embedding) ** 2))
+
+
+def hybrid_search(
+    vectorstore: FAISS,
+    lexical: BM25Index,
+    query: str,
+    embedding: List[float],
+    k: int,
+    candidates: int = 20,
+    rrf_k: int = 60,
+) -> List[Tuple[Document, float]]:
+    """Reciprocal rank fusion of the dense and BM25 candidate lists.
+
+    Hits are ordered by fused rank but still carry their dense L2 distance (looked up
+    for chunks only BM25 found), so `rag.decision.decide` thresholds them as before.
+    """
+    n = max(k, candidates)
+    with tracing.span("retrieve.search", k=n):
+        dense = vectorstore.similarity_search_with_score_by_vector(embedding, k=n)
+    with tracing.span("retrieve.bm25", k=n):
+        sparse = lexical.search(query, n)
+
+    return _fuse(vectorstore, dense, sparse, np.asarray(embedding, dtype=np.float32), k, rrf_k)
+
+
+def _fuse(
+    vectorstore: FAISS,
+    dense: List[Tuple[Document, float]],
+    sparse: List[Tuple[str, float]],
+    query_vec: np.ndarray,
+    k: int,
+    rrf_k: int,
+) -> List[Tuple[Document, float]]:
+    with tracing.span("retrieve.fuse"):
+        fused: Dict[str, float] = {}
+        docs: Dict[str, Document] = {}
+        distances: Dict[str, float] = {}
+        for rank, (doc, dist) in enumerate(dense):
+            fused[doc.id] = fused.get(doc.id, 0.0) + 1.0 / (rrf_k + rank + 1)
+            docs[doc.id] = doc
+            distances[doc.id] = float(dist)
+        for rank, (doc_id, _) in enumerate(sparse):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (rrf_k + rank + 1)
+
+        hits = []
+        for doc_id in sorted(fused, key=fused.get, reverse=True)[:k]:
+            if doc_id not in docs:
+                doc = vectorstore.docstore.search(doc_id)
+                if not isinstance(doc, Document):
+                    continue  # lexical index out of sync with the docstore
+                docs[doc_id] = doc
+                distances[doc_id] = _dense_distance(vectorstore, doc_id, query_vec)
+            hits.append((docs[doc_id], distances[doc_id]))
+    return hits
+
+
+Shard = Tuple[FAISS, Optional[BM25Index]]
+
+
+class ShardedIndex:
+    """Named index shards, one per corpus, searched as one index.
+
+    A search goes to the selected corpora (all by default), in parallel on `executor`
+    when there is more than one, and the per-shard top-k lists are merged by distance,
+    or by rank when the shards fused dense and BM25 results (see `_merge`).
+    Every hit's metadata gains "corpus". `shard(name)` is called on each search and
+    returns that shard's vectorstore and BM25 index (None for dense-only), so loading
+    a shard is deferred until it is first searched. All shards must hold vectors from
+    `embeddings`.
+    """
+
+    def __init__(
+        self,
+        names: Sequence[str],
+        shard: Callable[[str], Shard],
+        embeddings: Embeddings,
+        executor: Optional[Executor] = None,
+        candidates: int = 20,
+        rrf_k: int = 60,
+    ) -> None:
+        if len(set(names)) != len(names):
+            raise ValueError(f"Corpus names must be unique: {list(names)}")
+        self.names = list(names)
+        self.shard = shard
+        self.embedding_function = embeddings
+        self.executor = executor
+        self.candidates = candidates
+        self.rrf_k = rrf_k
+
+    def select(self, corpora: Optional[Sequence[str]] = None) -> List[str]:
+        if not corpora:
+            return list(self.names)
+        unknown = [c for c in corpora if c not in self.names]
+        if unknown:
+            raise ValueError(f"Unknown corpus {', '.join(unknown)}; available: {', '.join(self.names)}")
+        return [n for n in self.names if n in corpora]
+
+    def _fan_out(
+        self, names: List[str], fn: Callable[[str, FAISS, Optional[BM25Index]], list]
+    ) -> List[Tuple[str, bool, list]]:
+        """(name, searched with BM25, fn's result) per shard."""
+        def run(name: str) -> Tuple[str, bool, list]:
+            with tracing.span("retrieve.shard", corpus=name):
+                vectorstore, lexical = self.shard(name)
+                return name, lexical is not None, fn(name, vectorstore, lexical)
+
+        if self.executor is None or len(names) == 1:
+            return [run(n) for n in names]
+        return list(self.executor.map(run, names))
+
+    @staticmethod
+    def _merge(
+        per_shard: List[Tuple[str, List[Tuple[Document, float]]]], k: int, fused: bool = False
+    ) -> List[Tuple[Document, float]]:
+        """The top k of the shards' hit lists: by distance, or with `fused` by rank within each list.
+
+        Fused (hybrid) lists are ordered by RRF, and a chunk only BM25 found can sit at the
+        top with a large dense distance. Ranking across shards by reciprocal rank keeps it;
+        as each hit is in one shard's list only, that is rank order, ties going to the
+        smaller distance.
+        """
+        tagged = [
+            (rank, dist, Document(id=doc.id, page_content=doc.page_content, metadata={**doc.metadata, "corpus": name}))
+            for name, hits in per_shard for rank, (doc, dist) in enumerate(hits)
+        ]
+        key = (lambda hit: (hit[0], hit[1])) if fused else (lambda hit: hit[1])
+        return [(doc, dist) for _, dist, doc in heapq.nsmallest(k, tagged, key=key)]
+
+    def search_by_vector(
+        self, embedding: List[float], k: int, query: Optional[str] = None, corpora: Optional[Sequence[str]] = None
+    ) -> List[Tuple[Document, float]]:
+        per_shard = self._fan_out(self.select(corpora), lambda name, vs, lexical: search_by_vector(
+            vs, embedding, k, query=query, lexical=lexical, candidates=self.candidates, rrf_k=self.rrf_k,
+        ))
+        fused = query is not None and any(with_bm25 for _, with_bm25, _ in per_shard)
+        return self._merge([(name, hits) for name, _, hits in per_shard], k, fused)
+
+    def search(self, query: str, k: int, corpora: Optional[Sequence[str]] = None) -> List[Tuple[Document, float]]:
+        with tracing.span("retrieve.embed"):
+            embedding = self.embedding_function.embed_query(query)
+        return self.search_by_vector(embedding, k, query=query, corpora=corpora)
+
+    def search_batch(
+        self,
+        embeddings: List[List[float]],
+        k: int,
+        queries: Optional[List[str]] = None,
+        corpora: Optional[Sequence[str]] = None,
+    ) -> List[List[Tuple[Document, float]]]:
+        per_shard = self._fan_out(self.select(corpora), lambda name, vs, lexical: search_batch(
+            vs, embeddings, k, queries=queries, lexical=lexical, candidates=self.candidates, rrf_k=self.rrf_k,
+        ))
+        fused = queries is not None and any(with_bm25 for _, with_bm25, _ in per_shard)
+        return [
+            self._merge([(name, results[i]) for name, _, results in per_shard], k, fused) for i in range(len(embeddings))
+        ]
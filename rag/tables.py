@@ -0,0 +1,181 @@
+# rag/tables.py
+from __future__ import annotations
+
+import os
+import re
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+
+CSV_FILES = {
+    "patients": {"file": "patients.csv", "search_cols": ["Id", "FIRST", "LAST", "GENDER", "BIRTHDATE"]},
+    "conditions": {"file": "conditions.csv", "search_cols": ["PATIENT", "DESCRIPTION", "CODE"]},
+    "medications": {"file": "medications.csv", "search_cols": ["PATIENT", "DESCRIPTION", "CODE"]},
+    "allergies": {"file": "allergies.csv", "search_cols": ["PATIENT", "DESCRIPTION", "CODE"]},
+    "procedures": {"file": "procedures.csv", "search_cols": ["PATIENT", "DESCRIPTION", "CODE"]},
+    "encounters": {"file": "encounters.csv", "search_cols": ["PATIENT", "DESCRIPTION", "ENCOUNTERCLASS"]},
+    "immunizations": {"file": "immunizations.csv", "search_cols": ["PATIENT", "DESCRIPTION", "CODE"]},
+    "careplans": {"file": "careplans.csv", "search_cols": ["PATIENT", "DESCRIPTION", "REASONDESCRIPTION"]},
+    "claims": {"file": "claims.csv", "search_cols": ["PATIENTID", "PROVIDERID", "STATUS"]},
+    "observations": {"file": "observations.csv", "search_cols": ["PATIENT", "DESCRIPTION", "VALUE", "UNITS"]},
+}
+
+# Column naming the patient a row belongs to, where it is not "PATIENT"
+PATIENT_COLUMNS = {"patients": "Id", "claims": "PATIENTID"}
+
+TOKEN_RE = re.compile(r"[0-9a-z]+")
+
+_NO_ROWS = np.empty(0, dtype=np.int64)
+
+
+class ColumnIndex:
+    """Lowercased categorical view of one column plus a token -> category inverted index.
+
+    Matching is done on the distinct values of the column, so a lookup costs
+    O(distinct values containing the term) instead of O(rows). Empty cells are indexed as ""
+    and match no term. The old `astype(str).str.contains` scan matched them as "nan" or
+    "None" under pandas < 3 (and never under pandas 3); a search for "nan" now only finds
+    values that really contain it, on every pandas version.
+    """
+
+    def __init__(self, values: pd.Series) -> None:
+        lowered = values.astype(object).where(values.notna(), "").astype(str).str.lower()
+        codes, categories = pd.factorize(lowered)
+        self.codes = codes.astype(np.int64)
+        self.categories = np.asarray(categories, dtype=object)
+
+        # Rows grouped by category: rows[starts[c]:starts[c + 1]] hold the rows whose value is c
+        counts = np.bincount(self.codes, minlength=len(self.categories))
+        self.rows = np.argsort(self.codes, kind="stable")
+        self.starts = np.concatenate(([0], np.cumsum(counts)))
+
+        postings: Dict[str, List[int]] = {}
+        for cat_id, value in enumerate(self.categories):
+            for tok in set(TOKEN_RE.findall(value)):
+                postings.setdefault(tok, []).append(cat_id)
+        # Sorted vocabulary with its postings laid end to end: token i holds
+        # posting_ids[posting_starts[i]:posting_starts[i + 1]]
+        self.vocab = np.array(sorted(postings), dtype=object)
+        self._vocab_str = self.vocab.astype(str)
+        lists = [postings[tok] for tok in self.vocab]
+        self.posting_starts = np.concatenate(([0], np.cumsum([len(ids) for ids in lists], dtype=np.int64)))
+        self.posting_ids = np.fromiter((i for ids in lists for i in ids), dtype=np.int64, count=int(self.posting_starts[-1]))
+
+        # Character trigram -> ids into `vocab`, so a fragment only checks tokens sharing its trigrams
+        trigrams: Dict[str, List[int]] = {}
+        for tok_id, tok in enumerate(self.vocab):
+            for gram in {tok[i:i + 3] for i in range(len(tok) - 2)}:
+                trigrams.setdefault(gram, []).append(tok_id)
+        self.trigrams = {gram: np.asarray(ids, dtype=np.int64) for gram, ids in trigrams.items()}
+
+    def _tokens_containing(self, token: str) -> np.ndarray:
+        """Ids into `vocab` of the tokens that contain `token`."""
+        if len(token) < 3:
+            # Too short for a trigram: a vectorized scan of the (distinct) vocabulary
+            return np.flatnonzero(np.char.find(self._vocab_str, token) >= 0) if len(self.vocab) else _NO_ROWS
+        ids: Optional[np.ndarray] = None
+        for gram in {token[i:i + 3] for i in range(len(token) - 2)}:
+            grams = self.trigrams.get(gram)
+            if grams is None:
+                return _NO_ROWS
+            ids = grams if ids is None else np.intersect1d(ids, grams, assume_unique=True)
+            if not len(ids):
+                return _NO_ROWS
+        # Sharing every trigram is necessary, not sufficient ("abcab" vs "bcabc")
+        return np.array([i for i in ids if token in self.vocab[i]], dtype=np.int64)
+
+    def _categories_with_token(self, token: str) -> np.ndarray:
+        # A query token may be a fragment of a stored token ("diab" in "diabetes"),
+        # so union the postings of every vocabulary entry that contains it.
+        ids = self._tokens_containing(token)
+        if not len(ids):
+            return _NO_ROWS
+        starts, ends = self.posting_starts[ids], self.posting_starts[ids + 1]
+        lengths = ends - starts
+        # Gather every selected posting list in one go: offset each position by its list's start
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        return np.unique(self.posting_ids[offsets + np.arange(int(lengths.sum()))])
+
+    def match(self, term: str) -> np.ndarray:
+        """Return the sorted row ids whose value contains `term` (case-insensitive, literal)."""
+        needle = term.lower()
+        tokens = set(TOKEN_RE.findall(needle))
+
+        if tokens:
+            candidates: Optional[np.ndarray] = None
+            for token in tokens:
+                ids = self._categories_with_token(token)
+                candidates = ids if candidates is None else np.intersect1d(candidates, ids, assume_unique=True)
+                if not len(candidates):
+                    return _NO_ROWS
+            # The index gives a superset; confirm the literal substring on the few survivors
+            cat_ids = [c for c in candidates if needle in self.categories[c]]
+        else:
+            # Non-token queries (punctuation, whitespace) fall back to a vectorized scan
+            hit = pd.Series(self.categories, dtype=object).str.contains(needle, regex=False)
+            cat_ids = np.flatnonzero(hit.to_numpy(dtype=bool))
+
+        if not len(cat_ids):
+            return _NO_ROWS
+        rows = np.concatenate([self.rows[self.starts[c]:self.starts[c + 1]] for c in cat_ids])
+        rows.sort()
+        return rows
+
+
+@dataclass
+class CsvTable:
+    df: pd.DataFrame
+    mtime_ns: int
+    size: int
+    _columns: Dict[str, ColumnIndex] = field(default_factory=dict)
+    _lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def column(self, name: str) -> ColumnIndex:
+        # Column indexes are built on first use so a column-specific query does not pay for all of them;
+        # the lock keeps concurrent lookups from building the same one twice
+        index = self._columns.get(name)
+        if index is None:
+            with self._lock:
+                index = self._columns.get(name)
+                if index is None:
+                    index = self._columns[name] = ColumnIndex(self.df[name])
+        return index
+
+    def search(self, term: str, column: Optional[str] = None) -> np.ndarray:
+        if column:
+            return self.column(column).match(term)
+        parts = [self.column(col).match(term) for col in self.df.columns]
+        return np.unique(np.concatenate(parts)) if parts else _NO_ROWS
+
+
+class TableCache:
+    """Process-wide cache of parsed CSV tables, reloaded when the file changes on disk."""
+
+    def __init__(self, data_dir: Path, tables: Optional[Dict[str, dict]] = None) -> None:
+        self.data_dir = Path(data_dir)
+        self.tables = tables if tables is not None else CSV_FILES
+        self._loaded: Dict[str, CsvTable] = {}
+        self._lock = threading.Lock()
+
+    def path(self, table: str) -> Path:
+        return self.data_dir / self.tables[table]["file"]
+
+    def get(self, table: str) -> CsvTable:
+        path = self.path(table)
+        st = os.stat(path)
+        with self._lock:
+            cached = self._loaded.get(table)
+            if cached is not None and cached.mtime_ns == st.st_mtime_ns and cached.size == st.st_size:
+                return cached
+            loaded = CsvTable(df=pd.read_csv(path), mtime_ns=st.st_mtime_ns, size=st.st_size)
+            self._loaded[table] = loaded
+            return loaded
+
+    def clear(self) -> None:
+        with self._lock:
+            self._loaded.clear()
@@ -0,0 +1,284 @@
+# resources.py
+"""Process-wide registry of the heavy shared objects.
+
+Everything here is built on first use and then reused, so importing the agent
+graph is cheap and a single process never loads the embedding model, the
+FAISS index or an LLM client more than once.
+"""
+from __future__ import annotations
+
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from config import Config
+
+
+_lock = threading.RLock()
+_instances: Dict[str, Any] = {}
+
+
+def _get(name: str, factory: Callable[[], Any]) -> Any:
+    obj = _instances.get(name)
+    if obj is None:
+        # RLock: factories call other getters (the index needs the embeddings)
+        with _lock:
+            obj = _instances.get(name)
+            if obj is None:
+                obj = _instances[name] = factory()
+    return obj
+
+
+def reset(*names: str) -> None:
+    """Drop cached objects (all of them if no names are given) so the next access rebuilds them."""
+    with _lock:
+        if not names:
+            _instances.clear()
+        for name in names:
+            _instances.pop(name, None)
+
+
+def override(name: str, obj: Any) -> None:
+    """Install a ready-made object under `name` (a config or a fake LLM in benchmarks)."""
+    with _lock:
+        _instances[name] = obj
+
+
+def get_config() -> Config:
+    return _get("config", Config)
+
+
+def get_embeddings():
+    def build():
+        from rag.embeddings import make_embeddings
+
+        cfg = get_config()
+        return make_embeddings(
+            cfg.embed_model,
+            cache_dir=cfg.embed_cache_dir,
+            cache_max_rows=cfg.embed_cache_max_rows,
+            backend=cfg.embed_backend,
+            batch_size=cfg.embed_batch_size,
+            threads=cfg.embed_threads,
+            quantize=cfg.embed_quantize,
+            onnx_dir=cfg.embed_onnx_dir,
+        )
+
+    return _get("embeddings", build)
+
+
+def _corpus(name: Optional[str]):
+    corpora = get_config().corpus_list()
+    if name is None:
+        return corpora[0]
+    for corpus in corpora:
+        if corpus.name == name:
+            return corpus
+    raise KeyError(f"Unknown corpus {name!r}; configured: {', '.join(c.name for c in corpora)}")
+
+
+def get_index(corpus: Optional[str] = None):
+    """A corpus' FAISS shard (the first corpus by default), reloaded after ingest rewrites it on disk."""
+    from rag.query_cache import index_version
+
+    cfg = get_config()
+    shard = _corpus(corpus)
+    version = index_version(shard.index_dir)
+    if _instances.get(f"index_version:{shard.name}", version) != version:
+        reset(f"index:{shard.name}", f"lexical:{shard.name}")
+
+    def build():
+        from rag.index_types import IndexSpec
+        from rag.retrieve import current_dir, ensure_direct_map, load_index
+
+        # Pin the version directory so get_lexical reads the BM25 index saved with these vectors
+        files = current_dir(shard.index_dir)
+        _instances[f"index_version:{shard.name}"] = version
+        _instances[f"index_files:{shard.name}"] = files
+        vectorstore = load_index(files, cfg.embed_model, embeddings=get_embeddings(), spec=IndexSpec.from_config(cfg))
+        if cfg.retrieval_mode == "hybrid":
+            # Hybrid search reconstructs BM25-only hits' vectors; build the map before any query runs
+            ensure_direct_map(vectorstore.index)
+        return vectorstore
+
+    return _get(f"index:{shard.name}", build)
+
+
+def get_lexical(corpus: Optional[str] = None):
+    """The BM25 index saved with a corpus' FAISS shard, or None in dense-only retrieval mode."""
+    cfg = get_config()
+    if cfg.retrieval_mode != "hybrid":
+        return None
+    shard = _corpus(corpus)
+    get_index(shard.name)  # resets "lexical:<name>" when ingest rewrote the shard
+
+    def build():
+        from rag.lexical import load_lexical
+
+        files = _instances.get(f"index_files:{shard.name}", shard.index_dir)
+        lexical = load_lexical(files)
+        if lexical is None:
+            raise FileNotFoundError(f"No BM25 index in {files}; re-run ingest for hybrid retrieval")
+        return lexical
+
+    return _get(f"lexical:{shard.name}", build)
+
+
+def get_shard_executor():
+    def build():
+        from concurrent.futures import ThreadPoolExecutor
+
+        return ThreadPoolExecutor(max_workers=get_config().shard_workers, thread_name_prefix="shard")
+
+    return _get("shard_executor", build)
+
+
+def get_shards():
+    """Every configured corpus as one searchable index; each shard loads on its first search."""
+    def build():
+        from rag.retrieve import ShardedIndex
+
+        cfg = get_config()
+        return ShardedIndex(
+            [c.name for c in cfg.corpus_list()],
+            lambda name: (get_index(name), get_lexical(name)),
+            get_embeddings(),
+            executor=get_shard_executor() if cfg.shard_workers > 1 else None,
+            candidates=cfg.hybrid_candidates,
+            rrf_k=cfg.rrf_k,
+        )
+
+    return _get("shards", build)
+
+
+def get_query_cache():
+    def build():
+        from rag.query_cache import QueryCache
+
+        cfg = get_config()
+        return QueryCache(
+            [c.index_dir for c in cfg.corpus_list()],
+            maxsize=cfg.query_cache_size,
+            ttl=cfg.query_cache_ttl_s,
+            semantic_distance=cfg.semantic_cache_distance,
+        )
+
+    return _get("query_cache", build)
+
+
+def get_query_router():
+    """Pre-retrieval router (agent/intent.py); corpus descriptions count as document prototypes."""
+    def build():
+        from agent.intent import PROTOTYPES, QueryRouter, load_prototypes
+
+        cfg = get_config()
+        prototypes = {path: list(texts) for path, texts in PROTOTYPES.items()}
+        prototypes["docs"] += [c.description for c in cfg.corpus_list() if c.description]
+        if cfg.route_prototypes is not None:
+            for path, texts in load_prototypes(cfg.route_prototypes).items():
+                prototypes[path] += texts
+        return QueryRouter(get_embeddings(), prototypes, margin=cfg.route_margin, min_similarity=cfg.route_min_similarity)
+
+    return _get("query_router", build)
+
+
+def get_ticketing():
+    def build():
+        cfg = get_config()
+        # Embeddings are only loaded if a ticket is actually folded against others
+        embed = lambda query: get_embeddings().embed_query(query)
+        if cfg.ticket_backend == "memory":
+            from ticketing.memory import InMemoryTicketing
+
+            return InMemoryTicketing(fold_distance=cfg.ticket_fold_distance, embed=embed)
+        from ticketing.sqlite import SQLiteTicketing
+
+        return SQLiteTicketing(cfg.ticket_db, fold_distance=cfg.ticket_fold_distance, embed=embed)
+
+    return _get("ticketing", build)
+
+
+def get_table_cache():
+    def build():
+        from rag.tables import TableCache
+
+        return TableCache(get_config().csv_dir)
+
+    return _get("table_cache", build)
+
+
+def get_tools() -> List[Any]:
+    def build():
+        from agent.tools import make_retrieval_tool, make_ticket_tool, make_csv_search_tool
+
+        cfg = get_config()
+        return [
+            make_retrieval_tool(
+                get_shards(),
+                k=cfg.top_k,
+                max_tokens=cfg.context_max_tokens,
+                descriptions={c.name: c.description for c in cfg.corpus_list()},
+            ),
+            make_ticket_tool(get_ticketing()),
+            make_csv_search_tool(cfg.csv_dir, cache=get_table_cache()),
+        ]
+
+    return _get("tools", build)
+
+
+def get_tools_by_name() -> Dict[str, Any]:
+    return _get("tools_by_name", lambda: {t.name: t for t in get_tools()})
+
+
+def get_tool_pool():
+    def build():
+        from agent.tool_pool import ToolPool
+
+        cfg = get_config()
+        return ToolPool(cfg.tool_workers, cfg.tool_max_stranded)
+
+    return _get("tool_pool", build)
+
+
+def get_llm_executor():
+    """Threads for synchronous LLM calls, so a hung call can be abandoned after `llm_timeout_s`."""
+    def build():
+        from concurrent.futures import ThreadPoolExecutor
+
+        return ThreadPoolExecutor(max_workers=get_config().tool_workers, thread_name_prefix="llm")
+
+    return _get("llm_executor", build)
+
+
+def get_cascade_stats():
+    def build():
+        from agent.router import CascadeStats
+
+        return CascadeStats()
+
+    return _get("cascade_stats", build)
+
+
+_LLM_FACTORIES = {
+    "qwen": ("agent.qwen", "make_qwen"),
+    "gemini": ("agent.gemini", "make_gemini"),
+}
+
+
+def register_llm(name: str, module: str, factory: str) -> None:
+    """Make another chat model backend available by name (for `Config.cascade_models`)."""
+    with _lock:
+        _LLM_FACTORIES[name] = (module, factory)
+
+
+def get_llm(name: str):
+    def build():
+        import importlib
+
+        module, factory = _LLM_FACTORIES[name]
+        return getattr(importlib.import_module(module), factory)()
+
+    return _get(f"llm:{name}", build)
+
+
+def get_llm_with_tools(name: str):
+    return _get(f"llm_with_tools:{name}", lambda: get_llm(name).bind_tools(get_tools()))
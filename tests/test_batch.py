@@ -0,0 +1,37 @@
+import json
+
+from app.batch import compact_output, completed_ids, read_queries
+
+
+def test_malformed_lines_are_reported_not_raised():
+    lines = ['{"id": "a", "query": "meter"}', "", "{not json", '{"id": "b"}', "[1]", '{"query": "bill"}']
+    parsed = list(read_queries(lines))
+    assert [(query_id, query) for query_id, query, _ in parsed] == [
+        ("a", "meter"), ("line-3", "{not json"), ("b", '{"id": "b"}'), ("line-5", "[1]"), ("line-6", "bill"),
+    ]
+    errors = [error for _, _, error in parsed]
+    assert errors[0] is None and errors[4] is None
+    assert errors[1].startswith("line 3: not valid JSON")
+    assert errors[2] == "line 4: missing 'query'"
+    assert errors[3] == "line 5: expected a JSON object"
+
+
+def test_compact_keeps_one_record_per_id(tmp_path):
+    out = tmp_path / "answers.jsonl"
+    records = [
+        {"id": "a", "error": "TimeoutError: first run"},
+        {"id": "b", "answer": "kept"},
+        {"id": "c", "error": "old"},
+        {"id": "a", "answer": "retried"},
+        {"id": "b", "answer": "duplicate"},
+        {"id": "c", "error": "new"},
+    ]
+    out.write_text("".join(json.dumps(r) + "\n" for r in records) + '{"id": "torn')
+
+    compact_output(out)
+    assert [json.loads(line) for line in out.read_text().splitlines()] == [
+        {"id": "b", "answer": "kept"},
+        {"id": "a", "answer": "retried"},
+        {"id": "c", "error": "new"},
+    ]
+    assert completed_ids(out) == {"a", "b"}
@@ -0,0 +1,31 @@
+from langchain_core.documents import Document
+
+from rag.context import build_context, count_tokens
+
+
+def csv_chunk(name, rows):
+    lines = [f"PATIENT: {name}-{i} | CODE: {1000 + i} | DESCRIPTION: Routine checkup (procedure)" for i in range(rows)]
+    lines[rows // 2] = f"PATIENT: {name}-x | CODE: 714628002 | DESCRIPTION: Prediabetes (finding)"
+    return Document(page_content=f"File: {name}.csv\n" + "\n".join(lines), metadata={"filename": f"{name}.csv"})
+
+
+def test_line_oriented_chunks_are_packed_row_by_row():
+    hits = [(csv_chunk(name, 25), 0.5 + i / 10) for i, name in enumerate("abcd")]
+    assert all(count_tokens(doc.page_content) > 400 for doc, _ in hits)
+
+    for budget in (400, 200):
+        passages = build_context("prediabetes", hits, budget)
+        assert len(passages) == 4
+        assert all("Prediabetes (finding)" in p.text for p in passages)
+        assert sum(count_tokens(p.text) + 16 for p in passages) <= budget
+        # Rows keep their own lines
+        assert all(line.startswith(("PATIENT:", "File:", "...")) for p in passages for line in p.text.splitlines())
+
+
+def test_a_sentence_too_long_for_the_budget_is_cut_not_dropped():
+    text = "The radio module sends the reading " + "every day and again at night " * 40 + "to the billing office."
+    passages = build_context("radio reading", [(Document(page_content=text, metadata={"filename": "a.pdf"}), 0.3)], 60)
+    assert len(passages) == 1
+    assert passages[0].text.startswith("The radio module sends the reading")
+    assert passages[0].text.endswith(" ...")
+    assert count_tokens(passages[0].text) + 16 <= 60
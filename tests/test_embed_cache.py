@@ -0,0 +1,54 @@
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from rag.embed_cache import CachedEmbeddings, EmbeddingCache, text_key
+
+
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    texts: List[str] = []
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.texts.extend(texts)
+        return super().embed_documents(texts)
+
+
+def test_cached_rows_are_reused_across_instances(tmp_path):
+    base = CountingEmbeddings(size=8, texts=[])
+    first = CachedEmbeddings(base, EmbeddingCache(tmp_path, "fake/model"))
+    expected = first.embed_documents(["a", "b", "a"])
+    assert base.texts == ["a", "b", "a"]
+
+    first.cache.close()
+    second = CachedEmbeddings(base, EmbeddingCache(tmp_path, "fake/model"))
+    b, a, _ = second.embed_documents(["b", "a", "c"])
+    assert (b, a) == (expected[1], expected[0])
+    assert base.texts == ["a", "b", "a", "c"]  # only "c" went to the model
+    assert second.cache.stats()["entries"] == 3
+
+
+def test_full_cache_overwrites_oldest_rows(tmp_path):
+    cache = EmbeddingCache(tmp_path, "m", max_rows=4)
+    keys = [text_key(str(i)) for i in range(6)]
+    vectors = [[float(i)] * 3 for i in range(6)]
+    cache.put_many(keys[:4], vectors[:4])
+    cache.put_many(keys[4:], vectors[4:])
+
+    got = cache.get_many(keys)
+    assert got[0] is None and got[1] is None
+    assert [v.tolist() for v in got[2:]] == vectors[2:]
+    assert cache.evictions == 2
+
+
+def test_row_reused_by_another_instance_reads_as_miss(tmp_path):
+    a = EmbeddingCache(tmp_path, "m", max_rows=2)
+    b = EmbeddingCache(tmp_path, "m", max_rows=2)
+    a.put_many([text_key("x"), text_key("y")], [[1.0, 1.0], [2.0, 2.0]])
+    # b appends at the shared cursor, overwriting a's row for "x"
+    b.put_many([text_key("z")], [[3.0, 3.0]])
+
+    x, y, z = a.get_many([text_key("x"), text_key("y"), text_key("z")])
+    assert x is None
+    assert np.array_equal(y, [2.0, 2.0])
+    assert z is None  # not in a's key map until it reopens
@@ -0,0 +1,56 @@
+import threading
+
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from rag.lexical import BM25Index
+from rag.query_cache import index_version
+from rag.retrieve import CURRENT_FILE, load_index, save_index, search_with_scores
+
+EMBEDDINGS = DeterministicFakeEmbedding(size=16)
+
+
+def in_thread(fn):
+    out = []
+    t = threading.Thread(target=lambda: out.append(fn()))
+    t.start()
+    t.join()
+    return out[0]
+
+
+def top_text(vs, query):
+    return search_with_scores(vs, query, k=1)[0][0].page_content
+
+
+def test_loaded_index_keeps_reading_its_own_chunks_after_resaves(tmp_path):
+    save_index(FAISS.from_texts(["apple", "banana", "cherry"], EMBEDDINGS), tmp_path)
+    old = load_index(tmp_path, "fake", embeddings=EMBEDDINGS)
+
+    # Same positions, different chunks; saved often enough that the old version is deleted
+    for texts in (["cherry", "apple", "banana"], ["date", "elder", "fig"], ["grape", "kiwi", "lime"]):
+        save_index(FAISS.from_texts(texts, EMBEDDINGS), tmp_path)
+
+    assert in_thread(lambda: top_text(old, "banana")) == "banana"
+    new = load_index(tmp_path, "fake", embeddings=EMBEDDINGS)
+    assert top_text(new, "kiwi") == "kiwi"
+    assert len([p for p in tmp_path.iterdir() if p.is_dir()]) == 2
+
+
+def test_pickle_save_replaces_a_sqlite_index(tmp_path):
+    save_index(FAISS.from_texts(["apple"], EMBEDDINGS), tmp_path)
+    save_index(FAISS.from_texts(["banana"], EMBEDDINGS), tmp_path, index_format="pickle")
+    assert not (tmp_path / CURRENT_FILE).exists()
+    assert top_text(load_index(tmp_path, "fake", embeddings=EMBEDDINGS), "banana") == "banana"
+
+    save_index(FAISS.from_texts(["cherry"], EMBEDDINGS), tmp_path)
+    assert not (tmp_path / "index.pkl").exists()
+    assert top_text(load_index(tmp_path, "fake", embeddings=EMBEDDINGS), "cherry") == "cherry"
+
+
+def test_fingerprint_changes_when_only_the_bm25_file_does(tmp_path):
+    save_index(FAISS.from_texts(["apple"], EMBEDDINGS), tmp_path, index_format="pickle")
+    before = index_version(tmp_path)
+    lexical = BM25Index()
+    lexical.add(["a"], ["apple"])
+    lexical.save(tmp_path)
+    assert index_version(tmp_path) != before
@@ -0,0 +1,92 @@
+from pathlib import Path
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+import rag.ingest
+from rag.ingest import ingest_folder
+from rag.manifest import load_manifest
+from rag.retrieve import load_index
+
+EMBEDDINGS = DeterministicFakeEmbedding(size=16)
+
+
+def ingest(source: Path, index_dir: Path, **kwargs):
+    return ingest_folder(
+        source_dir=source, file_type="csv", index_dir=index_dir, embed_model="fake",
+        min_chars_per_page=0, chunk_size=2000, chunk_overlap=0, csv_rows_per_chunk=2, embeddings=EMBEDDINGS, **kwargs,
+    )
+
+
+def indexed_files(index_dir: Path) -> set:
+    vs = load_index(index_dir, "fake", embeddings=EMBEDDINGS)
+    return {vs.docstore.search(i).metadata["filename"] for i in vs.index_to_docstore_id.values()}
+
+
+def write_table(path: Path, prefix: str) -> None:
+    path.write_text("ID,DESCRIPTION\n" + "".join(f"{prefix}{i},{prefix} row {i}\n" for i in range(4)))
+
+
+def test_deleted_file_is_dropped_and_readded_file_is_embedded_again(tmp_path):
+    source, index_dir = tmp_path / "csv", tmp_path / "index"
+    source.mkdir()
+    write_table(source / "a.csv", "alpha")
+    write_table(source / "b.csv", "beta")
+
+    report = ingest(source, index_dir)
+    assert report.full_rebuild and report.chunks_embedded == 4
+    assert indexed_files(index_dir) == {"a.csv", "b.csv"}
+
+    kept = (source / "b.csv").read_text()
+    (source / "b.csv").unlink()
+    report = ingest(source, index_dir)
+    assert not report.full_rebuild
+    assert (report.files_skipped, report.files_deleted, report.chunks_deleted) == (1, 1, 2)
+    assert indexed_files(index_dir) == {"a.csv"}
+    assert set(load_manifest(index_dir).files) == {"a.csv"}
+
+    (source / "b.csv").write_text(kept)
+    report = ingest(source, index_dir)
+    assert not report.full_rebuild
+    assert (report.files_skipped, report.files_embedded, report.chunks_embedded) == (1, 1, 2)
+    assert indexed_files(index_dir) == {"a.csv", "b.csv"}
+    assert len(load_manifest(index_dir).all_chunk_ids()) == 4
+
+
+def test_switching_to_int8_embeddings_rebuilds(tmp_path):
+    source, index_dir = tmp_path / "csv", tmp_path / "index"
+    source.mkdir()
+    write_table(source / "a.csv", "alpha")
+
+    assert ingest(source, index_dir).full_rebuild
+    assert not ingest(source, index_dir, embed_backend="onnx").full_rebuild  # fp32 ONNX vectors match HF ones
+    assert ingest(source, index_dir, embed_backend="onnx", embed_quantize=True).full_rebuild
+    assert not ingest(source, index_dir, embed_backend="onnx", embed_quantize=True).full_rebuild
+
+
+def test_csv_rows_are_embedded_while_the_file_is_still_being_read(tmp_path, monkeypatch):
+    source = tmp_path / "csv"
+    source.mkdir()
+    (source / "big.csv").write_text("ID,DESCRIPTION\n" + "".join(f"{i},row {i}\n" for i in range(100)))
+    read = []
+    stream = rag.ingest.iter_csv_documents
+
+    def counting(*args, **kwargs):
+        for doc in stream(*args, **kwargs):
+            read.append(doc)
+            yield doc
+
+    class Recording(DeterministicFakeEmbedding):
+        def embed_documents(self, texts):
+            batches.append(len(read))
+            return super().embed_documents(texts)
+
+    batches = []
+    monkeypatch.setattr(rag.ingest, "iter_csv_documents", counting)
+    report = ingest_folder(
+        source_dir=source, file_type="csv", index_dir=tmp_path / "index", embed_model="fake", min_chars_per_page=0,
+        chunk_size=2000, chunk_overlap=0, csv_rows_per_chunk=2, embeddings=Recording(size=16), batch_size=5, workers=2,
+    )
+    assert report.chunks_embedded == len(read) == 50
+    assert batches[0] < 10  # the first batch went out after a handful of documents, not the whole file
+    assert load_manifest(tmp_path / "index").files["big.csv"].chunk_ids == list(load_index(
+        tmp_path / "index", "fake", embeddings=EMBEDDINGS).index_to_docstore_id.values())
@@ -0,0 +1,39 @@
+from dataclasses import replace
+
+import resources
+from agent.intent import parse_lookup
+from agent.tools import make_csv_search_tool
+from app.pipeline import run_lookup
+from config import Config
+
+
+def test_table_verbs_only_count_in_phrases():
+    for query in ("How do I take a meter reading?", "When will the technician visit?",
+                  "Is the device legally prescribed?", "How long is the visit of the technician taking?"):
+        assert parse_lookup(query) is None, query
+
+
+def test_hint_nouns_and_phrases_pick_the_table():
+    cases = {
+        "How many patients take metformin?": ("medications", "metformin"),
+        "Which patients are allergic to peanuts?": ("allergies", "peanuts"),
+        "List the drugs with insulin": ("medications", "insulin"),
+        "Count people diagnosed with asthma": ("conditions", "asthma"),
+    }
+    for query, (table, term) in cases.items():
+        intent = parse_lookup(query)
+        assert (intent.table, intent.term) == (table, term), query
+
+
+def test_lookup_answer_counts_distinct_patients(tmp_path):
+    (tmp_path / "medications.csv").write_text(
+        "PATIENT,DESCRIPTION,CODE\np1,Metformin 500 MG,1\np1,Metformin 500 MG,1\np2,Metformin 850 MG,2\np3,Insulin,3\n"
+    )
+    resources.reset()
+    resources.override("config", replace(Config(), csv_dir=tmp_path))
+    resources.override("tools_by_name", {"search_csv": make_csv_search_tool(tmp_path, cache=resources.get_table_cache())})
+    try:
+        answer = run_lookup(parse_lookup("How many patients take metformin?"))
+    finally:
+        resources.reset()
+    assert answer.splitlines()[:2] == ["2 distinct patients in the matching rows.", "Found 3 matches in medications (showing 3):"]
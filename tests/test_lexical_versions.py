@@ -0,0 +1,41 @@
+from dataclasses import replace
+
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+import resources
+from config import Config
+from rag.lexical import LEXICAL_NAME, BM25Index, load_lexical
+from rag.retrieve import current_dir, save_index
+
+EMBEDDINGS = DeterministicFakeEmbedding(size=16)
+
+
+def save(index_dir, texts):
+    vs = FAISS.from_texts(texts, EMBEDDINGS, ids=texts)
+    lexical = BM25Index()
+    lexical.add(texts, texts)
+    save_index(vs, index_dir, lexical=lexical)
+
+
+def test_bm25_is_saved_with_its_version(tmp_path):
+    save(tmp_path, ["apple", "banana"])
+    save(tmp_path, ["cherry"])
+    assert (current_dir(tmp_path) / LEXICAL_NAME).exists()
+    assert not (tmp_path / LEXICAL_NAME).exists()
+    assert set(load_lexical(tmp_path).docs) == {"cherry"}
+
+
+def test_lexical_is_reloaded_with_the_index(tmp_path):
+    cfg = replace(Config(), index_dir=tmp_path / "shard", retrieval_mode="hybrid")
+    resources.reset()
+    resources.override("config", cfg)
+    resources.override("embeddings", EMBEDDINGS)
+    try:
+        save(cfg.index_dir, ["apple", "banana"])
+        assert set(resources.get_lexical().docs) == {"apple", "banana"}
+        save(cfg.index_dir, ["cherry", "date"])
+        lexical = resources.get_lexical()
+        assert set(lexical.docs) == set(resources.get_index().index_to_docstore_id.values()) == {"cherry", "date"}
+    finally:
+        resources.reset()
@@ -0,0 +1,89 @@
+from dataclasses import replace
+
+import faiss
+import numpy as np
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+import resources
+from config import Config
+from rag.index_types import IndexSpec, new_index
+from rag.lexical import BM25Index
+from rag.retrieve import ShardedIndex, save_index, search_by_vector
+
+EMBEDDINGS = DeterministicFakeEmbedding(size=16)
+
+
+def make_shards(texts_by_corpus, hybrid=False):
+    shards = {}
+    for name, texts in texts_by_corpus.items():
+        vs = FAISS.from_texts(texts, EMBEDDINGS)
+        lexical = None
+        if hybrid:
+            lexical = BM25Index()
+            ids = list(vs.index_to_docstore_id.values())
+            lexical.add(ids, [vs.docstore.search(i).page_content for i in ids])
+        shards[name] = (vs, lexical)
+    return ShardedIndex(list(shards), shards.__getitem__, EMBEDDINGS)
+
+
+def test_dense_merge_takes_the_closest_hits_from_every_shard():
+    index = make_shards({"a": ["one", "two", "three"], "b": ["four", "five", "two"]})
+    hits = index.search("two", k=3)
+
+    assert len(hits) == 3
+    distances = [dist for _, dist in hits]
+    assert distances == sorted(distances)
+    assert distances[0] == distances[1] == 0.0
+    assert {doc.metadata["corpus"] for doc, _ in hits[:2]} == {"a", "b"}
+    assert all(doc.page_content == "two" for doc, _ in hits[:2])
+
+
+def test_selected_corpora_only():
+    index = make_shards({"a": ["one", "two"], "b": ["two", "three"]})
+    hits = index.search("two", k=4, corpora=["b"])
+    assert {doc.metadata["corpus"] for doc, _ in hits} == {"b"}
+    assert len(hits) == 2
+
+
+def test_hybrid_merge_keeps_a_bm25_only_hit_from_another_shard():
+    query = "zebra stripes"
+    index = make_shards({
+        "a": [query] + [f"filler text number {i}" for i in range(10)],
+        "b": ["alpha", "beta", "the stripes of a zebra", "gamma"],
+    }, hybrid=True)
+    vs_a, lexical_a = index.shard("a")
+    vs_b, lexical_b = index.shard("b")
+    embedding = EMBEDDINGS.embed_query(query)
+    top_b = search_by_vector(vs_b, embedding, 2, query=query, lexical=lexical_b)[0]
+    assert top_b[0].page_content == "the stripes of a zebra"
+    # BM25 put it first in its shard; by dense distance alone shard a's filler would push it out
+    dense_a = search_by_vector(vs_a, embedding, 2)
+    assert top_b[1] > dense_a[1][1]
+
+    expected = [("a", query), ("b", "the stripes of a zebra")]
+    assert [(doc.metadata["corpus"], doc.page_content) for doc, _ in index.search(query, k=2)] == expected
+    (batched,) = index.search_batch([embedding], k=2, queries=[query])
+    assert [(doc.metadata["corpus"], doc.page_content) for doc, _ in batched] == expected
+
+
+def test_hybrid_ivf_shard_gets_its_direct_map_at_load(tmp_path):
+    texts = [f"chunk {i}" for i in range(64)]
+    vectors = np.asarray(EMBEDDINGS.embed_documents(texts), dtype=np.float32)
+    vs = FAISS(EMBEDDINGS, new_index(IndexSpec(index_type="IVF-Flat", nlist=4), 16, vectors), InMemoryDocstore(), {})
+    vs.add_embeddings(list(zip(texts, vectors.tolist())), ids=texts)
+    lexical = BM25Index()
+    lexical.add(texts, texts)
+    cfg = replace(Config(), index_dir=tmp_path / "shard", retrieval_mode="hybrid", index_type="IVF-Flat", ivf_nlist=4)
+    save_index(vs, cfg.index_dir, lexical=lexical)
+    resources.reset()
+    resources.override("config", cfg)
+    resources.override("embeddings", EMBEDDINGS)
+    try:
+        loaded = resources.get_index()
+        assert faiss.extract_index_ivf(loaded.index).direct_map.type != faiss.DirectMap.NoMap
+        hits = search_by_vector(loaded, EMBEDDINGS.embed_query("chunk 7"), 4, query="chunk 7", lexical=resources.get_lexical())
+        assert hits[0][0].page_content == "chunk 7"
+    finally:
+        resources.reset()
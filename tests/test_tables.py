@@ -0,0 +1,46 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+import rag.tables
+from rag.tables import CsvTable
+
+
+def test_matches_values_as_text_and_empty_cells_never():
+    df = pd.DataFrame({"DESCRIPTION": ["Diabetes", None, "Prediabetes", "Nanny visit", np.nan],
+                       "CODE": [1.0, 2.5, None, 4.0, 5.0]})
+    table = CsvTable(df=df, mtime_ns=0, size=0)
+    assert table.search("DIAB", "DESCRIPTION").tolist() == [0, 2]
+    assert table.search("nan", "DESCRIPTION").tolist() == [3]
+    assert table.search("none", "DESCRIPTION").tolist() == []
+    assert table.search("nan", "CODE").tolist() == []
+    assert table.search(".0", "CODE").tolist() == [0, 3, 4]
+    assert table.search("2.5").tolist() == [1]
+
+
+def test_concurrent_lookups_build_a_column_index_once(monkeypatch):
+    built = []
+    original = rag.tables.ColumnIndex
+
+    class CountingIndex(original):
+        def __init__(self, values):
+            built.append(values.name)
+            super().__init__(values)
+
+    monkeypatch.setattr(rag.tables, "ColumnIndex", CountingIndex)
+    table = CsvTable(df=pd.DataFrame({"DESCRIPTION": [f"value {i}" for i in range(20000)]}), mtime_ns=0, size=0)
+    start = threading.Barrier(8)
+    results = []
+
+    def lookup():
+        start.wait()
+        results.append(table.search("value 7", "DESCRIPTION").tolist())
+
+    threads = [threading.Thread(target=lookup) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert built == ["DESCRIPTION"]
+    assert all(r == results[0] for r in results) and len(results) == 8
@@ -0,0 +1,55 @@
+import pytest
+
+from ticketing.base import TicketRequest
+from ticketing.memory import InMemoryTicketing
+from ticketing.sqlite import SQLiteTicketing
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        return InMemoryTicketing
+    return lambda **kw: SQLiteTicketing(tmp_path / "tickets.sqlite3", **kw)
+
+
+def test_near_duplicates_fold_into_one_ticket(backend):
+    tickets = backend(fold_distance=0.1)
+    first = tickets.create_ticket("no_hits", "meter reading", 1.5, [], embedding=[1.0, 0.0])
+    again = tickets.create_ticket("no_hits", "reading the meter", 1.4, [], embedding=[1.0, 0.05])
+
+    assert again.id == first.id
+    assert again.count == 2
+    assert again.query == "meter reading"
+    assert len(tickets.list_tickets().tickets) == 1
+
+
+def test_far_queries_and_other_types_do_not_fold(backend):
+    tickets = backend(fold_distance=0.1)
+    first = tickets.create_ticket("no_hits", "meter reading", 1.5, [], embedding=[1.0, 0.0])
+    far = tickets.create_ticket("no_hits", "heating bill", 1.5, [], embedding=[0.0, 1.0])
+    other_type = tickets.create_ticket("low_confidence", "meter reading", 0.9, [], embedding=[1.0, 0.0])
+
+    assert len({first.id, far.id, other_type.id}) == 3
+    assert len(tickets.list_tickets().tickets) == 3
+
+
+def test_batch_folds_within_itself_and_uses_embed(backend):
+    tickets = backend(fold_distance=0.1, embed=lambda q: [float(len(q)), 0.0])
+    made = tickets.create_tickets([TicketRequest("no_hits", q, 1.0, []) for q in ("abc", "xyz", "abcd")])
+    assert made[0].id == made[1].id != made[2].id
+    assert [t.count for t in made] == [2, 2, 1]
+
+
+def test_no_folding_without_fold_distance(backend):
+    tickets = backend()
+    a = tickets.create_ticket("no_hits", "q", 1.0, [], embedding=[1.0])
+    b = tickets.create_ticket("no_hits", "q", 1.0, [], embedding=[1.0])
+    assert a.id != b.id
+
+
+def test_folding_still_finds_early_and_late_tickets_after_growth(backend):
+    tickets = backend(fold_distance=0.1)
+    made = [tickets.create_ticket("no_hits", f"q{i}", 1.0, [], embedding=[float(i), 0.0]) for i in range(40)]
+    assert tickets.create_ticket("no_hits", "again", 1.0, [], embedding=[0.0, 0.05]).id == made[0].id
+    assert tickets.create_ticket("no_hits", "again", 1.0, [], embedding=[39.0, 0.05]).id == made[39].id
+    assert len(tickets.list_tickets(limit=100).tickets) == 40
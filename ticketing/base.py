@@ -0,0 +1,109 @@
+# ticketing/base.py
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+import time
+
+from langchain_core.documents import Document
+
+
+@dataclass
+class Ticket:
+    id: str
+    type: str
+    query: str
+    best_distance: float
+    top_sources: List[Dict[str, Any]]
+    created_at: float = field(default_factory=time.time)
+    # Near-duplicate queries fold into one ticket: how often it was raised, and when last
+    count: int = 1
+    last_seen: Optional[float] = None
+
+
+@dataclass
+class TicketRequest:
+    """Arguments of one `create_ticket` call, for batched creation."""
+    type: str
+    query: str
+    best_distance: float
+    hits: List[Tuple[Document, float]]
+    embedding: Optional[Sequence[float]] = None
+
+
+@dataclass
+class TicketPage:
+    tickets: List[Ticket]
+    # Pass back as `cursor` to get the next (older) page; None on the last page
+    next_cursor: Optional[int] = None
+
+
+def top_sources(hits: List[Tuple[Document, float]], n: int = 3) -> List[Dict[str, Any]]:
+    return [
+        {
+            "filename": doc.metadata.get("filename"),
+            "page": doc.metadata.get("page"),
+            "distance": float(dist),
+            "preview": doc.page_content[:200],
+        }
+        for doc, dist in hits[:n]
+    ]
+
+
+class TicketBackend(ABC):
+    """Where tickets for unanswerable queries go.
+
+    With `fold_distance` set, a new ticket whose query embedding lies within that L2
+    distance of an existing ticket of the same type increments that ticket's `count`
+    instead. The embedding is taken from the call or computed with `embed`.
+    """
+
+    def __init__(
+        self,
+        fold_distance: Optional[float] = None,
+        embed: Optional[Callable[[str], Sequence[float]]] = None,
+    ) -> None:
+        self.fold_distance = fold_distance
+        self.embed = embed
+
+    def _embedding_for(self, request: TicketRequest) -> Optional[Sequence[float]]:
+        if self.fold_distance is None:
+            return None
+        if request.embedding is None and self.embed is not None:
+            return self.embed(request.query)
+        return request.embedding
+
+    def create_ticket(
+        self,
+        type: str,
+        query: str,
+        best_distance: float,
+        hits: List[Tuple[Document, float]],
+        embedding: Optional[Sequence[float]] = None,
+    ) -> Ticket:
+        return self.create_tickets([TicketRequest(type, query, best_distance, hits, embedding)])[0]
+
+    @abstractmethod
+    def create_tickets(self, requests: List[TicketRequest]) -> List[Ticket]:
+        """Create (or fold) several tickets at once; returns one ticket per request."""
+
+    @abstractmethod
+    def get_ticket(self, ticket_id: str) -> Optional[Ticket]:
+        ...
+
+    @abstractmethod
+    def list_tickets(
+        self,
+        limit: int = 50,
+        cursor: Optional[int] = None,
+        type: Optional[str] = None,
+        filename: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+    ) -> TicketPage:
+        """Newest tickets first, filtered by type, source file and creation time."""
+
+    @abstractmethod
+    def empty_tickets(self) -> None:
+        ...
@@ -1,58 +1,89 @@
 # ticketing/memory.py
 from __future__ import annotations
 
-from dataclasses import dataclass, field
-from typing import Any, Dict, List, Tuple
+from typing import Callable, List, Optional, Sequence
 import time
 import uuid
 
-from langchain_core.documents import Document
+import numpy as np
 
+from ticketing.base import Ticket, TicketBackend, TicketPage, TicketRequest, top_sources
 
-@dataclass
-class Ticket:
-    id: str
-    type: str
-    query: str
-    best_distance: float
-    top_sources: List[Dict[str, Any]]
-    created_at: float = field(default_factory=time.time)
 
+class InMemoryTicketing(TicketBackend):
+    """Process-local ticket list; nothing survives the process. Meant for tests and demos."""
 
-class InMemoryTicketing:
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        fold_distance: Optional[float] = None,
+        embed: Optional[Callable[[str], Sequence[float]]] = None,
+    ) -> None:
+        super().__init__(fold_distance, embed)
         self.tickets: List[Ticket] = []
+        self._vectors: List[Optional[np.ndarray]] = []
+
+    def _find_duplicate(self, type: str, vec: np.ndarray) -> Optional[Ticket]:
+        for t, other in zip(self.tickets, self._vectors):
+            if other is not None and t.type == type and np.linalg.norm(other - vec) <= self.fold_distance:
+                return t
+        return None
+
+    def create_tickets(self, requests: List[TicketRequest]) -> List[Ticket]:
+        out = []
+        for req in requests:
+            emb = self._embedding_for(req)
+            vec = None if emb is None else np.asarray(emb, dtype=np.float32)
+            now = time.time()
+            dup = self._find_duplicate(req.type, vec) if vec is not None else None
+            if dup is not None:
+                dup.count += 1
+                dup.last_seen = now
+                out.append(dup)
+                continue
+            t = Ticket(
+                id=f"T-{uuid.uuid4().hex[:8]}",
+                type=req.type,
+                query=req.query,
+                best_distance=req.best_distance,
+                top_sources=top_sources(req.hits),
+                created_at=now,
+                last_seen=now,
+            )
+            self.tickets.append(t)
+            self._vectors.append(vec)
+            out.append(t)
+        return out
+
+    def get_ticket(self, ticket_id: str) -> Optional[Ticket]:
+        return next((t for t in self.tickets if t.id == ticket_id), None)
 
-    def create_ticket(
+    def list_tickets(
         self,
-        type: str,
-        query: str,
-        best_distance: float,
-        hits: List[Tuple[Document, float]],
-    ) -> Ticket:
-        top_sources: List[Dict[str, Any]] = []
-        for doc, dist in hits[:3]:
-            top_sources.append(
-                {
-                    "filename": doc.metadata.get("filename"),
-                    "page": doc.metadata.get("page"),
-                    "distance": dist,
-                    "preview": doc.page_content[:200],
-                }
+        limit: int = 50,
+        cursor: Optional[int] = None,
+        type: Optional[str] = None,
+        filename: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+    ) -> TicketPage:
+        def matches(t: Ticket) -> bool:
+            return (
+                (type is None or t.type == type)
+                and (filename is None or any(s["filename"] == filename for s in t.top_sources))
+                and (since is None or t.created_at >= since)
+                and (until is None or t.created_at < until)
             )
 
-        t = Ticket(
-            id=f"T-{uuid.uuid4().hex[:8]}",
-            type=type,
-            query=query,
-            best_distance=best_distance,
-            top_sources=top_sources,
-        )
-        self.tickets.append(t)
-        return t
-    
-    def list_tickets(self) -> List[Ticket]:
-        return self.tickets
-    
+        # The cursor is a position in the (append-only) list, exclusive
+        pos = len(self.tickets) if cursor is None else cursor
+        page: List[Ticket] = []
+        while pos > 0 and len(page) < limit:
+            pos -= 1
+            if matches(self.tickets[pos]):
+                page.append(self.tickets[pos])
+        more = any(matches(t) for t in self.tickets[:pos])
+        return TicketPage(page, next_cursor=pos if more else None)
+
     def empty_tickets(self) -> None:
-        self.tickets.clear()
\ No newline at end of file
+        self.tickets.clear()
+        self._vectors.clear()
@@ -0,0 +1,244 @@
+# ticketing/sqlite.py
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Callable, List, Optional, Sequence
+
+import numpy as np
+
+from ticketing.base import Ticket, TicketBackend, TicketPage, TicketRequest, top_sources
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tickets (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,  -- never reused: it is the paging cursor
+    id TEXT NOT NULL UNIQUE,
+    type TEXT NOT NULL,
+    query TEXT NOT NULL,
+    best_distance REAL NOT NULL,
+    top_sources TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    count INTEGER NOT NULL DEFAULT 1,
+    embedding BLOB
+);
+CREATE INDEX IF NOT EXISTS tickets_type_seq ON tickets(type, seq);
+CREATE INDEX IF NOT EXISTS tickets_created_at ON tickets(created_at);
+CREATE TABLE IF NOT EXISTS ticket_sources (
+    filename TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    PRIMARY KEY (filename, seq)
+) WITHOUT ROWID;
+"""
+
+_COLUMNS = "seq, id, type, query, best_distance, top_sources, created_at, last_seen, count"
+
+
+def _row_to_ticket(row) -> Ticket:
+    _, id, type, query, best_distance, sources, created_at, last_seen, count = row
+    return Ticket(
+        id=id,
+        type=type,
+        query=query,
+        best_distance=best_distance,
+        top_sources=json.loads(sources),
+        created_at=created_at,
+        count=count,
+        last_seen=last_seen,
+    )
+
+
+class SQLiteTicketing(TicketBackend):
+    """Tickets in a SQLite database in WAL mode, shared by every process that opens the file.
+
+    Each thread gets its own connection; writes take the database write lock up front
+    (BEGIN IMMEDIATE) and wait up to `busy_timeout_s` for other writers. Lookups by type,
+    creation time and source file are indexed, and `list_tickets` pages by sequence number.
+
+    For folding, the embeddings of existing tickets are mirrored in memory and topped up
+    from the database (rows newer than the last one seen) at the start of every write.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        fold_distance: Optional[float] = None,
+        embed: Optional[Callable[[str], Sequence[float]]] = None,
+        busy_timeout_s: float = 30.0,
+    ) -> None:
+        super().__init__(fold_distance, embed)
+        self.path = Path(path)
+        self.busy_timeout_s = busy_timeout_s
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._seen_seq = 0
+        self._seqs: List[int] = []
+        self._types: List[str] = []
+        # Rows [:len(self._seqs)] are in use; capacity doubles when full, so inserts are amortized O(1)
+        self._vectors: Optional[np.ndarray] = None
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit mode: transactions are opened explicitly with BEGIN IMMEDIATE
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout_s, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _sync_vectors(self, conn: sqlite3.Connection) -> None:
+        rows = conn.execute(
+            "SELECT seq, type, embedding FROM tickets WHERE seq > ? AND embedding IS NOT NULL ORDER BY seq",
+            (self._seen_seq,),
+        ).fetchall()
+        for seq, type, blob in rows:
+            self._remember(seq, type, np.frombuffer(blob, dtype=np.float32))
+
+    def _remember(self, seq: int, type: str, vec: np.ndarray) -> None:
+        n = len(self._seqs)
+        if self._vectors is None or self._vectors.shape[1] != vec.shape[0]:
+            # First vector, or the embedding model changed: only same-size vectors can be compared
+            self._seqs, self._types, n = [], [], 0
+            self._vectors = np.empty((16, vec.shape[0]), dtype=np.float32)
+        elif n == len(self._vectors):
+            grown = np.empty((2 * n, self._vectors.shape[1]), dtype=np.float32)
+            grown[:n] = self._vectors
+            self._vectors = grown
+        self._vectors[n] = vec
+        self._seqs.append(seq)
+        self._types.append(type)
+        self._seen_seq = max(self._seen_seq, seq)
+
+    def _forget_all(self) -> None:
+        self._seen_seq = 0
+        self._seqs, self._types, self._vectors = [], [], None
+
+    def _find_duplicate(self, type: str, vec: np.ndarray) -> Optional[int]:
+        if not self._seqs or self._vectors.shape[1] != vec.shape[0]:
+            return None
+        dists = np.linalg.norm(self._vectors[:len(self._seqs)] - vec, axis=1)
+        dists[np.asarray(self._types) != type] = np.inf
+        best = int(np.argmin(dists))
+        return self._seqs[best] if dists[best] <= self.fold_distance else None
+
+    def create_tickets(self, requests: List[TicketRequest]) -> List[Ticket]:
+        if not requests:
+            return []
+        # Embed before taking the write lock
+        vectors = []
+        for req in requests:
+            emb = self._embedding_for(req)
+            vectors.append(None if emb is None else np.asarray(emb, dtype=np.float32))
+
+        conn = self._conn()
+        seqs = []
+        with self._lock:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if self.fold_distance is not None:
+                    self._sync_vectors(conn)
+                for req, vec in zip(requests, vectors):
+                    now = time.time()
+                    dup = self._find_duplicate(req.type, vec) if vec is not None else None
+                    if dup is not None:
+                        cur = conn.execute(
+                            "UPDATE tickets SET count = count + 1, last_seen = ? WHERE seq = ?", (now, dup)
+                        )
+                        if cur.rowcount:
+                            seqs.append(dup)
+                            continue
+                    sources = top_sources(req.hits)
+                    cur = conn.execute(
+                        "INSERT INTO tickets (id, type, query, best_distance, top_sources, created_at, last_seen, embedding)"
+                        " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        (
+                            f"T-{uuid.uuid4().hex[:8]}",
+                            req.type,
+                            req.query,
+                            float(req.best_distance),
+                            json.dumps(sources),
+                            now,
+                            now,
+                            None if vec is None else vec.tobytes(),
+                        ),
+                    )
+                    seq = cur.lastrowid
+                    conn.executemany(
+                        "INSERT OR IGNORE INTO ticket_sources (filename, seq) VALUES (?, ?)",
+                        [(s["filename"], seq) for s in sources if s["filename"] is not None],
+                    )
+                    if vec is not None:
+                        self._remember(seq, req.type, vec)
+                    seqs.append(seq)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                # The in-memory mirror may now hold rows that were never committed
+                self._forget_all()
+                raise
+
+        unique = sorted(set(seqs))
+        by_seq = {}
+        # Stay under SQLite's bound-parameter limit
+        for i in range(0, len(unique), 500):
+            part = unique[i:i + 500]
+            rows = conn.execute(f"SELECT {_COLUMNS} FROM tickets WHERE seq IN ({','.join('?' * len(part))})", part)
+            by_seq.update((row[0], _row_to_ticket(row)) for row in rows)
+        return [by_seq[seq] for seq in seqs]
+
+    def get_ticket(self, ticket_id: str) -> Optional[Ticket]:
+        row = self._conn().execute(f"SELECT {_COLUMNS} FROM tickets WHERE id = ?", (ticket_id,)).fetchone()
+        return None if row is None else _row_to_ticket(row)
+
+    def list_tickets(
+        self,
+        limit: int = 50,
+        cursor: Optional[int] = None,
+        type: Optional[str] = None,
+        filename: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+    ) -> TicketPage:
+        where, params = [], []
+        if cursor is not None:
+            where.append("seq < ?")
+            params.append(cursor)
+        if type is not None:
+            where.append("type = ?")
+            params.append(type)
+        if filename is not None:
+            where.append("seq IN (SELECT seq FROM ticket_sources WHERE filename = ?)")
+            params.append(filename)
+        if since is not None:
+            where.append("created_at >= ?")
+            params.append(since)
+        if until is not None:
+            where.append("created_at < ?")
+            params.append(until)
+        sql = f"SELECT {_COLUMNS} FROM tickets"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        # One extra row tells whether there is a next page
+        rows = self._conn().execute(sql + " ORDER BY seq DESC LIMIT ?", params + [limit + 1]).fetchall()
+        more = len(rows) > limit
+        rows = rows[:limit]
+        return TicketPage([_row_to_ticket(r) for r in rows], next_cursor=rows[-1][0] if more else None)
+
+    def empty_tickets(self) -> None:
+        conn = self._conn()
+        with self._lock:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM ticket_sources")
+            conn.execute("DELETE FROM tickets")
+            conn.execute("COMMIT")
+            self._forget_all()
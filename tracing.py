@@ -0,0 +1,250 @@
+# tracing.py
+"""Span timers and counters for ingest, retrieval and the agent graph.
+
+Off by default: `span()` then returns a shared no-op object and `count()` returns
+immediately, so instrumented code pays one global check per call. When enabled
+(`Config.trace`, see `configure`), every finished span is kept for the summary and,
+if a path was given, appended to a JSON-lines file:
+
+    {"name": "retrieve.search", "ms": 1.93, "start": 1760000000.1, "parent": "agent.tool_node", ...attrs}
+    {"counter": "llm.input_tokens", "value": 812}
+
+Summarize a trace file afterwards with:
+
+    python -m tracing data/traces/query-20261017-120000.jsonl
+"""
+from __future__ import annotations
+
+import atexit
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import sys
+import threading
+import time
+from pathlib import Path
+from collections import deque
+from typing import Any, Callable, Deque, Dict, IO, Iterable, Iterator, List, Optional
+
+
+_enabled = False
+_lock = threading.Lock()
+# Bounded per stage so a long-running server keeps a rolling window
+_WINDOW = 10_000
+_durations: Dict[str, Deque[float]] = {}
+_counters: Dict[str, float] = {}
+_sink: Optional[IO[str]] = None
+_parent: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("span_parent", default=None)
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, *exc) -> bool:
+        return False
+
+    def set(self, **attrs: Any) -> None:
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class Span:
+    __slots__ = ("name", "attrs", "start", "_t0", "_token")
+
+    def __init__(self, name: str, attrs: Dict[str, Any]) -> None:
+        self.name = name
+        self.attrs = attrs
+
+    def set(self, **attrs: Any) -> None:
+        """Attach attributes (sizes, counts, ...) to the span before it closes."""
+        self.attrs.update(attrs)
+
+    def __enter__(self) -> "Span":
+        self._token = _parent.set(self.name)
+        self.start = time.time()
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        ms = (time.perf_counter() - self._t0) * 1000
+        _parent.reset(self._token)
+        record = {"name": self.name, "ms": round(ms, 4), "start": self.start, "parent": _parent.get()}
+        if exc_type is not None:
+            record["error"] = exc_type.__name__
+        record.update(self.attrs)
+        _record(self.name, ms, record)
+        return False
+
+
+def _record(name: str, ms: float, record: dict) -> None:
+    with _lock:
+        values = _durations.get(name)
+        if values is None:
+            values = _durations[name] = deque(maxlen=_WINDOW)
+        values.append(ms)
+        if _sink is not None:
+            _sink.write(json.dumps(record, default=str) + "\n")
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def span(name: str, **attrs: Any):
+    """Time a block: `with tracing.span("retrieve.search", k=4) as s: ...; s.set(hits=len(hits))`."""
+    if not _enabled:
+        return _NOOP
+    return Span(name, attrs)
+
+
+def count(name: str, n: float = 1) -> None:
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+        if _sink is not None:
+            _sink.write(json.dumps({"counter": name, "value": n}) + "\n")
+
+
+def traced(name: str) -> Callable:
+    """Decorator form of `span` for plain and async functions."""
+
+    def wrap(fn: Callable) -> Callable:
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                if not _enabled:
+                    return await fn(*args, **kwargs)
+                with Span(name, {}):
+                    return await fn(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with Span(name, {}):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return wrap
+
+
+def traced_iter(name: str, items: Iterable) -> Iterator:
+    """Yield from `items`, timing how long each item takes to produce."""
+    it = iter(items)
+    while True:
+        with span(name):
+            try:
+                item = next(it)
+            except StopIteration:
+                return
+        yield item
+
+
+def enable(path: Optional[Path] = None) -> None:
+    global _enabled, _sink
+    with _lock:
+        if path is not None and _sink is None:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            _sink = open(path, "a", encoding="utf-8")
+        _enabled = True
+
+
+def disable() -> None:
+    global _enabled, _sink
+    with _lock:
+        _enabled = False
+        if _sink is not None:
+            _sink.close()
+            _sink = None
+
+
+def reset() -> None:
+    with _lock:
+        _durations.clear()
+        _counters.clear()
+
+
+def _percentile(ordered: List[float], q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _stage_stats(durations: Dict[str, Iterable[float]]) -> Dict[str, dict]:
+    out = {}
+    for name, values in durations.items():
+        ordered = sorted(values)
+        out[name] = {
+            "count": len(ordered),
+            "total_ms": round(sum(ordered), 3),
+            "p50_ms": round(_percentile(ordered, 0.50), 3),
+            "p95_ms": round(_percentile(ordered, 0.95), 3),
+            "max_ms": round(ordered[-1], 3),
+        }
+    return out
+
+
+def summary() -> dict:
+    with _lock:
+        durations = {k: list(v) for k, v in _durations.items()}
+        counters = dict(_counters)
+    return {"stages": _stage_stats(durations), "counters": counters}
+
+
+def format_summary(data: Optional[dict] = None) -> str:
+    data = summary() if data is None else data
+    lines = [f"{'stage':<28}{'count':>8}{'total ms':>12}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}"]
+    for name, s in sorted(data["stages"].items()):
+        lines.append(
+            f"{name:<28}{s['count']:>8}{s['total_ms']:>12.1f}{s['p50_ms']:>10.2f}{s['p95_ms']:>10.2f}{s['max_ms']:>10.2f}"
+        )
+    for name, value in sorted(data["counters"].items()):
+        lines.append(f"{name:<28}{value:>8g}")
+    return "\n".join(lines)
+
+
+def summarize_file(path: Path) -> dict:
+    """Stage statistics of a JSON-lines trace written by an earlier run."""
+    durations: Dict[str, List[float]] = {}
+    counters: Dict[str, float] = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            if "counter" in record:
+                counters[record["counter"]] = counters.get(record["counter"], 0) + record["value"]
+            else:
+                durations.setdefault(record["name"], []).append(record["ms"])
+    return {"stages": _stage_stats(durations), "counters": counters}
+
+
+def configure(cfg, run_name: str, trace: Optional[bool] = None) -> None:
+    """Leveled logging for a CLI run, plus tracing to `cfg.trace_dir` when `cfg.trace` (or `trace`) is set.
+
+    With tracing on, the summary table is printed to stderr when the process exits.
+    """
+    logging.basicConfig(level=getattr(logging, cfg.log_level.upper()), format="%(levelname)s %(name)s: %(message)s")
+    if not (cfg.trace if trace is None else trace):
+        return
+    path = Path(cfg.trace_dir) / f"{run_name}-{time.strftime('%Y%m%d-%H%M%S')}.jsonl"
+    enable(path)
+
+    def report() -> None:
+        disable()
+        print(f"\nTrace written to {path}\n{format_summary()}", file=sys.stderr)
+
+    atexit.register(report)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        sys.exit("usage: python -m tracing TRACE.jsonl")
+    print(format_summary(summarize_file(Path(sys.argv[1]))))